@@ -2,81 +2,159 @@
 AWS Daily Digest — Strands Agent
 - RSSフィードから過去24時間の記事を取得
 - Claude (Bedrock) で日本語翻訳・要約・重要度スコアリング
-- 結果をJSON形式でLambdaへ返却（Slack通知はLambdaが担当）
+- 結果を記事のワイヤー形式（article_model.py）でLambdaへ返却（Slack通知はLambdaが担当）
 
 モード:
   morning : 朝9時  — What's New のみ（新機能・アップデート速報）
   noon    : 昼12時 — 技術ブログ全カテゴリ（読み物・詳細解説）
+  prefetch: 全フィードを条件付き GET してスナップショットを更新する（LLM は呼ばない）
+  alert   : 前回以降の新着から HIGH 候補だけをモデルに渡し、HIGH の記事のみ返す（10〜15分ごと）
+  backfill: 指定期間の記事を時間窓ごとに並列処理し、チェックポイントから再開できる（backfill.py）
+  batch_submit / batch_collect: 昼の記事をバッチ推論ジョブで事前に処理する（batch_inference.py。BATCH_BACKEND 設定時）
+
+digest（morning / noon）は取得・重複排除・選定を先に行い、選定済みの記事を1回の生成で処理する
+（DIGEST_BATCH_SIZE で1回の生成の記事数を指定できる。DIGEST_PIPELINE=tool で従来のツール呼び出し方式）。
+digest・alert とも、HIGH の記事は記事ページの本文を取得して2回目のモデル呼び出しで要約を充実させる（enrichment.py）。
 """
 
 import json
 import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta, timezone
 from typing import Any
 
-import feedparser
 from bedrock_agentcore.runtime import BedrockAgentCoreApp
 from strands import Agent, tool
 
-from rss_feeds import MORNING_FEEDS, NOON_FEEDS
+import backfill
+from article_model import encode_articles, parse_articles
+from batch_inference import (
+    BATCH_BACKEND,
+    BATCH_MAX_RECORDS,
+    COMPLETED,
+    FAILED,
+    INLINE_BATCH_SIZE,
+    RUNNING,
+    assemble,
+    build_record,
+    get_backend,
+    state_key,
+)
+from alerts import advance, likely_high, load_state, new_entries, save_state
+from enrichment import (
+    ENRICH_BATCH_SIZE,
+    ENRICH_ENABLED,
+    ENRICHED_FIELDS,
+    apply_enriched,
+    fetch_page,
+    load_enriched,
+    load_pages,
+    model_input,
+    page_cache,
+    save_enriched,
+    select_targets,
+)
+from feed_health import CircuitOpenError, load_health, save_health
+from feed_pipeline import cap_articles, dedup_articles, fetch_feed, parse_feed, select_articles
+from feed_registry import get_registry
+from feed_snapshot import SNAPSHOT_RETENTION_HOURS, LocalSnapshotStore, get_snapshot_store, load_recent, prefetch
+from profiling import NULL_PROFILER, get_profiler
+from prompts import BATCH_SYSTEM_PROMPT, ENRICH_SYSTEM_PROMPT, PROMPT_VERSION, SYSTEM_PROMPT, system_blocks
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = BedrockAgentCoreApp()
+snapshot_store = get_snapshot_store()  # SNAPSHOT_BUCKET / SNAPSHOT_DIR 未設定なら None
 
 FETCH_HOURS = 25    # 取得対象の時間範囲（少し余裕を持たせる）
 MAX_ARTICLES = 30   # Claudeに渡す最大記事数
+ALERT_BATCH_SIZE = 10  # alert モードで1回のモデル呼び出しに渡す候補数
+# digest の進め方
+#   direct: 取得・重複排除・選定を先に Python で行い、記事をメッセージに入れて1回の生成で翻訳・要約する
+#   tool  : モデルに fetch_recent_articles ツールを呼ばせる（ツール呼び出しの判断とツール結果を含む再送で生成が2回になる）
+DIGEST_PIPELINE = os.environ.get("DIGEST_PIPELINE", "direct")
+# direct の1回の生成に入れる記事数（0 は選定した記事をすべて1回で）
+DIGEST_BATCH_SIZE = int(os.environ.get("DIGEST_BATCH_SIZE", "0"))
 
-SYSTEM_PROMPT = """
-あなたはAWSの最新情報を日本語でまとめるアシスタントです。
-
-fetch_recent_articles ツールで記事一覧を取得し、各記事を以下のルールで処理してください。
-
-## 処理ルール
-1. タイトルを自然な日本語に翻訳する（AWS Japan Blog はそのまま使用）
-2. 重要度を以下の基準で判定する
-   - HIGH  : セキュリティ脆弱性・新サービスリリース・大型アップデート
-   - MEDIUM: 既存サービスの機能追加・価格変更・リージョン展開
-   - LOW   : ブログ記事・事例紹介・パートナー情報
-3. 元のカテゴリラベルをそのまま使用する
-4. 各記事について以下の3点を日本語で記述する
-   - summary_ja : 何が発表されたかの概要（1〜2文）
-   - change     : 従来との変更点・今回新しくなった点（1〜2文）。従来の情報がない場合は「新規リリース」と記載
-   - benefit    : このアップデートによってユーザーが得られる具体的なメリット（1〜2文）
-
-## 出力形式
-JSON配列のみを返してください。前置き・後書き・コードブロック記号は不要です。
-
-[
-  {
-    "category": "カテゴリ名",
-    "title_ja": "日本語タイトル",
-    "summary_ja": "何が発表されたかの概要",
-    "change": "従来との変更点・新しくなった点",
-    "benefit": "ユーザーが得られる具体的なメリット",
-    "importance": "HIGH | MEDIUM | LOW",
-    "link": "https://..."
-  }
-]
-
-記事が0件の場合は空配列 [] を返してください。
-""".strip()
-
-
-def _parse_entry_datetime(entry: Any) -> datetime | None:
-    """エントリの公開日時を取得する。published_parsed → updated_parsed の順で試みる。"""
-    for attr in ("published_parsed", "updated_parsed"):
-        parsed = getattr(entry, attr, None) or entry.get(attr)
-        if parsed:
-            try:
-                return datetime(*parsed[:6], tzinfo=timezone.utc)
-            except (ValueError, TypeError):
-                continue
-    return None
+
+def _now() -> datetime:
+    """現在時刻（UTC）。record/replay ハーネスは記録時の時刻に差し替える。"""
+    return datetime.now(timezone.utc)
 
 
-def _build_fetch_tool(feeds: dict[str, str]):
+def _new_agent(tools: list, system_prompt: str) -> Agent:
+    """
+    Agent を生成する。record/replay ハーネスはここでモデルを差し替える。
+    システムプロンプトの末尾にキャッシュポイントを置き、静的な前置き（ツール定義・システムプロンプト）を再利用させる。
+    """
+    return Agent(tools=tools, system_prompt=system_blocks(system_prompt))
+
+
+class StageTimer:
+    """ステージ別の所要時間（ms）を累積する。同名ステージは合算する。"""
+
+    def __init__(self):
+        self.stages_ms: dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.stages_ms[name] = self.stages_ms.get(name, 0.0) + elapsed
+
+    def rounded(self) -> dict[str, int]:
+        return {k: round(v) for k, v in self.stages_ms.items()}
+
+
+def _feeds_for(mode: str) -> dict[str, str]:
+    """モードの対象フィード。レジストリに登録のないモードは従来どおり noon のフィードを使う。"""
+    feeds = get_registry().feeds_for(mode)
+    if not feeds:
+        logger.warning("レジストリに mode=%s のフィードがないため noon のフィードを使います", mode)
+        feeds = get_registry().feeds_for("noon")
+    return feeds
+
+
+def _collect_articles(feeds: dict[str, str], timer: StageTimer, health, limit: int) -> list[dict]:
+    """FETCH_HOURS 以内の記事をスナップショット（なければフィード）から集め、重複排除して limit 件に選定する。"""
+    now = _now()
+    cutoff = now - timedelta(hours=FETCH_HOURS)
+    articles = []
+
+    registry = get_registry()
+    for category, url in feeds.items():
+        policy = registry.policy(category)
+        try:
+            if snapshot_store is not None:
+                with timer.stage("snapshot"):
+                    cached = load_recent(snapshot_store, url, cutoff, _now())
+                if cached is not None:
+                    articles.extend(cap_articles(cached, policy))
+                    continue
+            with timer.stage("fetch"):
+                body = health.call(category, lambda: fetch_feed(url, policy["timeout"]), now, policy)
+            with timer.stage("parse"):
+                articles.extend(cap_articles(parse_feed(category, body, cutoff, policy), policy))
+        except CircuitOpenError:
+            continue
+        except Exception as e:
+            logger.warning("フィード取得エラー [%s]: %s", url, e)
+            continue
+
+    with timer.stage("dedup"):
+        articles = dedup_articles(articles)
+    with timer.stage("select"):
+        return select_articles(articles, limit)
+
+
+def _build_fetch_tool(feeds: dict[str, str], timer: StageTimer, health, profiler=NULL_PROFILER):
     """指定フィード一覧を使うfetch_recent_articlesツールを生成する。"""
 
     @tool
@@ -85,45 +163,40 @@ def _build_fetch_tool(feeds: dict[str, str]):
         AWS RSSフィードから過去24時間以内に公開された記事を取得して返す。
         返却値はJSON文字列（記事の配列）。
         """
-        cutoff = datetime.now(timezone.utc) - timedelta(hours=FETCH_HOURS)
-        articles = []
-
-        for category, url in feeds.items():
-            try:
-                feed = feedparser.parse(url)
-                for entry in feed.entries:
-                    pub_dt = _parse_entry_datetime(entry)
-                    if pub_dt is None or pub_dt <= cutoff:
-                        continue
-                    articles.append({
-                        "category": category,
-                        "title": entry.get("title", ""),
-                        "summary": entry.get("summary", entry.get("description", "")),
-                        "link": entry.get("link", ""),
-                        "published": pub_dt.isoformat(),
-                    })
-            except Exception as e:
-                logger.warning("フィード取得エラー [%s]: %s", url, e)
-                continue
+        with profiler.span("fetch_tool"):
+            articles = _collect_articles(feeds, timer, health, MAX_ARTICLES)
 
-        if len(articles) > MAX_ARTICLES:
-            priority = ["What's New", "Security", "AWS News", "Machine Learning"]
-            articles = sorted(
-                articles,
-                key=lambda a: priority.index(a["category"]) if a["category"] in priority else len(priority)
-            )[:MAX_ARTICLES]
-
-        logger.info("取得記事数: %d件", len(articles))
-        return json.dumps(articles, ensure_ascii=False)
+            logger.info("取得記事数: %d件", len(articles))
+            with timer.stage("serialize"):
+                return json.dumps(articles, ensure_ascii=False)
 
     return fetch_recent_articles
 
 
+def _usage_from_result(result: Any) -> dict[str, int]:
+    """
+    AgentResult の累積トークン使用量を取り出す。取得できない場合は 0。
+    input_tokens はキャッシュされなかった入力。キャッシュから読んだ分・キャッシュに書いた分は別に数える。
+    """
+    usage = getattr(getattr(result, "metrics", None), "accumulated_usage", None) or {}
+    return {
+        "input_tokens":             int(usage.get("inputTokens", 0)),
+        "output_tokens":            int(usage.get("outputTokens", 0)),
+        "total_tokens":             int(usage.get("totalTokens", 0)),
+        "cache_read_input_tokens":  int(usage.get("cacheReadInputTokens", 0)),
+        "cache_write_input_tokens": int(usage.get("cacheWriteInputTokens", 0)),
+    }
+
+
 def _parse_result(result: Any) -> list:
     """AgentResult から記事リストを取り出す。"""
     msg = result.message if hasattr(result, "message") else {}
     raw = msg.get("content", [{}])[0].get("text", "") if isinstance(msg, dict) else str(msg)
+    return _parse_text(raw)
 
+
+def _parse_text(raw: str) -> list:
+    """モデルの応答テキストから記事リストを取り出す。"""
     try:
         return json.loads(raw)
     except json.JSONDecodeError:
@@ -134,28 +207,449 @@ def _parse_result(result: Any) -> list:
         return []
 
 
+def _validated(items: list) -> list[dict]:
+    """モデルが返した記事を検証・正規化する（不正な要素は捨てる。article_model.py）。"""
+    return [a.to_dict() for a in parse_articles(items)]
+
+
+def _parse_articles(result: Any) -> list[dict]:
+    """AgentResult から翻訳・要約済みの記事を取り出して検証する。"""
+    return _validated(_parse_result(result))
+
+
+def _add_usage(total: dict[str, int], usage: dict[str, int]) -> None:
+    for k, v in usage.items():
+        total[k] = total.get(k, 0) + v
+
+
+def _enrich(articles: list, timer: StageTimer, profiler=NULL_PROFILER) -> dict[str, Any]:
+    """
+    HIGH の記事だけ本文を取得し、2回目のモデル呼び出しで summary_ja・change・benefit を書き直す（articles を更新する）。
+    本文が同じ記事は以前の結果を使う。失敗しても1段階目の結果はそのまま返す。
+    """
+    stats: dict[str, Any] = {"enriched": 0, "llm_batches_ms": [], "usage": {}}
+    targets = select_targets(articles) if ENRICH_ENABLED else []
+    if not targets:
+        return stats
+
+    cache = page_cache(snapshot_store)
+    try:
+        with timer.stage("enrich_fetch"), profiler.span("enrich_fetch"):
+            pages = load_pages(cache, targets, _now(), fetch_page)
+
+        pending = []
+        for a in targets:
+            page = pages.get(a["link"])
+            if page is None:
+                continue
+            cached = load_enriched(cache, page["sha256"])
+            if cached is not None:
+                stats["enriched"] += apply_enriched(a, cached)
+            else:
+                pending.append((a, page))
+
+        for i in range(0, len(pending), ENRICH_BATCH_SIZE):
+            batch = pending[i:i + ENRICH_BATCH_SIZE]
+            agent = _new_agent(tools=[], system_prompt=ENRICH_SYSTEM_PROMPT)
+            t = time.perf_counter()
+            with profiler.span("enrich_llm"):
+                result = agent(json.dumps([model_input(a, page) for a, page in batch], ensure_ascii=False))
+            stats["llm_batches_ms"].append(round((time.perf_counter() - t) * 1000))
+            _add_usage(stats["usage"], _usage_from_result(result))
+
+            by_link = {r.get("link"): r for r in _parse_result(result) if isinstance(r, dict)}
+            for a, page in batch:
+                fields = by_link.get(a["link"])
+                if fields and apply_enriched(a, fields):
+                    save_enriched(cache, page["sha256"], {k: a[k] for k in ENRICHED_FIELDS})
+                    stats["enriched"] += 1
+    except Exception as e:
+        logger.warning("本文による要約の充実化に失敗しました（1段階目の結果を使います）: %s", e)
+
+    logger.info("充実化: HIGH %d件中 %d件（モデル呼び出し %d回）",
+                len(targets), stats["enriched"], len(stats["llm_batches_ms"]))
+    return stats
+
+
+def _generate_direct(feeds: dict[str, str], timer: StageTimer, health,
+                     profiler=NULL_PROFILER) -> tuple[list[dict], dict[str, int], list[int]]:
+    """
+    取得・重複排除・選定を先に行い、選定済みの記事をメッセージに入れて1回の生成で翻訳・要約する
+    （DIGEST_BATCH_SIZE 指定時はその件数ずつ）。
+    (記事リスト, トークン使用量, 生成ごとの LLM 時間 ms) を返す。記事がなければモデルを呼ばない。
+    """
+    with profiler.span("fetch"):
+        articles = _collect_articles(feeds, timer, health, MAX_ARTICLES)
+    logger.info("取得記事数: %d件", len(articles))
+    if DIGEST_BATCH_SIZE < 0:
+        raise ValueError(f"DIGEST_BATCH_SIZE は 0 以上を指定してください: {DIGEST_BATCH_SIZE}")
+    if not articles:
+        return [], _usage_from_result(None), []
+
+    results: list[dict] = []
+    usage = _usage_from_result(None)
+    batches_ms: list[int] = []
+    size = DIGEST_BATCH_SIZE or len(articles)
+    for i in range(0, len(articles), size):
+        with timer.stage("serialize"):
+            message = json.dumps(articles[i:i + size], ensure_ascii=False)
+        agent = _new_agent(tools=[], system_prompt=BATCH_SYSTEM_PROMPT)
+        start = time.perf_counter()
+        with profiler.span("agent_call"):
+            result = agent(message)
+        batches_ms.append(round((time.perf_counter() - start) * 1000))
+        _add_usage(usage, _usage_from_result(result))
+        with timer.stage("parse_result"):
+            results.extend(_parse_articles(result))
+    return results, usage, batches_ms
+
+
+def _generate_with_tool(feeds: dict[str, str], timer: StageTimer, health,
+                        profiler=NULL_PROFILER) -> tuple[list[dict], dict[str, int], list[int]]:
+    """モデルに fetch_recent_articles ツールを呼ばせて翻訳・要約する（DIGEST_PIPELINE=tool）。"""
+    fetch_tool = _build_fetch_tool(feeds, timer, health, profiler)
+    agent = _new_agent(tools=[fetch_tool], system_prompt=SYSTEM_PROMPT)
+
+    start = time.perf_counter()
+    with profiler.span("agent_call"):
+        result = agent(
+            "fetch_recent_articles ツールで記事を取得し、日本語に翻訳・要約してJSON配列で返してください。"
+        )
+    # ツール実行はエージェント呼び出しの内側で行われるため、その分を差し引いて LLM 時間とする
+    tool_ms = sum(timer.stages_ms.values())
+    llm_ms = (time.perf_counter() - start) * 1000 - tool_ms
+    with timer.stage("parse_result"):
+        articles = _parse_articles(result)
+    return articles, _usage_from_result(result), [round(llm_ms)]
+
+
+def _run_digest(mode: str, profiler=NULL_PROFILER) -> dict[str, Any]:
+    """フィード取得 → エージェントで翻訳・要約 → 結果とメトリクスを返す。"""
+    if mode == "noon" and BATCH_BACKEND:
+        batched = _batched_noon()
+        if batched is not None:
+            return batched
+    feeds = _feeds_for(mode)
+    logger.info("invoke開始 mode=%s feeds=%d件 pipeline=%s", mode, len(feeds), DIGEST_PIPELINE)
+
+    timer = StageTimer()
+    health = load_health(snapshot_store)
+    generate = _generate_with_tool if DIGEST_PIPELINE == "tool" else _generate_direct
+    articles, usage, batches_ms = generate(feeds, timer, health, profiler)
+    save_health(snapshot_store, health)
+
+    enrich = _enrich(articles, timer, profiler)
+    _add_usage(usage, enrich["usage"])
+
+    stages_ms = {**timer.rounded(), "llm": sum(batches_ms)}
+    if enrich["llm_batches_ms"]:
+        stages_ms["enrich_llm"] = sum(enrich["llm_batches_ms"])
+    metrics = {
+        "stages_ms": stages_ms,
+        "llm_batches_ms": batches_ms + enrich["llm_batches_ms"],
+        "usage": usage,
+        "enriched": enrich["enriched"],
+        "pipeline": DIGEST_PIPELINE,
+        "prompt_version": PROMPT_VERSION,
+        "feed_health": health.run_metrics(),
+    }
+    logger.info("処理完了: %d件 metrics=%s", len(articles), json.dumps(metrics))
+    return {"mode": mode, "articles": encode_articles(articles), "metrics": metrics}
+
+
+def _run_prefetch() -> dict[str, Any]:
+    """朝・昼の全フィードのスナップショットを更新する。昼のバッチ推論ジョブが実行中なら完了を確認する。"""
+    if snapshot_store is None:
+        logger.warning("SNAPSHOT_BUCKET / SNAPSHOT_DIR が未設定のため prefetch をスキップします")
+        return {"mode": "prefetch", "summary": None}
+    start = time.perf_counter()
+    now = _now()
+    health = load_health(snapshot_store)
+    summary = prefetch(snapshot_store, get_registry().all_feeds(), now, health=health)
+    save_health(snapshot_store, health)
+    summary["duration_ms"] = round((time.perf_counter() - start) * 1000)
+    if BATCH_BACKEND:
+        try:
+            batch = _collect_batch(now)
+            summary["batch"] = batch["status"] if batch else None
+        except Exception as e:
+            logger.warning("バッチ推論ジョブの確認に失敗しました: %s", e)
+    return {"mode": "prefetch", "summary": summary, "metrics": {"feed_health": health.run_metrics()}}
+
+
+# ─────────────────────────────────────────────────────────
+# 昼の digest のバッチ推論（batch_inference.py）
+# ─────────────────────────────────────────────────────────
+
+def _batch_runner(model_input: dict) -> dict:
+    """local バックエンドで1レコードを処理する（_new_agent を通すため replay・テストの差し替えが効く）。"""
+    result = _new_agent(tools=[], system_prompt=model_input["system"])(model_input["messages"][0]["content"][0]["text"])
+    usage = _usage_from_result(result)
+    return {
+        "content": [{"type": "text", "text": json.dumps(_parse_result(result), ensure_ascii=False)}],
+        "usage":   {"input_tokens": usage["input_tokens"], "output_tokens": usage["output_tokens"]},
+    }
+
+
+def _translate_inline(articles: list[dict]) -> tuple[list, dict[str, int]]:
+    """バッチ推論を使わずに INLINE_BATCH_SIZE 件ずつ処理する。"""
+    results: list = []
+    usage: dict[str, int] = {}
+    for i in range(0, len(articles), INLINE_BATCH_SIZE):
+        agent = _new_agent(tools=[], system_prompt=BATCH_SYSTEM_PROMPT)
+        result = agent(json.dumps(articles[i:i + INLINE_BATCH_SIZE], ensure_ascii=False))
+        results.extend(_parse_articles(result))
+        _add_usage(usage, _usage_from_result(result))
+    return results, usage
+
+
+def _run_batch_submit() -> dict[str, Any]:
+    """
+    noon のフィードから記事を集め、1記事1レコードのバッチ推論ジョブとして投入する（1日1回。失敗した日は再投入できる）。
+    レコード数がバックエンドの最小件数に満たない場合は、MAX_ARTICLES 件に選定してその場で処理する。
+    """
+    backend = get_backend(_batch_runner)
+    if backend is None or snapshot_store is None:
+        logger.warning("BATCH_BACKEND / SNAPSHOT_BUCKET が未設定のため batch_submit をスキップします")
+        return {"mode": "batch_submit", "status": None}
+
+    now = _now()
+    key = state_key(now)
+    state = snapshot_store.get(key)
+    if state is not None and state["status"] != FAILED:
+        logger.info("本日のバッチ推論は投入済みです: status=%s", state["status"])
+        return {"mode": "batch_submit", "status": state["status"], "records": state["records"]}
+
+    timer = StageTimer()
+    health = load_health(snapshot_store)
+    articles = _collect_articles(_feeds_for("noon"), timer, health, BATCH_MAX_RECORDS)
+    save_health(snapshot_store, health)
+
+    state = {"backend": backend.name, "submitted_at": now.isoformat(), "records": len(articles),
+             "prompt_version": PROMPT_VERSION}
+    usage: dict[str, int] = {}
+    if len(articles) < backend.min_records:
+        logger.info("記事 %d件がバッチ推論の最小件数 %d件に満たないため、その場で処理します",
+                    len(articles), backend.min_records)
+        results, usage = _translate_inline(select_articles(articles, MAX_ARTICLES))
+        enrich = _enrich(results, timer)
+        _add_usage(usage, enrich["usage"])
+        state.update({"status": COMPLETED, "backend": "inline", "articles": results, "usage": usage,
+                      "enriched": enrich["enriched"], "completed_at": now.isoformat()})
+    else:
+        inputs = {f"a{i:04d}": a for i, a in enumerate(articles)}
+        job_name = f"aws-digest-noon-{now:%Y%m%d-%H%M%S}"
+        state.update({
+            "status": RUNNING,
+            "job_id": backend.submit(job_name, [build_record(rid, a) for rid, a in inputs.items()]),
+            "inputs": {rid: {"link": a["link"], "category": a["category"]} for rid, a in inputs.items()},
+        })
+        logger.info("バッチ推論ジョブを投入しました: %s（%d レコード）", state["job_id"], len(articles))
+    snapshot_store.put(key, state)
+    return {
+        "mode": "batch_submit",
+        "status": state["status"],
+        "records": len(articles),
+        "metrics": {"usage": usage, "feed_health": health.run_metrics()},
+    }
+
+
+def _collect_batch(now: datetime) -> dict | None:
+    """今日のジョブが実行中なら状態を確認し、完了していれば結果を記事リストにして保存する。今日の状態を返す。"""
+    backend = get_backend(_batch_runner)
+    if backend is None or snapshot_store is None:
+        return None
+    key = state_key(now)
+    state = snapshot_store.get(key)
+    if state is None or state["status"] != RUNNING:
+        return state
+
+    status = backend.poll(state["job_id"])
+    if status == RUNNING:
+        return state
+    if status == COMPLETED:
+        articles, usage, failed = assemble(backend.collect(state["job_id"]), state["inputs"], MAX_ARTICLES, _parse_text)
+        articles = _validated(articles)
+        enrich = _enrich(articles, StageTimer())
+        _add_usage(usage, enrich["usage"])
+        state.update({"status": COMPLETED, "articles": articles, "usage": usage, "failed_records": failed,
+                      "enriched": enrich["enriched"], "completed_at": now.isoformat()})
+        logger.info("バッチ推論ジョブ完了: %d件（失敗レコード %d件）", len(articles), failed)
+    else:
+        state["status"] = FAILED
+        logger.error("バッチ推論ジョブ失敗: %s — 昼の digest はその場で処理します", state["job_id"])
+    snapshot_store.put(key, state)
+    return state
+
+
+def _batched_noon() -> dict[str, Any] | None:
+    """今日のバッチ推論の結果があれば昼の digest の結果として返す。なければ None（その場で処理する）。"""
+    try:
+        state = _collect_batch(_now())
+    except Exception as e:
+        logger.warning("バッチ推論の結果を取得できませんでした: %s", e)
+        return None
+    if state is None or state["status"] != COMPLETED:
+        logger.warning("本日のバッチ推論の結果がありません（status=%s）— その場で処理します",
+                       state["status"] if state else None)
+        return None
+    metrics = {
+        "stages_ms": {},
+        "llm_batches_ms": [],
+        "usage": state.get("usage", {}),
+        "enriched": state.get("enriched", 0),
+        "prompt_version": state.get("prompt_version"),
+        "batch": {"backend": state["backend"], "records": state["records"],
+                  "failed_records": state.get("failed_records", 0)},
+    }
+    logger.info("バッチ推論の結果を使用: %d件 metrics=%s", len(state["articles"]), json.dumps(metrics))
+    return {"mode": "noon", "articles": encode_articles(state["articles"]), "metrics": metrics}
+
+
+def _run_alert(profiler=NULL_PROFILER) -> dict[str, Any]:
+    """
+    速報対象フィードを条件付き GET で更新し、ウォーターマーク以降の新着から HIGH 候補を判定する。
+    モデル呼び出しは候補 ALERT_BATCH_SIZE 件ごとに1回で、新着がなければ呼ばない。
+    """
+    if snapshot_store is None:
+        logger.warning("SNAPSHOT_BUCKET / SNAPSHOT_DIR が未設定のため alert をスキップします")
+        return {"mode": "alert", "articles": [], "metrics": {}}
+
+    now = _now()
+    alert_feeds = get_registry().feeds_for("alert")
+    timer = StageTimer()
+    health = load_health(snapshot_store)
+    with timer.stage("fetch"), profiler.span("prefetch"):
+        # 速報は遅れが許されないため、ポーリング間隔の学習によらず毎回取得する
+        prefetch(snapshot_store, alert_feeds, now, adaptive=False, health=health)
+    save_health(snapshot_store, health)
+
+    with timer.stage("filter"):
+        state = load_state(snapshot_store)
+        retention_cutoff = now - timedelta(hours=SNAPSHOT_RETENTION_HOURS)
+        fresh_by_feed: dict[str, list] = {}
+        candidates = []
+        new_count = 0
+        for url in alert_feeds.values():
+            entries = load_recent(snapshot_store, url, retention_cutoff, now)
+            if entries is None:
+                continue  # 取得に失敗したフィードはウォーターマークを進めず次回に回す
+            fresh = new_entries(state, url, entries, now)
+            new_count += len(fresh)
+            candidates.extend(a for a in fresh if likely_high(a))
+            fresh_by_feed[url] = entries
+        candidates = dedup_articles(candidates)
+
+    high: list = []
+    usage = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+    llm_batches_ms = []
+    for i in range(0, len(candidates), ALERT_BATCH_SIZE):
+        batch = candidates[i:i + ALERT_BATCH_SIZE]
+        agent = _new_agent(tools=[], system_prompt=BATCH_SYSTEM_PROMPT)
+        t = time.perf_counter()
+        with profiler.span("agent_call"):
+            result = agent(json.dumps(batch, ensure_ascii=False))
+        llm_batches_ms.append(round((time.perf_counter() - t) * 1000))
+        high.extend(a for a in _parse_articles(result) if a["importance"] == "HIGH")
+        _add_usage(usage, _usage_from_result(result))
+    llm_ms = sum(llm_batches_ms)
+
+    enrich = _enrich(high, timer, profiler)
+    _add_usage(usage, enrich["usage"])
+    llm_batches_ms.extend(enrich["llm_batches_ms"])
+
+    # Slack 投稿は handler 側で行う。投稿に失敗しても再送はしない（同じ速報が重複して届くよりよい）
+    # モデル呼び出しが失敗した場合は例外でここに来ないため、次回同じ新着を再処理する
+    for url, entries in fresh_by_feed.items():
+        advance(state, url, entries, now)
+    save_state(snapshot_store, state)
+
+    stages_ms = {**timer.rounded(), "llm": llm_ms}
+    if enrich["llm_batches_ms"]:
+        stages_ms["enrich_llm"] = sum(enrich["llm_batches_ms"])
+    metrics = {
+        "stages_ms": stages_ms,
+        "llm_batches_ms": llm_batches_ms,
+        "usage": usage,
+        "enriched": enrich["enriched"],
+        "prompt_version": PROMPT_VERSION,
+        "new_entries": new_count,
+        "candidates": len(candidates),
+        "feed_health": health.run_metrics(),
+    }
+    logger.info("alert 完了: HIGH %d件 metrics=%s", len(high), json.dumps(metrics))
+    return {"mode": "alert", "articles": encode_articles(high), "metrics": metrics}
+
+
+def _run_backfill(payload: dict[str, Any]) -> dict[str, Any]:
+    """
+    payload の start / end（ISO 8601。タイムゾーンなしは UTC）の期間をバックフィルする。
+    end を省略した場合は最初の invoke の時刻までとし、チェックポイントに保存した end で再開する。
+    source は対象フィードのモード（デフォルト "noon"、"all" で全フィード）。
+    ack は handler が配信を終えたチャンク ID。budget_s=0 では ack の反映だけを行う。
+    """
+    def utc(value: str) -> datetime:
+        t = datetime.fromisoformat(value)
+        return (t if t.tzinfo else t.replace(tzinfo=timezone.utc)).astimezone(timezone.utc)
+
+    start = utc(payload["start"])
+    end = utc(payload["end"]) if payload.get("end") else None
+    source = payload.get("source", "noon")
+    chunk_hours = int(payload.get("chunk_hours", backfill.BACKFILL_CHUNK_HOURS))
+    store = snapshot_store or LocalSnapshotStore(os.environ.get("BACKFILL_DIR", "/tmp/backfill"))
+
+    registry = get_registry()
+    feeds = registry.all_feeds() if source == "all" else _feeds_for(source)
+    job = backfill.load_job(store, source, start, end, chunk_hours, now=_now())
+    end = datetime.fromisoformat(job["end"])
+    logger.info("backfill 開始: job=%s %s〜%s source=%s 進捗=%s",
+                job["job_id"], start.isoformat(), end.isoformat(), source, backfill.progress(job))
+
+    usage: dict[str, int] = {}
+    usage_lock = threading.Lock()
+
+    def translate(batch: list[dict]) -> list[dict]:
+        result = _new_agent(tools=[], system_prompt=BATCH_SYSTEM_PROMPT)(json.dumps(batch, ensure_ascii=False))
+        with usage_lock:
+            _add_usage(usage, _usage_from_result(result))
+        return _parse_articles(result)
+
+    budget_s = float(payload.get("budget_s", backfill.BACKFILL_TIME_BUDGET_S))
+    pending = budget_s > 0 and any(c["status"] == "pending" for c in job["chunks"].values())
+    articles = backfill.collect_entries(feeds, start, end, registry.policy, fetch_feed) if pending else []
+    result = backfill.run(store, job, articles, translate, ack=payload.get("ack"), budget_s=budget_s)
+    logger.info("backfill: job=%s status=%s 進捗=%s", job["job_id"], result["status"], result["progress"])
+    return {"mode": "backfill", **result, "metrics": {"usage": usage, "prompt_version": PROMPT_VERSION}}
+
+
 @app.entrypoint
 def invoke(payload: dict[str, Any], context: Any) -> dict[str, Any]:
     """
     AgentCore エントリーポイント
 
     payload:
-      mode: "morning" | "noon"  （デフォルト: "morning"）
+      mode   : "morning" | "noon" | "prefetch" | "alert" | "backfill" | "batch_submit" | "batch_collect"
+               （デフォルト: "morning"）
+      start / end / source / chunk_hours / ack / budget_s: backfill モードのみ（_run_backfill を参照）
+      profile: true で cProfile / tracemalloc による計測を有効化（環境変数 DIGEST_PROFILE でも可）
+      run_id : プロファイル出力の ID（handler から渡され、両者の出力を対応付ける）
     """
     mode = payload.get("mode", "morning")
-    feeds = MORNING_FEEDS if mode == "morning" else NOON_FEEDS
-    logger.info("invoke開始 mode=%s feeds=%d件", mode, len(feeds))
-
-    fetch_tool = _build_fetch_tool(feeds)
-    agent = Agent(tools=[fetch_tool], system_prompt=SYSTEM_PROMPT)
-
-    result = agent(
-        "fetch_recent_articles ツールで記事を取得し、日本語に翻訳・要約してJSON配列で返してください。"
-    )
-
-    articles = _parse_result(result)
-    logger.info("処理完了: %d件", len(articles))
-    return {"mode": mode, "articles": articles}
+    if mode == "prefetch":
+        return _run_prefetch()
+    if mode == "backfill":
+        return _run_backfill(payload)
+    if mode == "batch_submit":
+        return _run_batch_submit()
+    if mode == "batch_collect":
+        state = _collect_batch(_now())
+        return {"mode": "batch_collect", "status": state["status"] if state else None}
+    profiler = get_profiler(payload, "agent")
+    with profiler:
+        result = _run_alert(profiler) if mode == "alert" else _run_digest(mode, profiler)
+    if profiler.enabled:
+        result["profile_run_id"] = profiler.run_id
+    return result
 
 
 if __name__ == "__main__":
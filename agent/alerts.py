@@ -0,0 +1,85 @@
+"""
+重要アップデート速報（alert モード）の差分判定と事前フィルタ
+
+フィードごとのウォーターマーク（処理済みの最新公開日時）をスナップショットストアに保存し、
+それより新しいエントリだけを対象にする。公開日時が遅れて付くエントリに備えて、
+ウォーターマークから ALERT_GRACE_HOURS 以内は処理済みリンクの一覧で重複を除く。
+
+モデルに渡す前に、キーワードと ALAS の深刻度で HIGH になりそうなものだけに絞る（likely_high）。
+"""
+
+import re
+from datetime import datetime, timedelta
+
+STATE_KEY = "snapshots/alerts/state.json"  # エージェントのロールは snapshots/ 配下のみ読み書きできる
+
+ALERT_GRACE_HOURS = 2           # ウォーターマークより前でも未処理なら対象にする幅
+ALERT_INITIAL_LOOKBACK_MIN = 60  # 初回実行時に遡る範囲（過去分をまとめて通知しない）
+
+# ALAS は件名に深刻度が入る（例: "ALAS-2026-001 (important): openssl"）
+_ALAS_SEVERITY = re.compile(r"\((critical|important)\)", re.IGNORECASE)
+_SECURITY = re.compile(
+    r"\b(CVE-\d{4}-\d+|vulnerabilit(y|ies)|security (bulletin|advisory|issue)|zero-day|exploit(ed|ation)?)\b",
+    re.IGNORECASE,
+)
+_LAUNCH = re.compile(
+    r"\b(announc(es|ing)|introduc(es|ing)|launch(es|ing)?|generally available|general availability|new service)\b",
+    re.IGNORECASE,
+)
+# リージョン展開は MEDIUM（処理ルールの基準）なので候補から外す
+_REGION_EXPANSION = re.compile(r"\b(now available in|additional (AWS )?regions?|expands? to)\b", re.IGNORECASE)
+
+
+def likely_high(article: dict) -> bool:
+    """処理ルールで HIGH（セキュリティ脆弱性・新サービス・大型アップデート）になりそうか。"""
+    title = article.get("title", "")
+    if article.get("category") == "Amazon Linux Security":
+        return bool(_ALAS_SEVERITY.search(title))
+    if _SECURITY.search(title) or _SECURITY.search(article.get("summary", "")[:500]):
+        return True
+    if _REGION_EXPANSION.search(title):
+        return False
+    return bool(_LAUNCH.search(title))
+
+
+def _key(article: dict) -> str:
+    return article["link"] or article["title"]
+
+
+def new_entries(state: dict, url: str, entries: list[dict], now: datetime) -> list[dict]:
+    """フィードのエントリのうち、前回までに処理していないものを返す。"""
+    feed_state = state["feeds"].get(url)
+    if feed_state is None:
+        floor, seen = now - timedelta(minutes=ALERT_INITIAL_LOOKBACK_MIN), set()
+    else:
+        floor = datetime.fromisoformat(feed_state["watermark"]) - timedelta(hours=ALERT_GRACE_HOURS)
+        seen = set(feed_state["seen"])
+    return [
+        a for a in entries
+        if datetime.fromisoformat(a["published"]) > floor and _key(a) not in seen
+    ]
+
+
+def advance(state: dict, url: str, entries: list[dict], now: datetime) -> None:
+    """処理後にウォーターマークを進め、猶予範囲内のリンクを処理済みとして記録する。"""
+    feed_state = state["feeds"].get(url)
+    if feed_state is not None:
+        watermark = datetime.fromisoformat(feed_state["watermark"])
+    else:
+        watermark = now - timedelta(minutes=ALERT_INITIAL_LOOKBACK_MIN)
+    for a in entries:
+        watermark = max(watermark, datetime.fromisoformat(a["published"]))
+
+    floor = watermark - timedelta(hours=ALERT_GRACE_HOURS)
+    state["feeds"][url] = {
+        "watermark": watermark.isoformat(),
+        "seen": [_key(a) for a in entries if datetime.fromisoformat(a["published"]) > floor],
+    }
+
+
+def load_state(store) -> dict:
+    return store.get(STATE_KEY) or {"feeds": {}}
+
+
+def save_state(store, state: dict) -> None:
+    store.put(STATE_KEY, state)
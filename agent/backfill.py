@@ -0,0 +1,199 @@
+"""
+過去期間のバックフィル（backfill モード）
+
+障害後の取りこぼしや新しいチャンネルの立ち上げ時に、[start, end) の記事をまとめて翻訳・要約する。
+期間を BACKFILL_CHUNK_HOURS ごとの時間窓（チャンク）に分け、BACKFILL_CONCURRENCY 並列で処理する。
+1チャンクの記事は BACKFILL_BATCH_SIZE 件ずつモデルに渡すため、1回のモデル呼び出し・メモリ上の結果は
+チャンク単位に収まる。結果はチャンクごとにストアへ書き出し、チェックポイントを更新する。
+
+1回の invoke は BACKFILL_TIME_BUDGET_S で処理を切り上げる。同じ期間で再度呼ぶと（job_id は期間から決まる）
+未処理のチャンクから再開する。end を省略した場合は job_id を (source, start, chunk_hours) で決め、
+最初の invoke の時刻を end としてチェックポイントに保存する（再実行しても期間・ジョブが変わらない）。配信（Slack 投稿・アーカイブ）は handler が行い、配信済みのチャンクを
+次回の invoke の "ack" で返す。配信済みになるまで、処理済みチャンクは毎回の応答に含める（少なくとも1回の配信）。
+
+保存先（スナップショットストア。未設定時は BACKFILL_DIR のローカルディレクトリ）:
+  snapshots/backfill/{job_id}/checkpoint.json  : {"job_id", "source", "start", "end", "chunk_hours", "chunks": {...}}
+  snapshots/backfill/{job_id}/{chunk_id}.json  : チャンクの処理結果（記事リスト）
+
+取得元は RSS フィードのため、フィードに残っていない古い記事は対象にならない。
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable
+
+from feed_pipeline import dedup_articles, fetch_feed, parse_feed
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_CHUNK_HOURS   = 6
+BACKFILL_BATCH_SIZE    = 10    # 1回のモデル呼び出しに渡す記事数
+BACKFILL_CONCURRENCY   = 3     # 並列に処理するチャンク数（Bedrock のスロットリングを避ける）
+BACKFILL_TIME_BUDGET_S = int(os.environ.get("BACKFILL_TIME_BUDGET_S", "480"))  # payload に budget_s がない場合（handler は残り時間から決めて渡す）
+BACKFILL_RETURN_CHUNKS = 20    # 1回の応答で返す未配信チャンク数の上限
+
+
+def job_id(source: str, start: datetime, end: datetime | None, chunk_hours: int) -> str:
+    raw = f"{source}|{start.isoformat()}|{end.isoformat() if end else 'open'}|{chunk_hours}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def chunk_windows(start: datetime, end: datetime, chunk_hours: int) -> list[tuple[datetime, datetime]]:
+    windows, t = [], start
+    while t < end:
+        windows.append((t, min(t + timedelta(hours=chunk_hours), end)))
+        t += timedelta(hours=chunk_hours)
+    return windows
+
+
+def _chunk_id(window_start: datetime) -> str:
+    return window_start.strftime("%Y%m%dT%H%M")
+
+
+# ─────────────────────────────────────────────────────────
+# チェックポイント
+# ─────────────────────────────────────────────────────────
+
+def _checkpoint_key(job: str) -> str:
+    return f"snapshots/backfill/{job}/checkpoint.json"
+
+
+def _output_key(job: str, chunk: str) -> str:
+    return f"snapshots/backfill/{job}/{chunk}.json"
+
+
+def load_job(store, source: str, start: datetime, end: datetime | None, chunk_hours: int,
+             now: datetime | None = None) -> dict:
+    """
+    チェックポイントを読み込む。なければ全チャンクを未処理として作る。
+    end=None のジョブは作成時に end を now に決め、以降はチェックポイントの end を使う。
+    """
+    job = job_id(source, start, end, chunk_hours)
+    checkpoint = store.get(_checkpoint_key(job))
+    if checkpoint is not None:
+        return checkpoint
+    end = end or now
+    return {
+        "job_id":      job,
+        "source":      source,
+        "start":       start.isoformat(),
+        "end":         end.isoformat(),
+        "chunk_hours": chunk_hours,
+        "chunks": {
+            _chunk_id(ws): {"start": ws.isoformat(), "end": we.isoformat(), "status": "pending", "articles": 0}
+            for ws, we in chunk_windows(start, end, chunk_hours)
+        },
+    }
+
+
+def progress(job: dict) -> dict[str, int]:
+    counts = {"total": len(job["chunks"]), "pending": 0, "done": 0, "delivered": 0}
+    for c in job["chunks"].values():
+        counts[c["status"]] += 1
+    return counts
+
+
+# ─────────────────────────────────────────────────────────
+# 取得
+# ─────────────────────────────────────────────────────────
+
+def collect_entries(feeds: dict[str, str], start: datetime, end: datetime, policy_for: Callable[[str], dict],
+                    fetch=fetch_feed) -> list[dict]:
+    """
+    各フィードを1回だけ取得し、[start, end) の記事を公開日時順に返す。
+    フィード本体はパース後すぐに捨て、保持するのは期間内の記事 dict だけ。
+    すべてのフィードの取得に失敗した場合は、空のチャンクを処理済みにしないよう例外を送出する。
+    """
+    articles, failed = [], 0
+    for category, url in feeds.items():
+        policy = policy_for(category)
+        try:
+            body = fetch(url, policy["timeout"])
+        except Exception as e:
+            logger.warning("フィード取得エラー [%s]: %s", url, e)
+            failed += 1
+            continue
+        articles.extend(
+            a for a in parse_feed(category, body, start, policy)
+            if datetime.fromisoformat(a["published"]) < end
+        )
+    if feeds and failed == len(feeds):
+        raise RuntimeError(f"バックフィル: 全 {failed} フィードの取得に失敗しました")
+    articles = dedup_articles(articles)
+    articles.sort(key=lambda a: a["published"])
+    return articles
+
+
+def _slice(articles: list[dict], window_start: datetime, window_end: datetime) -> list[dict]:
+    keys = [a["published"] for a in articles]
+    lo = bisect_left(keys, window_start.isoformat())
+    hi = bisect_left(keys, window_end.isoformat())
+    return articles[lo:hi]
+
+
+# ─────────────────────────────────────────────────────────
+# 実行
+# ─────────────────────────────────────────────────────────
+
+def run(store, job: dict, articles: list[dict], translate: Callable[[list[dict]], list[dict]],
+        ack: list[str] | None = None, budget_s: float = BACKFILL_TIME_BUDGET_S) -> dict:
+    """
+    未処理のチャンクを並列に処理し、チャンクごとにチェックポイントを保存する。
+    budget_s を過ぎたら新しいチャンクには着手しない（処理中のものは書き終える）。budget_s <= 0 なら ack の反映だけを行う。
+    ack（配信済みのチャンク ID）を反映したうえで、未配信のチャンクの結果を返す。
+    """
+    lock = threading.Lock()
+    deadline = time.monotonic() + budget_s
+
+    def save():
+        store.put(_checkpoint_key(job["job_id"]), job)
+
+    for chunk in ack or []:
+        if job["chunks"].get(chunk, {}).get("status") == "done":
+            job["chunks"][chunk]["status"] = "delivered"
+    save()
+
+    def process(chunk: str) -> None:
+        if time.monotonic() >= deadline:
+            return
+        meta = job["chunks"][chunk]
+        window = _slice(articles, datetime.fromisoformat(meta["start"]), datetime.fromisoformat(meta["end"]))
+        results = []
+        try:
+            for i in range(0, len(window), BACKFILL_BATCH_SIZE):
+                results.extend(translate(window[i:i + BACKFILL_BATCH_SIZE]))
+        except Exception as e:
+            logger.warning("バックフィル チャンク失敗 [%s]: %s — 次回の invoke で再処理します", chunk, e)
+            return
+        if results:
+            store.put(_output_key(job["job_id"], chunk), {"chunk": chunk, **meta, "articles": results})
+        with lock:
+            # 記事のないチャンクは配信するものがないため、そのまま配信済みにする
+            meta.update({"status": "done" if results else "delivered", "articles": len(results)})
+            save()
+        logger.info("バックフィル チャンク完了 [%s]: 入力 %d件 → %d件", chunk, len(window), len(results))
+
+    pending = sorted(c for c, meta in job["chunks"].items() if meta["status"] == "pending") if budget_s > 0 else []
+    with ThreadPoolExecutor(max_workers=BACKFILL_CONCURRENCY) as pool:
+        list(pool.map(process, pending))
+
+    undelivered = sorted(c for c, meta in job["chunks"].items() if meta["status"] == "done")
+    chunks = []
+    for chunk in undelivered[:BACKFILL_RETURN_CHUNKS]:
+        output = store.get(_output_key(job["job_id"], chunk))
+        if output is not None:
+            chunks.append(output)
+    counts = progress(job)
+    return {
+        "job_id":   job["job_id"],
+        "end":      job["end"],
+        "status":   "done" if counts["delivered"] == counts["total"] else "running",
+        "progress": counts,
+        "chunks":   chunks,
+    }
@@ -0,0 +1,226 @@
+"""
+昼の digest のバッチ推論
+
+昼（noon）の技術ブログまとめは急ぎではないため、午前中に集めた記事を1記事1レコードのバッチ推論ジョブとして投入し、
+12時までに結果をストアに集めておく。昼の digest は集めた結果を返すだけでモデルを呼ばない。
+オンデマンドの呼び出しよりトークン単価が安く、記事の多い日もスロットリングを受けにくい。
+
+  submit : batch_submit モード（午前のスケジュール）。noon のフィードから記事を集めて投入する
+           レコード数がバックエンドの最小件数（Bedrock は BATCH_MIN_RECORDS）に満たない日は、
+           その場で通常の呼び出しで処理して結果を保存する（昼の時点では同じく処理済みになる）
+  poll / collect : prefetch のたびに（または batch_collect モードで）ジョブの状態を確認し、完了していれば
+           出力を記事リストにしてストアに保存する
+  noon   : 今日の結果が完了していればそれを返す。未完了・失敗の場合は従来どおりその場で処理する
+
+バックエンド（BATCH_BACKEND）:
+  bedrock : Bedrock のバッチ推論（CreateModelInvocationJob）。入出力は S3 の BATCH_PREFIX 配下の JSONL
+  local   : ローカルディレクトリ（BATCH_DIR）。ポーリング時に runner で各レコードを処理し、
+            Bedrock と同じ形式の出力ファイルを書く（テスト・開発用）
+  未設定  : バッチ推論を使わない
+
+ジョブの状態（スナップショットストア）:
+  snapshots/batch/noon/{JST日付}.json : {"status", "backend", "job_id", "records", "inputs", "articles", "usage", ...}
+  status は running（ジョブ実行中）/ completed（articles に結果あり）/ failed（昼はその場で処理する）
+"""
+
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from prompts import BATCH_SYSTEM_PROMPT
+
+logger = logging.getLogger(__name__)
+
+BATCH_BACKEND     = os.environ.get("BATCH_BACKEND", "")
+BATCH_MODEL_ID    = os.environ.get("BATCH_MODEL_ID", "us.anthropic.claude-3-5-sonnet-20241022-v2:0")
+BATCH_ROLE_ARN    = os.environ.get("BATCH_ROLE_ARN", "")   # Bedrock が S3 の入出力を読み書きするサービスロール
+BATCH_BUCKET      = os.environ.get("BATCH_BUCKET") or os.environ.get("SNAPSHOT_BUCKET", "")
+BATCH_PREFIX      = "snapshots/batch/io"
+BATCH_DIR         = os.environ.get("BATCH_DIR", "/tmp/batch")
+BATCH_MIN_RECORDS = 100    # Bedrock のバッチ推論ジョブの最小レコード数
+BATCH_MAX_RECORDS = 300    # 1ジョブに入れる記事数の上限（超えた分は relevance のスコアで切る）
+BATCH_MAX_TOKENS  = 1024   # 1記事分の出力の上限
+INLINE_BATCH_SIZE = 10     # 最小件数に満たずその場で処理する場合の1回のモデル呼び出しの記事数
+
+_JST = timezone(timedelta(hours=9))
+
+RUNNING, COMPLETED, FAILED = "running", "completed", "failed"
+
+
+def state_key(now: datetime) -> str:
+    return f"snapshots/batch/noon/{now.astimezone(_JST):%Y-%m-%d}.json"
+
+
+# ─────────────────────────────────────────────────────────
+# レコード（Bedrock のバッチ推論の入出力形式）
+# ─────────────────────────────────────────────────────────
+
+def build_record(record_id: str, article: dict) -> dict:
+    """1記事を1レコードにする。modelInput は InvokeModel（Anthropic Messages）の本文と同じ。"""
+    return {
+        "recordId": record_id,
+        "modelInput": {
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": BATCH_MAX_TOKENS,
+            "system": BATCH_SYSTEM_PROMPT,
+            "messages": [{
+                "role": "user",
+                "content": [{"type": "text", "text": json.dumps([article], ensure_ascii=False)}],
+            }],
+        },
+    }
+
+
+def parse_output_line(line: str) -> tuple[str, str | None, dict[str, int]]:
+    """出力の1行を (recordId, 応答テキスト, トークン使用量) にする。失敗したレコードのテキストは None。"""
+    data = json.loads(line)
+    output = data.get("modelOutput") or {}
+    if data.get("error") or not output.get("content"):
+        logger.warning("バッチ推論のレコード失敗 [%s]: %s", data.get("recordId"), data.get("error"))
+        return data.get("recordId", ""), None, {}
+    usage = output.get("usage", {})
+    return data["recordId"], output["content"][0].get("text", ""), {
+        "input_tokens":  usage.get("input_tokens", 0),
+        "output_tokens": usage.get("output_tokens", 0),
+        "total_tokens":  usage.get("input_tokens", 0) + usage.get("output_tokens", 0),
+    }
+
+
+# ─────────────────────────────────────────────────────────
+# バックエンド
+# ─────────────────────────────────────────────────────────
+
+class BedrockBatchBackend:
+    name = "bedrock"
+    min_records = BATCH_MIN_RECORDS
+
+    _STATUS = {
+        "Completed": COMPLETED, "PartiallyCompleted": COMPLETED,
+        "Failed": FAILED, "Stopped": FAILED, "Stopping": FAILED, "Expired": FAILED,
+    }
+
+    def __init__(self, bucket: str, role_arn: str, model_id: str = BATCH_MODEL_ID):
+        import boto3
+
+        if not bucket or not role_arn:
+            raise ValueError("BATCH_BUCKET（または SNAPSHOT_BUCKET）と BATCH_ROLE_ARN が必要です")
+        self._s3       = boto3.client("s3")
+        self._bedrock  = boto3.client("bedrock")
+        self._bucket   = bucket
+        self._role_arn = role_arn
+        self._model_id = model_id
+
+    def submit(self, job_name: str, records: list[dict]) -> str:
+        key = f"{BATCH_PREFIX}/{job_name}/input.jsonl"
+        body = "\n".join(json.dumps(r, ensure_ascii=False) for r in records).encode("utf-8")
+        self._s3.put_object(Bucket=self._bucket, Key=key, Body=body)
+        resp = self._bedrock.create_model_invocation_job(
+            jobName=job_name,
+            roleArn=self._role_arn,
+            modelId=self._model_id,
+            inputDataConfig={"s3InputDataConfig": {"s3Uri": f"s3://{self._bucket}/{key}", "s3InputFormat": "JSONL"}},
+            outputDataConfig={"s3OutputDataConfig": {"s3Uri": f"s3://{self._bucket}/{BATCH_PREFIX}/{job_name}/output/"}},
+        )
+        return resp["jobArn"]
+
+    def poll(self, job_id: str) -> str:
+        status = self._bedrock.get_model_invocation_job(jobIdentifier=job_id)["status"]
+        return self._STATUS.get(status, RUNNING)
+
+    def collect(self, job_id: str) -> list[str]:
+        """出力の JSONL（{jobId}/input.jsonl.out）の行を返す。"""
+        uri = self._bedrock.get_model_invocation_job(jobIdentifier=job_id)["outputDataConfig"]["s3OutputDataConfig"]["s3Uri"]
+        prefix = uri[len(f"s3://{self._bucket}/"):]
+        lines = []
+        for page in self._s3.get_paginator("list_objects_v2").paginate(Bucket=self._bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                if obj["Key"].endswith(".jsonl.out"):
+                    body = self._s3.get_object(Bucket=self._bucket, Key=obj["Key"])["Body"].read()
+                    lines.extend(line for line in body.decode("utf-8").splitlines() if line.strip())
+        return lines
+
+
+class LocalBatchBackend:
+    """
+    ローカルディレクトリのバックエンド。runner(modelInput) -> modelOutput で各レコードを処理する。
+    最初の poll で全レコードを処理して完了にする（ジョブの投入と完了が別の呼び出しになる点は Bedrock と同じ）。
+    """
+    name = "local"
+    min_records = 0
+
+    def __init__(self, root: str, runner: Callable[[dict], dict]):
+        self.root = root
+        self._runner = runner
+
+    def _path(self, job_id: str, name: str) -> str:
+        return os.path.join(self.root, job_id, name)
+
+    def submit(self, job_name: str, records: list[dict]) -> str:
+        os.makedirs(os.path.join(self.root, job_name), exist_ok=True)
+        with open(self._path(job_name, "input.jsonl"), "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        return job_name
+
+    def poll(self, job_id: str) -> str:
+        if os.path.exists(self._path(job_id, "input.jsonl.out")):
+            return COMPLETED
+        tmp = self._path(job_id, "input.jsonl.out.tmp")
+        with open(self._path(job_id, "input.jsonl"), encoding="utf-8") as src, open(tmp, "w", encoding="utf-8") as out:
+            for line in src:
+                record = json.loads(line)
+                try:
+                    record["modelOutput"] = self._runner(record["modelInput"])
+                except Exception as e:
+                    record["error"] = {"errorMessage": str(e)}
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp, self._path(job_id, "input.jsonl.out"))
+        return COMPLETED
+
+    def collect(self, job_id: str) -> list[str]:
+        with open(self._path(job_id, "input.jsonl.out"), encoding="utf-8") as f:
+            return [line for line in f if line.strip()]
+
+
+def get_backend(runner: Callable[[dict], dict] | None = None):
+    """BATCH_BACKEND に応じたバックエンド。未設定なら None（バッチ推論を使わない）。"""
+    if BATCH_BACKEND == "bedrock":
+        return BedrockBatchBackend(BATCH_BUCKET, BATCH_ROLE_ARN)
+    if BATCH_BACKEND == "local":
+        if runner is None:
+            raise ValueError("local バックエンドには runner が必要です")
+        return LocalBatchBackend(BATCH_DIR, runner)
+    return None
+
+
+# ─────────────────────────────────────────────────────────
+# 結果の組み立て
+# ─────────────────────────────────────────────────────────
+
+_IMPORTANCE_ORDER = {"HIGH": 0, "MEDIUM": 1, "LOW": 2}
+
+
+def assemble(lines: list[str], inputs: dict[str, dict], limit: int,
+             parse: Callable[[str], list]) -> tuple[list[dict], dict[str, int], int]:
+    """
+    出力行を記事リストにし、重要度の高い順（同じ重要度は投入時の順）に limit 件を返す。
+    (記事リスト, トークン使用量の合計, 失敗したレコード数) を返す。
+    """
+    order = {record_id: i for i, record_id in enumerate(inputs)}
+    usage: dict[str, int] = {}
+    results, failed = [], 0
+    for line in lines:
+        record_id, text, record_usage = parse_output_line(line)
+        for k, v in record_usage.items():
+            usage[k] = usage.get(k, 0) + v
+        articles = parse(text) if text is not None else []
+        if not articles:
+            failed += 1
+            continue
+        article = articles[0]
+        article.setdefault("link", inputs.get(record_id, {}).get("link", ""))
+        article.setdefault("category", inputs.get(record_id, {}).get("category", ""))
+        results.append((order.get(record_id, len(order)), article))
+    results.sort(key=lambda r: (_IMPORTANCE_ORDER.get(r[1].get("importance"), 3), r[0]))
+    return [a for _, a in results[:limit]], usage, failed
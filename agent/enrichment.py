@@ -0,0 +1,251 @@
+"""
+HIGH 記事の本文による要約の充実化（2段階目）
+
+1段階目（RSS の概要だけで翻訳・重要度判定）の結果のうち HIGH の記事だけ、記事ページを取得して本文を抽出し、
+2回目のモデル呼び出しで summary_ja・change・benefit を書き直す。コストは HIGH の件数にだけ比例する。
+
+  取得  : urllib3 の PoolManager（ホストごとに ENRICH_PER_HOST 本まで接続を再利用）を
+          ENRICH_CONCURRENCY 並列で使う
+  抽出  : HTMLParser で <article> / <main>（なければ body）の段落・見出し・箇条書きだけを拾い、
+          空白を詰めて ENRICH_MAX_CHARS 文字に収める
+  キャッシュ（スナップショットストアの snapshots/pages/ 配下。ストアがない場合はプロセス内）:
+    urls/{url_key}.json            : URL → 本文のハッシュ（PAGE_TTL_HOURS 以内は再取得しない）
+    text/{sha256}.json             : 抽出済み本文（内容で引く。同じ本文は1回だけ保存）
+    enriched/{sha256}-{prompt}.json: 本文とプロンプトの組に対する2段階目の結果（alert と digest で重複しても1回で済む）
+"""
+
+import hashlib
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from html.parser import HTMLParser
+
+import urllib3
+
+from feed_pipeline import USER_AGENT
+from prompts import ENRICH_SYSTEM_PROMPT, prompt_version
+
+logger = logging.getLogger(__name__)
+
+ENRICH_ENABLED     = os.environ.get("ENRICH_HIGH", "true").lower() == "true"
+ENRICH_MAX_ITEMS   = 10     # 1回の実行で充実化する HIGH 記事の上限
+ENRICH_BATCH_SIZE  = 5      # 2段階目の1回のモデル呼び出しに渡す記事数（本文が長いため小さめ）
+ENRICH_CONCURRENCY = 4
+ENRICH_PER_HOST    = 2      # 同一ホストへの同時接続数
+ENRICH_TIMEOUT     = 10     # 秒
+ENRICH_MAX_BYTES   = 2 * 1024 * 1024
+ENRICH_MAX_CHARS   = 4000   # モデルに渡す本文の最大文字数
+PAGE_TTL_HOURS     = 24
+
+PROMPT_KEY = prompt_version(ENRICH_SYSTEM_PROMPT)
+
+_http = urllib3.PoolManager(
+    num_pools=16,
+    maxsize=ENRICH_PER_HOST,
+    block=True,  # 接続がすべて使用中なら空くまで待つ（ホストごとの同時接続数の上限）
+    headers={"User-Agent": USER_AGENT},
+    timeout=urllib3.Timeout(total=ENRICH_TIMEOUT),
+    # total は転送も含めて数えるため上限にせず、接続・読み込みの再試行と転送を別々に制限する
+    retries=urllib3.Retry(total=None, connect=1, read=1, redirect=3, backoff_factor=0.5),
+)
+
+
+# ─────────────────────────────────────────────────────────
+# 取得・抽出
+# ─────────────────────────────────────────────────────────
+
+def fetch_page(url: str, timeout: float = ENRICH_TIMEOUT) -> bytes:
+    """記事ページを取得する（ENRICH_MAX_BYTES で打ち切る）。"""
+    if not url.startswith(("https://", "http://")):
+        raise ValueError(f"unsupported url: {url}")
+    resp = _http.request("GET", url, preload_content=False, timeout=urllib3.Timeout(total=timeout))
+    try:
+        if resp.status != 200:
+            raise OSError(f"HTTP {resp.status}")
+        return resp.read(ENRICH_MAX_BYTES)
+    finally:
+        resp.release_conn()
+
+
+class _MainTextParser(HTMLParser):
+    """<article> / <main> / <body> 内の段落・見出し・箇条書きのテキストを集める。"""
+
+    SKIP  = {"script", "style", "noscript", "nav", "header", "footer", "aside", "form", "svg", "template"}
+    BLOCK = {"p", "h1", "h2", "h3", "h4", "li", "td", "pre", "blockquote"}
+    ROOTS = ("article", "main", "body")
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks: dict[str, list[str]] = {root: [] for root in self.ROOTS}
+        self._open_roots: list[str] = []
+        self._skip_depth = 0
+        self._buf: list[str] | None = None
+        self._buf_tag = ""  # 入れ子のブロック（li 内の p など）は外側の閉じタグでまとめる
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skip_depth += 1
+        elif tag in self.ROOTS:
+            self._open_roots.append(tag)
+        elif tag in self.BLOCK and self._buf is None:
+            self._buf, self._buf_tag = [], tag
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self.ROOTS and tag in self._open_roots:
+            self._open_roots.remove(tag)
+        elif tag == self._buf_tag and self._buf is not None:
+            text = " ".join("".join(self._buf).split())
+            if text:
+                for root in set(self._open_roots):
+                    self.blocks[root].append(text)
+            self._buf = None
+
+    def handle_data(self, data):
+        if self._buf is not None and not self._skip_depth:
+            self._buf.append(data)
+
+
+def extract_main_text(html: str, max_chars: int = ENRICH_MAX_CHARS) -> str:
+    """HTML から本文を抽出し、重複行を除いて max_chars 文字に詰める。"""
+    parser = _MainTextParser()
+    parser.feed(html)
+    parser.close()
+    blocks = next((parser.blocks[r] for r in _MainTextParser.ROOTS if parser.blocks[r]), [])
+
+    seen, lines, remaining = set(), [], max_chars  # remaining は区切りの改行も含めた残り文字数
+    for text in blocks:
+        if len(text) < 3 or text in seen:
+            continue
+        seen.add(text)
+        if lines:
+            remaining -= 1
+        if remaining <= 0:
+            break
+        if len(text) > remaining:
+            lines.append(text[:remaining])
+            break
+        lines.append(text)
+        remaining -= len(text)
+    return "\n".join(lines)
+
+
+def _decode(body: bytes) -> str:
+    head = body[:2048].decode("ascii", errors="ignore")
+    m = re.search(r'charset=["\']?([\w-]+)', head, re.IGNORECASE)
+    try:
+        return body.decode(m.group(1) if m else "utf-8", errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
+
+
+# ─────────────────────────────────────────────────────────
+# キャッシュ
+# ─────────────────────────────────────────────────────────
+
+class _MemoryStore:
+    """スナップショットストアがない場合のキャッシュ（ウォームなプロセスの間だけ保持）。"""
+
+    def __init__(self):
+        self._data: dict[str, dict] = {}
+
+    def get(self, key: str) -> dict | None:
+        return self._data.get(key)
+
+    def put(self, key: str, data: dict) -> None:
+        self._data[key] = data
+
+
+_memory_store = _MemoryStore()
+
+
+def page_cache(store):
+    return store if store is not None else _memory_store
+
+
+def _url_key(url: str) -> str:
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+
+
+def load_page(store, url: str, now: datetime, fetch=fetch_page) -> dict | None:
+    """
+    記事の本文を {"sha256", "text"} で返す。PAGE_TTL_HOURS 以内に取得済みならネットワークに出ない。
+    本文が抽出できない・取得に失敗した場合は None。
+    """
+    index = store.get(f"snapshots/pages/urls/{_url_key(url)}.json")
+    if index and now - datetime.fromisoformat(index["fetched_at"]) < timedelta(hours=PAGE_TTL_HOURS):
+        cached = store.get(f"snapshots/pages/text/{index['sha256']}.json")
+        if cached is not None:
+            return {"sha256": index["sha256"], "text": cached["text"]}
+
+    try:
+        text = extract_main_text(_decode(fetch(url, ENRICH_TIMEOUT)))
+    except Exception as e:
+        logger.warning("記事ページ取得エラー [%s]: %s", url, e)
+        return None
+    if not text:
+        logger.info("本文を抽出できませんでした [%s]", url)
+        return None
+
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    if index is None or index["sha256"] != digest:
+        store.put(f"snapshots/pages/text/{digest}.json", {"url": url, "text": text})
+    store.put(f"snapshots/pages/urls/{_url_key(url)}.json", {"sha256": digest, "fetched_at": now.isoformat()})
+    return {"sha256": digest, "text": text}
+
+
+def load_pages(store, articles: list[dict], now: datetime, fetch=fetch_page) -> dict[str, dict]:
+    """記事ごとの本文を {link: {"sha256", "text"}} で返す（取得できなかったものは含まない）。"""
+    with ThreadPoolExecutor(max_workers=ENRICH_CONCURRENCY) as pool:
+        pages = pool.map(lambda a: load_page(store, a["link"], now, fetch), articles)
+        return {a["link"]: page for a, page in zip(articles, pages) if page is not None}
+
+
+def _enriched_key(digest: str) -> str:
+    return f"snapshots/pages/enriched/{digest}-{PROMPT_KEY}.json"
+
+
+def load_enriched(store, digest: str) -> dict | None:
+    return store.get(_enriched_key(digest))
+
+
+def save_enriched(store, digest: str, fields: dict) -> None:
+    store.put(_enriched_key(digest), fields)
+
+
+# ─────────────────────────────────────────────────────────
+# 2段階目の入出力
+# ─────────────────────────────────────────────────────────
+
+ENRICHED_FIELDS = ("summary_ja", "change", "benefit")
+
+
+def select_targets(articles: list[dict]) -> list[dict]:
+    """充実化の対象（リンクのある HIGH 記事、先頭から ENRICH_MAX_ITEMS 件）。"""
+    return [a for a in articles if a.get("importance") == "HIGH" and a.get("link")][:ENRICH_MAX_ITEMS]
+
+
+def model_input(article: dict, page: dict) -> dict:
+    """2段階目のモデルに渡す1記事分。"""
+    return {
+        "link":       article["link"],
+        "title_ja":   article.get("title_ja", ""),
+        "summary_ja": article.get("summary_ja", ""),
+        "change":     article.get("change", ""),
+        "benefit":    article.get("benefit", ""),
+        "body":       page["text"],
+    }
+
+
+def apply_enriched(article: dict, fields: dict) -> bool:
+    """モデルの出力（またはキャッシュ）を記事に反映する。空の項目は元の記述を残す。"""
+    updated = False
+    for key in ENRICHED_FIELDS:
+        value = fields.get(key)
+        if isinstance(value, str) and value.strip():
+            article[key] = value.strip()
+            updated = True
+    return updated
@@ -0,0 +1,212 @@
+"""
+フィードごとの健全性とサーキットブレーカー・ヘッジ付きリトライ
+
+フィード取得を FeedHealth.call() で包み、以下を行う。
+
+  サーキットブレーカー: BREAKER_FAILURES 回続けて失敗したフィードはクールダウン中は取得しない
+                        （応答しないフィードで毎回タイムアウトまで待たない）。
+                        クールダウン明けの1回で成功すれば閉じ、失敗すればクールダウンを倍にして開き直す
+  ヘッジ付きリトライ  : 優先度が HEDGE_MIN_PRIORITY 以上のフィードは、1本目が遅い・失敗した場合に
+                        2本目のリクエストを出し、先に成功した方を使う
+
+状態（ブレーカー・最終成功時刻・レイテンシの EWMA）はスナップショットストアの STATE_KEY に保存する。
+ストアがない場合はプロセス内に保持する。
+実行ごとの観測値（成功・失敗・スキップ件数、レイテンシ）は run_metrics() でメトリクスに含め、
+handler が日次ロールアップに集計する（週次レポートのフィード健全性セクション）。
+"""
+
+import logging
+import threading
+import time
+import urllib.error
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import Callable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+STATE_KEY = "snapshots/health/state.json"  # エージェントのロールは snapshots/ 配下のみ読み書きできる
+
+BREAKER_FAILURES = 3              # 連続失敗がこの回数に達したらブレーカーを開く
+BREAKER_COOLDOWN_MIN = 30         # 最初のクールダウン（開き直すたびに倍）
+BREAKER_MAX_COOLDOWN_MIN = 360
+HEDGE_MIN_PRIORITY = 3            # レジストリの priority がこれ以上のフィードをヘッジする
+HEDGE_DELAY_FACTOR = 3            # 2本目を出すまでの待ち時間 = レイテンシ EWMA × この倍率
+HEDGE_MIN_DELAY_S = 0.5
+HEDGE_MAX_DELAY_S = 5.0           # 履歴がない場合もこの値
+LATENCY_EWMA_ALPHA = 0.3
+
+_hedge_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+_memory_state: dict = {"feeds": {}}  # ストアがない場合の状態（ウォームなプロセスの間だけ保持）
+
+
+class CircuitOpenError(Exception):
+    """ブレーカーが開いているため取得しなかった。"""
+
+
+def _retryable(error: BaseException) -> bool:
+    """4xx は再送しても結果が変わらないのでヘッジしない。"""
+    return not (isinstance(error, urllib.error.HTTPError) and 400 <= error.code < 500)
+
+
+def hedged_call(fn: Callable[[], T], delay_s: float) -> tuple[T, bool]:
+    """
+    fn を実行し、delay_s 以内に成功しなければ（または先に失敗したら）2本目を出す。
+    (結果, 2本目を出したか) を返す。両方失敗した場合は最後の例外を送出する。
+    """
+    first = _hedge_pool.submit(fn)
+    done, _ = wait([first], timeout=delay_s)
+    if done:
+        error = first.exception()
+        if error is None:
+            return first.result(), False
+        if not _retryable(error):
+            raise error
+        pending = {_hedge_pool.submit(fn)}
+    else:
+        pending = {first, _hedge_pool.submit(fn)}
+
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for f in done:
+            error = f.exception()
+            if error is None:
+                return f.result(), True  # 遅い方はソケットのタイムアウトで自然に終わる
+    raise error
+
+
+class FeedHealth:
+    """フィードごとの状態（永続化する）と今回の実行の観測値を持つ。複数スレッドから呼ばれる。"""
+
+    def __init__(self, state: dict | None = None):
+        self.state = state or {"feeds": {}}
+        self.observations: dict[str, dict] = {}
+        self._touched: set[str] = set()
+        self._lock = threading.Lock()
+
+    def _feed(self, name: str) -> dict:
+        return self.state["feeds"].setdefault(name, {
+            "consecutive_failures": 0,
+            "open_until":           None,
+            "cooldown_min":         0,
+            "last_success":         None,
+            "last_error":           None,
+            "last_error_at":        None,
+            "latency_ewma_ms":      None,
+        })
+
+    def _observe(self, name: str) -> dict:
+        return self.observations.setdefault(name, {
+            "ok": 0, "errors": 0, "skipped": 0, "hedged": 0, "latency_ms": [],
+        })
+
+    def allow(self, name: str, now: datetime) -> tuple[bool, str]:
+        """今回取得してよいか。クールダウン中なら False と理由を返す。"""
+        with self._lock:
+            feed = self._feed(name)
+            if feed["open_until"] and now < datetime.fromisoformat(feed["open_until"]):
+                return False, (
+                    f"連続失敗 {feed['consecutive_failures']}回のためクールダウン中"
+                    f"（{datetime.fromisoformat(feed['open_until']):%H:%M} まで, 直近: {feed['last_error']}）"
+                )
+            return True, ""
+
+    def record(self, name: str, now: datetime, latency_ms: float,
+               error: BaseException | None = None, hedged: bool = False) -> None:
+        with self._lock:
+            self._touched.add(name)
+            feed, obs = self._feed(name), self._observe(name)
+            obs["latency_ms"].append(round(latency_ms))
+            obs["hedged"] += int(hedged)
+            if error is None:
+                obs["ok"] += 1
+                ewma = feed["latency_ewma_ms"]
+                feed.update({
+                    "consecutive_failures": 0,
+                    "open_until":           None,
+                    "cooldown_min":         0,
+                    "last_success":         now.isoformat(),
+                    "latency_ewma_ms": round(
+                        latency_ms if ewma is None
+                        else LATENCY_EWMA_ALPHA * latency_ms + (1 - LATENCY_EWMA_ALPHA) * ewma
+                    ),
+                })
+                return
+
+            obs["errors"] += 1
+            feed["consecutive_failures"] += 1
+            feed["last_error"] = f"{type(error).__name__}: {error}"[:200]
+            feed["last_error_at"] = now.isoformat()
+            if feed["consecutive_failures"] >= BREAKER_FAILURES:
+                cooldown = min(max(feed["cooldown_min"] * 2, BREAKER_COOLDOWN_MIN), BREAKER_MAX_COOLDOWN_MIN)
+                feed["cooldown_min"] = cooldown
+                feed["open_until"] = (now + timedelta(minutes=cooldown)).isoformat()
+                logger.warning("サーキットブレーカー開 [%s]: 連続失敗 %d回, %d分間スキップ",
+                               name, feed["consecutive_failures"], cooldown)
+
+    def hedge_delay_s(self, name: str) -> float:
+        ewma = self._feed(name)["latency_ewma_ms"]
+        if ewma is None:
+            return HEDGE_MAX_DELAY_S
+        return min(max(ewma * HEDGE_DELAY_FACTOR / 1000, HEDGE_MIN_DELAY_S), HEDGE_MAX_DELAY_S)
+
+    def call(self, name: str, fn: Callable[[], T], now: datetime, policy: dict) -> T:
+        """
+        ブレーカーを確認してから fn（フィード取得）を実行し、結果を記録する。
+        クールダウン中は CircuitOpenError を送出する。
+        """
+        allowed, reason = self.allow(name, now)
+        if not allowed:
+            with self._lock:
+                self._observe(name)["skipped"] += 1
+            logger.info("取得スキップ [%s]: %s", name, reason)
+            raise CircuitOpenError(reason)
+
+        hedge = policy.get("priority", 0) >= HEDGE_MIN_PRIORITY
+        start = time.perf_counter()
+        try:
+            if hedge:
+                result, hedged = hedged_call(fn, self.hedge_delay_s(name))
+            else:
+                result, hedged = fn(), False
+        except Exception as e:
+            self.record(name, now, (time.perf_counter() - start) * 1000, error=e)
+            raise
+        self.record(name, now, (time.perf_counter() - start) * 1000, hedged=hedged)
+        if hedged:
+            logger.info("ヘッジ付きリトライで取得 [%s]", name)
+        return result
+
+    def run_metrics(self) -> dict[str, dict]:
+        """今回の実行の観測値と、フィードの最終成功時刻・直近のエラー。"""
+        with self._lock:
+            return {
+                name: {
+                    **obs,
+                    "last_success":  self.state["feeds"][name]["last_success"],
+                    "last_error":    self.state["feeds"][name]["last_error"],
+                    "circuit_open":  self.state["feeds"][name]["open_until"] is not None,
+                }
+                for name, obs in self.observations.items()
+            }
+
+
+def load_health(store) -> FeedHealth:
+    if store is None:
+        return FeedHealth(_memory_state)
+    return FeedHealth(store.get(STATE_KEY))
+
+
+def save_health(store, health: FeedHealth) -> None:
+    """
+    今回取得したフィードの状態だけを書き戻す。
+    prefetch と alert が近い時刻に動いても、互いの取得していないフィードの状態は上書きしない。
+    """
+    if store is None or not health._touched:
+        return
+    latest = store.get(STATE_KEY) or {"feeds": {}}
+    for name in health._touched:
+        latest["feeds"][name] = health.state["feeds"][name]
+    store.put(STATE_KEY, latest)
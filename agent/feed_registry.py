@@ -0,0 +1 @@
+../shared/feed_registry.py
\ No newline at end of file
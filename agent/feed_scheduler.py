@@ -0,0 +1,60 @@
+"""
+フィードごとの適応的なポーリング間隔
+
+prefetch のたびに全フィードを取得する代わりに、各フィードの公開ペースを学習して
+「次に新着が出そうな時刻」まで取得を見送る。
+
+  公開ペース rate（件/時）: 直近 RATE_WINDOW_HOURS の公開件数から求め、ポーリングごとに EWMA で平滑化する
+  ポーリング間隔           : POLL_TARGET_ITEMS 件の新着が見込める時間。[POLL_MIN_INTERVAL_MIN, POLL_MAX_INTERVAL_MIN] に収める
+
+状態はフィードのスナップショット（feed_snapshot.py）の "poll" に保存する:
+  {"rate_per_hour", "interval_min", "polled_at", "next_poll_at"}
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+POLL_MIN_INTERVAL_MIN = int(os.environ.get("POLL_MIN_INTERVAL_MIN", "15"))   # prefetch の実行間隔と揃える
+POLL_MAX_INTERVAL_MIN = int(os.environ.get("POLL_MAX_INTERVAL_MIN", "360"))  # 更新の少ないフィードでも6時間に1回は見る
+POLL_TARGET_ITEMS = 0.5   # 1回のポーリングで見込む新着件数
+POLL_EWMA_ALPHA = 0.3     # 新しい観測の重み
+RATE_WINDOW_HOURS = 48
+
+
+def should_poll(poll: dict | None, now: datetime) -> tuple[bool, str]:
+    """今回取得するかどうかと、その理由を返す。"""
+    if not poll:
+        return True, "履歴なし"
+    next_poll_at = datetime.fromisoformat(poll["next_poll_at"])
+    # prefetch は POLL_MIN_INTERVAL_MIN ごとに動くため、予定時刻に最も近い回で取得する（半周期の前倒しを許す）
+    if now + timedelta(minutes=POLL_MIN_INTERVAL_MIN / 2) >= next_poll_at:
+        return True, f"予定時刻 {next_poll_at:%H:%M} に到達"
+    return False, (
+        f"rate={poll['rate_per_hour']:.2f}件/時 interval={poll['interval_min']}分"
+        f" 次回 {next_poll_at:%H:%M}"
+    )
+
+
+def observe(poll: dict | None, entries: list[dict], now: datetime) -> dict:
+    """取得結果（スナップショットの全エントリ）から公開ペースと次回の取得時刻を更新する。"""
+    window_start = now - timedelta(hours=RATE_WINDOW_HOURS)
+    recent = sum(1 for a in entries if datetime.fromisoformat(a["published"]) > window_start)
+    observed = recent / RATE_WINDOW_HOURS
+    rate = observed if not poll else POLL_EWMA_ALPHA * observed + (1 - POLL_EWMA_ALPHA) * poll["rate_per_hour"]
+
+    ideal_min = POLL_TARGET_ITEMS / rate * 60 if rate > 0 else float("inf")
+    interval = int(min(max(ideal_min, POLL_MIN_INTERVAL_MIN), POLL_MAX_INTERVAL_MIN))
+    return {
+        "rate_per_hour": round(rate, 4),
+        "interval_min":  interval,
+        "polled_at":     now.isoformat(),
+        "next_poll_at":  (now + timedelta(minutes=interval)).isoformat(),
+        "reason": (
+            f"直近{RATE_WINDOW_HOURS}時間 {recent}件 → 観測 {observed:.2f}件/時, EWMA {rate:.2f}件/時,"
+            f" {POLL_TARGET_ITEMS}件あたり {ideal_min:.0f}分 → {interval}分"
+            f"（範囲 {POLL_MIN_INTERVAL_MIN}〜{POLL_MAX_INTERVAL_MIN}分）"
+        ),
+    }
@@ -0,0 +1,210 @@
+"""
+フィードの事前取得（prefetch）とスナップショット
+
+prefetch モードで定期的にフィードを条件付き GET（ETag / Last-Modified）し、
+正規化済みの記事一覧（スナップショット）と新着分（デルタ）をストアに保存する。
+朝・昼の digest は新しいスナップショットがあればネットワークに出ずにそれを使う。
+各フィードを毎回取得するかどうかは feed_scheduler.py が公開ペースから判断する。
+
+保存先（フィード URL ごとに1ファイル）:
+  snapshots/feeds/{feed_key}.json                 : 最新スナップショット（SNAPSHOT_RETENTION_HOURS 以内の記事）
+  snapshots/deltas/{YYYYMMDDTHHMM}/{feed_key}.json : その回に新しく見つかった記事
+
+バックエンド:
+  LocalSnapshotStore : ローカルディレクトリ（SNAPSHOT_DIR）
+  S3SnapshotStore    : S3（SNAPSHOT_BUCKET）
+"""
+
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from feed_health import CircuitOpenError
+from feed_pipeline import fetch_feed_conditional, parse_feed
+from feed_registry import get_registry
+from feed_scheduler import observe, should_poll
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_RETENTION_HOURS = 48   # FETCH_HOURS より長く保持する
+SNAPSHOT_MAX_AGE_MIN = int(os.environ.get("SNAPSHOT_MAX_AGE_MIN", "30"))  # これより古いスナップショットは使わない
+PREFETCH_CONCURRENCY = 8
+
+
+def feed_key(url: str) -> str:
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+
+
+# ─────────────────────────────────────────────────────────
+# ストア
+# ─────────────────────────────────────────────────────────
+
+class LocalSnapshotStore:
+    def __init__(self, root: str):
+        self.root = root
+
+    def get(self, key: str) -> dict | None:
+        try:
+            with open(os.path.join(self.root, key), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, data: dict) -> None:
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)  # digest 側が書きかけのファイルを読まないようにする
+
+
+class S3SnapshotStore:
+    def __init__(self, bucket: str, prefix: str = ""):
+        import boto3
+
+        self._s3     = boto3.client("s3")
+        self._bucket = bucket
+        self._prefix = prefix
+
+    def get(self, key: str) -> dict | None:
+        try:
+            obj = self._s3.get_object(Bucket=self._bucket, Key=self._prefix + key)
+        except self._s3.exceptions.NoSuchKey:
+            return None
+        return json.loads(obj["Body"].read())
+
+    def put(self, key: str, data: dict) -> None:
+        self._s3.put_object(
+            Bucket=self._bucket,
+            Key=self._prefix + key,
+            Body=json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+            ContentType="application/json",
+        )
+
+
+def get_snapshot_store():
+    """環境変数からストアを生成する。未設定の場合は None（従来どおり毎回ネットワークから取得）。"""
+    bucket = os.environ.get("SNAPSHOT_BUCKET", "")
+    if bucket:
+        return S3SnapshotStore(bucket)
+    root = os.environ.get("SNAPSHOT_DIR", "")
+    if root:
+        return LocalSnapshotStore(root)
+    return None
+
+
+# ─────────────────────────────────────────────────────────
+# prefetch
+# ─────────────────────────────────────────────────────────
+
+def prefetch_feed(store, category: str, url: str, now: datetime, adaptive: bool = True,
+                  health=None) -> dict:
+    """
+    1フィードを条件付き GET し、スナップショットを更新する。結果の要約を返す。
+    adaptive=True の場合、次回の取得予定時刻より前なら取得しない。
+    health（feed_health.FeedHealth）を渡すと、ブレーカー・ヘッジ付きリトライを通して取得する。
+    """
+    key = feed_key(url)
+    snapshot = store.get(f"snapshots/feeds/{key}.json") or {"url": url, "category": category, "entries": []}
+
+    poll, reason = should_poll(snapshot.get("poll"), now)
+    if adaptive and not poll:
+        logger.info("取得見送り [%s]: %s", category, reason)
+        return {"skipped": True, "not_modified": False, "new": 0, "entries": len(snapshot["entries"])}
+
+    policy = get_registry().policy(category)
+
+    def fetch():
+        return fetch_feed_conditional(url, snapshot.get("etag"), snapshot.get("last_modified"), policy["timeout"])
+
+    body, validators = health.call(category, fetch, now, policy) if health is not None else fetch()
+    retention_cutoff = now - timedelta(hours=SNAPSHOT_RETENTION_HOURS)
+    known = {a["link"] or a["title"] for a in snapshot["entries"]}
+
+    new_entries = []
+    if body is not None:
+        # 件数上限（max_items）は digest 側で適用する。スナップショットには期間内の全件を残す
+        for a in parse_feed(category, body, retention_cutoff, policy):
+            if (a["link"] or a["title"]) not in known:
+                new_entries.append(a)
+
+    entries = new_entries + [
+        a for a in snapshot["entries"] if datetime.fromisoformat(a["published"]) > retention_cutoff
+    ]
+    entries.sort(key=lambda a: a["published"], reverse=True)
+    schedule = observe(snapshot.get("poll"), entries, now)
+    logger.info("次回取得 [%s]: %s", category, schedule.pop("reason"))
+    store.put(f"snapshots/feeds/{key}.json", {
+        "url":           url,
+        "category":      category,
+        "fetched_at":    now.isoformat(),
+        "etag":          validators["etag"],
+        "last_modified": validators["last_modified"],
+        "poll":          schedule,
+        "entries":       entries,
+    })
+    if new_entries:
+        store.put(f"snapshots/deltas/{now.strftime('%Y%m%dT%H%M')}/{key}.json", {
+            "url": url, "category": category, "fetched_at": now.isoformat(), "entries": new_entries,
+        })
+    return {"skipped": False, "not_modified": body is None, "new": len(new_entries), "entries": len(entries)}
+
+
+def prefetch(store, feeds: dict[str, str], now: datetime, adaptive: bool = True, health=None) -> dict:
+    """
+    全フィードを並列に prefetch する。失敗したフィードは前回のスナップショットを残す。
+    adaptive=False ではポーリング間隔に関係なく全フィードを取得する（alert モード用）。
+    """
+    summary = {
+        "feeds": len(feeds), "updated": 0, "not_modified": 0, "skipped": 0,
+        "circuit_open": 0, "new_entries": 0, "errors": 0,
+    }
+
+    def one(item):
+        category, url = item
+        try:
+            return prefetch_feed(store, category, url, now, adaptive, health)
+        except CircuitOpenError:
+            return {"circuit_open": True}
+        except Exception as e:
+            logger.warning("prefetch エラー [%s]: %s", url, e)
+            return None
+
+    with ThreadPoolExecutor(max_workers=PREFETCH_CONCURRENCY) as pool:
+        for result in pool.map(one, feeds.items()):
+            if result is None:
+                summary["errors"] += 1
+            elif result.get("circuit_open"):
+                summary["circuit_open"] += 1
+            elif result["skipped"]:
+                summary["skipped"] += 1
+            elif result["not_modified"]:
+                summary["not_modified"] += 1
+            else:
+                summary["updated"] += 1
+                summary["new_entries"] += result["new"]
+    logger.info("prefetch 完了: %s", json.dumps(summary))
+    return summary
+
+
+# ─────────────────────────────────────────────────────────
+# digest 側の読み出し
+# ─────────────────────────────────────────────────────────
+
+def load_recent(store, url: str, cutoff: datetime, now: datetime) -> list[dict] | None:
+    """
+    スナップショットから cutoff より新しい記事を返す。
+    スナップショットがない・SNAPSHOT_MAX_AGE_MIN より古い場合は None（呼び出し側でネットワーク取得する）。
+    ただし次回の取得予定時刻前（新着が見込めないとスケジューラが判断したフィード）は古くても使う。
+    """
+    snapshot = store.get(f"snapshots/feeds/{feed_key(url)}.json")
+    if snapshot is None or "fetched_at" not in snapshot:
+        return None
+    stale = now - datetime.fromisoformat(snapshot["fetched_at"]) > timedelta(minutes=SNAPSHOT_MAX_AGE_MIN)
+    if stale and not (snapshot.get("poll") and now < datetime.fromisoformat(snapshot["poll"]["next_poll_at"])):
+        return None
+    return [a for a in snapshot["entries"] if datetime.fromisoformat(a["published"]) > cutoff]
@@ -0,0 +1 @@
+../shared/relevance.py
\ No newline at end of file
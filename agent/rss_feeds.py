@@ -0,0 +1 @@
+../shared/rss_feeds.py
\ No newline at end of file
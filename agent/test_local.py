@@ -4,17 +4,19 @@
 Step 1: RSSフェッチのみテスト（AWS不要）
 Step 2: エージェント全体テスト（AWS認証情報が必要）
 
+Step 3: バックフィルの再開テスト（AWS・ネットワーク不要）
+
 Usage:
   .venv/bin/python test_local.py                   # Step1のみ（過去25時間）
   .venv/bin/python test_local.py --hours 200       # Step1のみ（過去200時間）
   .venv/bin/python test_local.py --full            # Step1 + Step2（過去25時間）
   .venv/bin/python test_local.py --full --hours 200  # Step1 + Step2（過去200時間）
+  .venv/bin/python test_local.py --backfill        # Step3のみ
 """
 
 import json
 import sys
 import os
-import textwrap
 from datetime import datetime, timedelta, timezone
 
 # agent.py と同じディレクトリで実行するための設定
@@ -31,8 +33,8 @@ def test_rss_fetch(hours: int = 25):
     print("=" * 60)
 
     import feedparser
-    from rss_feeds import MORNING_FEEDS, NOON_FEEDS
-    RSS_FEEDS = {**MORNING_FEEDS, **NOON_FEEDS}
+    from feed_registry import get_registry
+    RSS_FEEDS = get_registry().all_feeds()
 
     cutoff = datetime.now(timezone.utc) - timedelta(hours=hours)
     total = 0
@@ -82,9 +84,11 @@ def test_agent_full(hours: int = 25):
     print("=" * 60)
 
     from strands import Agent, tool
-    import feedparser
-    from rss_feeds import MORNING_FEEDS, NOON_FEEDS
-    RSS_FEEDS = {**MORNING_FEEDS, **NOON_FEEDS}
+    from article_model import parse_articles
+    from feed_pipeline import fetch_feed, parse_feed
+    from feed_registry import get_registry
+    from prompts import SYSTEM_PROMPT
+    registry = get_registry()
 
     cutoff = datetime.now(timezone.utc) - timedelta(hours=hours)
 
@@ -92,26 +96,10 @@ def test_agent_full(hours: int = 25):
     def fetch_recent_articles() -> str:
         """AWS RSSフィードから過去24時間以内に公開された記事を取得して返す。"""
         articles = []
-        for category, url in RSS_FEEDS.items():
+        for category, url in registry.all_feeds().items():
+            policy = registry.policy(category)
             try:
-                feed = feedparser.parse(url)
-                for entry in feed.entries:
-                    for attr in ("published_parsed", "updated_parsed"):
-                        parsed = entry.get(attr)
-                        if parsed:
-                            try:
-                                pub_dt = datetime(*parsed[:6], tzinfo=timezone.utc)
-                                if pub_dt > cutoff:
-                                    articles.append({
-                                        "category": category,
-                                        "title": entry.get("title", ""),
-                                        "summary": entry.get("summary", entry.get("description", ""))[:300],
-                                        "link": entry.get("link", ""),
-                                        "published": pub_dt.isoformat(),
-                                    })
-                                break
-                            except (ValueError, TypeError):
-                                continue
+                articles.extend(parse_feed(category, fetch_feed(url, policy["timeout"]), cutoff, policy))
             except Exception as e:
                 print(f"  警告: [{category}] フィード取得失敗: {e}")
                 continue
@@ -119,44 +107,10 @@ def test_agent_full(hours: int = 25):
         print(f"  → フェッチ完了: {len(articles)}件（テスト用1件）")
         return json.dumps(articles, ensure_ascii=False)
 
-    system_prompt = textwrap.dedent("""
-        あなたはAWSの最新情報を日本語でまとめるアシスタントです。
-
-        fetch_recent_articles ツールで記事一覧を取得し、各記事を以下のルールで処理してください。
-
-        ## 処理ルール
-        1. タイトルを自然な日本語に翻訳する（AWS Japan Blog はそのまま使用）
-        2. 重要度を以下の基準で判定する
-           - HIGH  : セキュリティ脆弱性・新サービスリリース・大型アップデート
-           - MEDIUM: 既存サービスの機能追加・価格変更・リージョン展開
-           - LOW   : ブログ記事・事例紹介・パートナー情報
-        3. 元のカテゴリラベルをそのまま使用する
-        4. 各記事について以下の3点を日本語で記述する
-           - summary_ja : 何が発表されたかの概要（1〜2文）
-           - change     : 従来との変更点・今回新しくなった点（1〜2文）。従来の情報がない場合は「新規リリース」と記載
-           - benefit    : このアップデートによってユーザーが得られる具体的なメリット（1〜2文）
-
-        ## 出力形式
-        JSON配列のみを返してください。前置き・後書き・コードブロック記号は不要です。
-
-        [
-          {
-            "category": "カテゴリ名",
-            "title_ja": "日本語タイトル",
-            "summary_ja": "何が発表されたかの概要",
-            "change": "従来との変更点・新しくなった点",
-            "benefit": "ユーザーが得られる具体的なメリット",
-            "importance": "HIGH | MEDIUM | LOW",
-            "link": "https://..."
-          }
-        ]
-
-        記事が0件の場合は空配列 [] を返してください。
-    """).strip()
-
+    # プロンプト・出力の検証は agent.py と同じもの（prompts.py / article_model.py）を使う
     agent = Agent(
         tools=[fetch_recent_articles],
-        system_prompt=system_prompt,
+        system_prompt=SYSTEM_PROMPT,
     )
 
     print("  Claudeに問い合わせ中...")
@@ -169,10 +123,11 @@ def test_agent_full(hours: int = 25):
     raw = msg.get("content", [{}])[0].get("text", "") if isinstance(msg, dict) else str(msg)
 
     try:
-        articles = json.loads(raw)
+        items = json.loads(raw)
     except json.JSONDecodeError:
         start, end = raw.find("["), raw.rfind("]") + 1
-        articles = json.loads(raw[start:end]) if start != -1 and end > start else []
+        items = json.loads(raw[start:end]) if start != -1 and end > start else []
+    articles = parse_articles(items)
 
     # 結果表示（Slackメッセージのプレビュー）
     print()
@@ -186,32 +141,103 @@ def test_agent_full(hours: int = 25):
     print(f"本日の更新: {len(articles)}件")
     print()
     for a in articles:
-        imp = a.get("importance", "LOW")
-        imp_emoji = {"HIGH": "🔴", "MEDIUM": "🟡", "LOW": "🟢"}.get(imp, "⚪")
+        imp_emoji = {"HIGH": "🔴", "MEDIUM": "🟡", "LOW": "🟢"}.get(a.importance, "⚪")
         print(f"{'━' * 50}")
-        print(f"{imp_emoji}  *[{a.get('category')}]* {imp}")
-        print(f"*{a.get('title_ja')}*")
+        print(f"{imp_emoji}  *[{a.category}]* {a.importance}")
+        print(f"*{a.title_ja}*")
         print()
         print(f"📌 *概要*")
-        print(f"> {a.get('summary_ja', '')}")
+        print(f"> {a.summary_ja}")
         print()
         print(f"🔄 *変更点*")
-        print(f"> {a.get('change', '')}")
+        print(f"> {a.change}")
         print()
         print(f"✅ *メリット*")
-        print(f"> {a.get('benefit', '')}")
+        print(f"> {a.benefit}")
         print()
-        print(f"🔗 {a.get('link')}")
+        print(f"🔗 {a.link}")
         print()
 
     return articles
 
 
+# ─────────────────────────────────────────────
+# Step 3: バックフィルの再開テスト（AWS・ネットワーク不要）
+# ─────────────────────────────────────────────
+
+def test_backfill_resume():
+    """
+    end を省略したバックフィルを handler と同じ手順（配信 → 次の invoke で ack、Lambda の終わりに ack だけの invoke）で
+    Lambda の実行をまたいで進め、同じジョブが再開されて同じチャンクが二度配信されないことを確かめる。
+    フィード取得と翻訳は差し替える。
+    """
+    print()
+    print("=" * 60)
+    print("Step 3: バックフィルの再開テスト（AWS・ネットワーク不要）")
+    print("=" * 60)
+
+    import tempfile
+    from unittest import mock
+    import agent
+    import backfill
+
+    clock = [datetime(2026, 10, 8, 0, 0, tzinfo=timezone.utc)]
+    start = clock[0] - timedelta(days=2)
+    entries = [
+        {"category": "What's New", "title": f"記事{i}", "link": f"https://example.com/{i}", "summary": "",
+         "published": (start + timedelta(hours=3 * i + 1)).isoformat()}
+        for i in range(16)
+    ]
+
+    def collect_entries(feeds, start, end, policy_for, fetch=None):
+        return [a for a in entries if a["published"] < end.isoformat()]
+
+    def invoke(payload: dict) -> dict:
+        clock[0] += timedelta(minutes=10)  # invoke ごとに時刻が進む（end を省略したジョブが変わらないこと）
+        return agent._run_backfill(payload)
+
+    delivered: list[str] = []
+    job_ids: set[str] = set()
+    event = {"mode": "backfill", "start": start.isoformat(), "source": "noon"}
+    with tempfile.TemporaryDirectory() as tmp, mock.patch.dict(os.environ, {"BACKFILL_DIR": tmp}), \
+            mock.patch.object(agent, "snapshot_store", None), \
+            mock.patch.object(agent, "_now", lambda: clock[0]), \
+            mock.patch.object(agent, "_new_agent", lambda tools, system_prompt: lambda text: text), \
+            mock.patch.object(agent, "_parse_articles", json.loads), \
+            mock.patch.object(backfill, "collect_entries", collect_entries), \
+            mock.patch.object(backfill, "BACKFILL_RETURN_CHUNKS", 3):
+        for run in range(1, 6):  # Lambda の実行（同じイベントでの再実行）
+            ack: list[str] = []
+            for _ in range(2):   # 1回の実行で進める invoke の回数（残り時間で打ち切られる想定）
+                data = invoke({**event, "ack": ack, "budget_s": 60})
+                job_ids.add(data["job_id"])
+                ack = [c["chunk"] for c in data["chunks"]]
+                delivered.extend(ack)
+            if ack:
+                data = invoke({**event, "ack": ack, "budget_s": 0})
+            print(f"  実行{run}: status={data['status']} 進捗={data['progress']}")
+            if data["status"] == "done":
+                break
+
+    duplicates = sorted({c for c in delivered if delivered.count(c) > 1})
+    # 記事のあるチャンクだけが配信される（記事のないチャンクは配信なしで完了する）
+    expected = {backfill._chunk_id(ws) for ws, we in backfill.chunk_windows(start, clock[0], 6)
+                if any(ws.isoformat() <= a["published"] < we.isoformat() for a in entries)}
+    ok = len(job_ids) == 1 and not duplicates and data["status"] == "done" and set(delivered) == expected
+    print(f"  ジョブ: {sorted(job_ids)} end={data.get('end')}")
+    print(f"  配信チャンク: {len(delivered)}件 / 記事のあるチャンク {len(expected)}件 重複: {duplicates or 'なし'}")
+    print("  ✅ OK" if ok else "  ❌ NG")
+    return ok
+
+
 # ─────────────────────────────────────────────
 # メイン
 # ─────────────────────────────────────────────
 
 if __name__ == "__main__":
+    if "--backfill" in sys.argv:
+        sys.exit(0 if test_backfill_resume() else 1)
+
     full_mode = "--full" in sys.argv
 
     # --hours N で取得時間範囲を変更（デフォルト25時間）
@@ -4,10 +4,13 @@ AWS Daily Digest — CDK スタック
 cdk deploy 1回で以下をすべて作成します:
   1. ECR Repository          — AgentCore 用 Docker イメージ保存先
   2. CodeBuild Project        — ARM64 イメージをビルドして ECR に push
-  3. Lambda (カスタムリソース) — CodeBuild 完了まで待機
+  3. Lambda (カスタムリソース) — CodeBuild を起動し、ビルド完了イベントで応答（内容が同じなら再ビルドしない）
   4. AgentCore Runtime        — Strands Agent のホスティング環境
   5. Lambda (handler)         — AgentCore 呼び出し + Slack 通知
-  6. EventBridge × 2          — 朝9時（morning）・昼12時（noon）スケジュール
+  6. EventBridge × 4          — 朝9時（morning）・昼12時（noon）・15分ごとの prefetch / alert スケジュール
+  7. S3 Bucket (rollups)      — 日次ロールアップ（週次レポートの集計元）・プロファイル出力
+  8. SQS × 2 / DynamoDB / Lambda × 3 — ファンアウト構成（任意。cdk deploy -c fanout=true で作成）
+  9. IAM ロール / EventBridge — 昼の digest のバッチ推論（任意。cdk deploy -c noon_batch=true で作成）
 
 Slack 認証情報は CfnParameter で受け取り Lambda 環境変数に設定（Secrets Manager 不使用）
 """
@@ -20,14 +23,19 @@ from aws_cdk import (
     Duration,
     RemovalPolicy,
     Stack,
+    SymlinkFollowMode,
     aws_bedrockagentcore as bedrockagentcore,
     aws_codebuild as codebuild,
+    aws_dynamodb as dynamodb,
     aws_ecr as ecr,
     aws_events as events,
     aws_events_targets as targets,
     aws_iam as iam,
     aws_lambda as lambda_,
+    aws_lambda_event_sources as lambda_event_sources,
+    aws_s3 as s3,
     aws_s3_assets as s3_assets,
+    aws_sqs as sqs,
 )
 from constructs import Construct
 
@@ -49,6 +57,20 @@ class AwsDigestStack(Stack):
             description="Slack チャンネル ID (C0XXXXXXXXX)",
         )
 
+        # 日次ロールアップ（handler が実行ごとに更新し、週次レポートがマージする）
+        # profiles/ 配下にはオプトインのプロファイル結果も出力する
+        rollup_bucket = s3.Bucket(
+            self,
+            "RollupBucket",
+            block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
+            encryption=s3.BucketEncryption.S3_MANAGED,
+            enforce_ssl=True,
+            removal_policy=RemovalPolicy.DESTROY,
+            auto_delete_objects=True,
+        )
+        # config/feeds.json を置くとフィード一覧を再デプロイなしで差し替えられる（feed_registry.py）
+        feed_registry_uri = f"s3://{rollup_bucket.bucket_name}/config/feeds.json"
+
         # ─────────────────────────────────────────
         # 1. ECR Repository
         # ─────────────────────────────────────────
@@ -56,21 +78,28 @@ class AwsDigestStack(Stack):
             self,
             "AgentEcrRepo",
             repository_name="aws-digest-agent",
-            image_tag_mutability=ecr.TagMutability.MUTABLE,
+            # タグは agent/ の内容ハッシュ。同じタグを別の内容で上書きしない
+            image_tag_mutability=ecr.TagMutability.IMMUTABLE,
             removal_policy=RemovalPolicy.DESTROY,
             empty_on_delete=True,
             image_scan_on_push=True,
         )
+        ecr_repo.add_lifecycle_rule(max_image_count=10)  # 直近のイメージだけを残す
 
         # ─────────────────────────────────────────
         # 2. CodeBuild — agent/ を ARM64 イメージにビルドして ECR に push
         # ─────────────────────────────────────────
         # agent/ ディレクトリを S3 にアップロードしてビルドソースとして使う
+        # アセットのハッシュ（agent/ の内容ハッシュ）をイメージのタグにする。内容が変わらなければ再ビルドしない
         agent_source = s3_assets.Asset(
             self,
             "AgentSource",
             path=os.path.join(os.path.dirname(__file__), "../../agent"),
+            # shared/ のモジュールはシンボリックリンクで配置しているため実体をコピーする
+            follow_symlinks=SymlinkFollowMode.ALWAYS,
+            exclude=["__pycache__", "*.pyc"],
         )
+        image_tag = agent_source.asset_hash
 
         codebuild_role = iam.Role(
             self,
@@ -94,7 +123,7 @@ class AwsDigestStack(Stack):
                                 "ecr:GetAuthorizationToken",
                                 "ecr:BatchCheckLayerAvailability",
                                 "ecr:GetDownloadUrlForLayer",
-                                "ecr:BatchGetImage",
+                                "ecr:BatchGetImage",  # BatchGetImage はレイヤーキャッシュ（--cache-from）の取得にも使う
                                 "ecr:PutImage",
                                 "ecr:InitiateLayerUpload",
                                 "ecr:UploadLayerPart",
@@ -121,6 +150,10 @@ class AwsDigestStack(Stack):
                 compute_type=codebuild.ComputeType.LARGE,
                 privileged=True,  # Docker ビルドに必要
             ),
+            # 同じビルドホストに当たった場合はローカルの Docker レイヤーを再利用する（ベストエフォート）。
+            # ホストが変わっても、前回のイメージに埋め込んだキャッシュ情報（BUILDKIT_INLINE_CACHE）から
+            # 変更のないレイヤー（pip install など）を ECR から取得する
+            cache=codebuild.Cache.local(codebuild.LocalCacheMode.DOCKER_LAYER),
             source=codebuild.Source.s3(
                 bucket=agent_source.bucket,
                 path=agent_source.s3_object_key,
@@ -137,15 +170,16 @@ class AwsDigestStack(Stack):
                     },
                     "build": {
                         "commands": [
-                            "docker build --platform linux/arm64 -t $IMAGE_REPO_NAME:latest .",
-                            "docker tag $IMAGE_REPO_NAME:latest"
-                            " $AWS_ACCOUNT_ID.dkr.ecr.$AWS_DEFAULT_REGION.amazonaws.com/$IMAGE_REPO_NAME:latest",
+                            "REPO_URI=$AWS_ACCOUNT_ID.dkr.ecr.$AWS_DEFAULT_REGION.amazonaws.com/$IMAGE_REPO_NAME",
+                            "DOCKER_BUILDKIT=1 docker build --platform linux/arm64"
+                            " --build-arg BUILDKIT_INLINE_CACHE=1"
+                            " ${CACHE_FROM_TAG:+--cache-from $REPO_URI:$CACHE_FROM_TAG}"
+                            " -t $REPO_URI:$IMAGE_TAG .",
                         ]
                     },
                     "post_build": {
                         "commands": [
-                            "docker push"
-                            " $AWS_ACCOUNT_ID.dkr.ecr.$AWS_DEFAULT_REGION.amazonaws.com/$IMAGE_REPO_NAME:latest"
+                            "[ \"$CODEBUILD_BUILD_SUCCEEDING\" = 1 ] && docker push $REPO_URI:$IMAGE_TAG",
                         ]
                     },
                 },
@@ -154,49 +188,135 @@ class AwsDigestStack(Stack):
                 "AWS_DEFAULT_REGION": codebuild.BuildEnvironmentVariable(value=self.region),
                 "AWS_ACCOUNT_ID": codebuild.BuildEnvironmentVariable(value=self.account),
                 "IMAGE_REPO_NAME": codebuild.BuildEnvironmentVariable(value=ecr_repo.repository_name),
+                # ビルドごとにカスタムリソースが上書きする（IMAGE_TAG・CACHE_FROM_TAG・応答先のパラメータ名）
+                "IMAGE_TAG": codebuild.BuildEnvironmentVariable(value="manual"),
             },
         )
 
         # ─────────────────────────────────────────
-        # 3. Lambda カスタムリソース — CodeBuild 完了まで待機
+        # 3. Lambda カスタムリソース — CodeBuild を起動し、完了イベントで応答する
         # ─────────────────────────────────────────
+        callback_param_arn = f"arn:aws:ssm:{self.region}:{self.account}:parameter/aws-digest/build-callback/*"
+        build_utils_code = lambda_.Code.from_asset(
+            os.path.join(os.path.dirname(__file__), ".."),
+            exclude=["*.pyc", "__pycache__", "cdk.out", ".venv"],
+        )
         build_trigger_fn = lambda_.Function(
             self,
             "BuildTriggerFunction",
             runtime=lambda_.Runtime.PYTHON_3_11,
             handler="stacks.infra_utils.build_trigger_lambda.handler",
-            timeout=Duration.minutes(15),
-            code=lambda_.Code.from_asset(
-                os.path.join(os.path.dirname(__file__), ".."),
-                exclude=["*.pyc", "__pycache__", "cdk.out", ".venv"],
-            ),
+            timeout=Duration.minutes(1),  # ビルドの起動（またはスキップ）だけで終わる
+            code=build_utils_code,
             initial_policy=[
                 iam.PolicyStatement(
-                    actions=["codebuild:StartBuild", "codebuild:BatchGetBuilds"],
+                    actions=["codebuild:StartBuild"],
                     resources=[build_project.project_arn],
-                )
+                ),
+                iam.PolicyStatement(
+                    actions=["ecr:DescribeImages"],
+                    resources=[ecr_repo.repository_arn],
+                ),
+                # CloudFormation の応答先（署名付き URL）をビルドの環境変数ではなく SecureString で渡す
+                iam.PolicyStatement(
+                    actions=["ssm:PutParameter", "ssm:DeleteParameter"],
+                    resources=[callback_param_arn],
+                ),
             ],
         )
 
+        # ビルド完了（成功・失敗・停止）で CloudFormation に応答する
+        build_complete_fn = lambda_.Function(
+            self,
+            "BuildCompleteFunction",
+            runtime=lambda_.Runtime.PYTHON_3_11,
+            handler="stacks.infra_utils.build_trigger_lambda.on_build_event",
+            timeout=Duration.minutes(1),
+            code=build_utils_code,
+            initial_policy=[
+                iam.PolicyStatement(
+                    actions=["ssm:GetParameter", "ssm:DeleteParameter"],
+                    resources=[callback_param_arn],
+                ),
+            ],
+        )
+        build_complete_rule = events.Rule(
+            self,
+            "AgentBuildCompleteRule",
+            description="AWS Daily Digest — エージェントイメージのビルド完了をカスタムリソースに通知",
+            event_pattern=events.EventPattern(
+                source=["aws.codebuild"],
+                detail_type=["CodeBuild Build State Change"],
+                detail={
+                    "project-name": [build_project.project_name],
+                    "build-status": ["SUCCEEDED", "FAILED", "STOPPED"],
+                },
+            ),
+            targets=[targets.LambdaFunction(build_complete_fn)],
+        )
+
         trigger_build = CustomResource(
             self,
             "TriggerAgentBuild",
             service_token=build_trigger_fn.function_arn,
-            properties={"ProjectName": build_project.project_name},
+            properties={
+                "ProjectName": build_project.project_name,
+                "RepositoryName": ecr_repo.repository_name,
+                # agent/ の内容が変わったときだけプロパティが変わり、ビルドが走る
+                "ImageTag": image_tag,
+            },
         )
+        # 完了イベントのルールと通知先（呼び出し権限を含む）ができてからビルドを起動する（完了を取りこぼさない）
+        trigger_build.node.add_dependency(build_complete_rule, build_complete_fn)
 
         # ─────────────────────────────────────────
         # 4. AgentCore Runtime
         # ─────────────────────────────────────────
         agent_role = AgentCoreRole(self, "AgentCoreRole")
 
+        # 昼の digest のバッチ推論（任意。cdk deploy -c noon_batch=true で有効化）
+        # Bedrock がバッチ推論ジョブの入出力（snapshots/batch/io/ 配下の JSONL）を読み書きするサービスロール
+        batch_env = {}
+        noon_batch_enabled = str(self.node.try_get_context("noon_batch")).lower() == "true"
+        if noon_batch_enabled:
+            batch_role = iam.Role(
+                self,
+                "NoonBatchRole",
+                assumed_by=iam.ServicePrincipal(
+                    "bedrock.amazonaws.com",
+                    conditions={"StringEquals": {"aws:SourceAccount": self.account}},
+                ),
+            )
+            rollup_bucket.grant_read_write(batch_role, "snapshots/batch/io/*")
+            batch_role.add_to_policy(iam.PolicyStatement(
+                actions=["bedrock:InvokeModel"],
+                resources=[
+                    "arn:aws:bedrock:*::foundation-model/*",
+                    f"arn:aws:bedrock:{self.region}:{self.account}:inference-profile/*",
+                ],
+            ))
+            agent_role.add_to_policy(iam.PolicyStatement(
+                actions=[
+                    "bedrock:CreateModelInvocationJob",
+                    "bedrock:GetModelInvocationJob",
+                    "bedrock:StopModelInvocationJob",
+                ],
+                resources=[
+                    f"arn:aws:bedrock:{self.region}:{self.account}:model-invocation-job/*",
+                    "arn:aws:bedrock:*::foundation-model/*",
+                    f"arn:aws:bedrock:{self.region}:{self.account}:inference-profile/*",
+                ],
+            ))
+            batch_role.grant_pass_role(agent_role)
+            batch_env = {"BATCH_BACKEND": "bedrock", "BATCH_ROLE_ARN": batch_role.role_arn}
+
         agent_runtime = bedrockagentcore.CfnRuntime(
             self,
             "AgentRuntime",
             agent_runtime_name="aws_digest_agent",
             agent_runtime_artifact=bedrockagentcore.CfnRuntime.AgentRuntimeArtifactProperty(
                 container_configuration=bedrockagentcore.CfnRuntime.ContainerConfigurationProperty(
-                    container_uri=f"{ecr_repo.repository_uri}:latest"
+                    container_uri=f"{ecr_repo.repository_uri}:{image_tag}"
                 )
             ),
             network_configuration=bedrockagentcore.CfnRuntime.NetworkConfigurationProperty(
@@ -204,7 +324,19 @@ class AwsDigestStack(Stack):
             ),
             protocol_configuration="HTTP",
             role_arn=agent_role.role_arn,
+            environment_variables={
+                "PROFILE_BUCKET": rollup_bucket.bucket_name,
+                "SNAPSHOT_BUCKET": rollup_bucket.bucket_name,
+                "FEED_REGISTRY": feed_registry_uri,
+                **batch_env,
+            },
         )
+        # プロファイル結果の書き込み（payload の profile フラグ指定時のみ使われる）
+        rollup_bucket.grant_put(agent_role, "profiles/*")
+        # フィードスナップショット（prefetch が書き込み、朝・昼の digest が読む）
+        rollup_bucket.grant_read_write(agent_role, "snapshots/*")
+        # フィードレジストリ（未配置の場合は rss_feeds.py の既定の一覧を使う）
+        rollup_bucket.grant_read(agent_role, "config/*")
 
         # CodeBuild 完了後に AgentCore を作成する
         agent_runtime.node.add_dependency(trigger_build)
@@ -233,6 +365,16 @@ class AwsDigestStack(Stack):
             },
         )
 
+        # 同じモード・同じ時間窓の実行の重複防止（single_flight.py）のリース。7日で TTL 削除
+        single_flight_table = dynamodb.Table(
+            self,
+            "SingleFlightTable",
+            partition_key=dynamodb.Attribute(name="pk", type=dynamodb.AttributeType.STRING),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            time_to_live_attribute="expires_at",
+            removal_policy=RemovalPolicy.DESTROY,
+        )
+
         handler_fn = lambda_.Function(
             self,
             "HandlerFunction",
@@ -244,13 +386,71 @@ class AwsDigestStack(Stack):
             role=lambda_role,
             code=lambda_.Code.from_asset(
                 os.path.join(os.path.dirname(__file__), "../../lambda"),
+                follow_symlinks=SymlinkFollowMode.ALWAYS,
+            ),
+            environment={
+                "AGENT_RUNTIME_ARN": agent_runtime.attr_agent_runtime_arn,
+                "SLACK_BOT_TOKEN": slack_bot_token.value_as_string,
+                "SLACK_CHANNEL_ID": slack_channel_id.value_as_string,
+                "ROLLUP_BUCKET": rollup_bucket.bucket_name,
+                "PROFILE_BUCKET": rollup_bucket.bucket_name,
+                "ARCHIVE_BUCKET": rollup_bucket.bucket_name,  # 配信済み記事のアーカイブ（archive/ 配下）
+                "SINGLE_FLIGHT_TABLE": single_flight_table.table_name,
+            },
+        )
+        rollup_bucket.grant_read_write(handler_fn)
+        single_flight_table.grant_read_write_data(handler_fn)
+
+        # prefetch 専用の関数（コード・ロールは handler と共通）。
+        # 15分ごとに実行されるため、handler の実行回数・ログ（週次レポートの集計元）と分けておく
+        # 昼のバッチ推論の投入（記事が少ない日はその場で処理する）・結果の回収もこの関数から行う
+        prefetch_fn = lambda_.Function(
+            self,
+            "PrefetchFunction",
+            function_name="aws-digest-prefetch",
+            runtime=lambda_.Runtime.PYTHON_3_11,
+            handler="handler.handler",
+            timeout=Duration.minutes(5) if noon_batch_enabled else Duration.minutes(2),
+            memory_size=256,
+            role=lambda_role,
+            code=lambda_.Code.from_asset(
+                os.path.join(os.path.dirname(__file__), "../../lambda"),
+                follow_symlinks=SymlinkFollowMode.ALWAYS,
             ),
             environment={
                 "AGENT_RUNTIME_ARN": agent_runtime.attr_agent_runtime_arn,
                 "SLACK_BOT_TOKEN": slack_bot_token.value_as_string,
                 "SLACK_CHANNEL_ID": slack_channel_id.value_as_string,
+                "ROLLUP_BUCKET": rollup_bucket.bucket_name,  # フィード健全性の日次集計のみ
             },
         )
+        rollup_bucket.grant_read_write(prefetch_fn)
+
+        # alert 専用の関数（コード・ロールは handler と共通）。HIGH の新着があるときだけ Slack に投稿する
+        alert_fn = lambda_.Function(
+            self,
+            "AlertFunction",
+            function_name="aws-digest-alert",
+            runtime=lambda_.Runtime.PYTHON_3_11,
+            handler="handler.handler",
+            timeout=Duration.minutes(5),
+            memory_size=256,
+            role=lambda_role,
+            code=lambda_.Code.from_asset(
+                os.path.join(os.path.dirname(__file__), "../../lambda"),
+                follow_symlinks=SymlinkFollowMode.ALWAYS,
+            ),
+            environment={
+                "AGENT_RUNTIME_ARN": agent_runtime.attr_agent_runtime_arn,
+                "SLACK_BOT_TOKEN": slack_bot_token.value_as_string,
+                "SLACK_CHANNEL_ID": slack_channel_id.value_as_string,
+                "ROLLUP_BUCKET": rollup_bucket.bucket_name,
+                "ARCHIVE_BUCKET": rollup_bucket.bucket_name,
+                "SINGLE_FLIGHT_TABLE": single_flight_table.table_name,
+            },
+        )
+        rollup_bucket.grant_read_write(alert_fn)
+        single_flight_table.grant_read_write_data(alert_fn)
 
         # ─────────────────────────────────────────
         # 6. Lambda — 週次レポート（CloudWatch 収集 → LLM → Slack）
@@ -313,6 +513,7 @@ class AwsDigestStack(Stack):
             role=weekly_role,
             code=lambda_.Code.from_asset(
                 os.path.join(os.path.dirname(__file__), "../../lambda"),
+                follow_symlinks=SymlinkFollowMode.ALWAYS,
             ),
             environment={
                 "SLACK_BOT_TOKEN":        slack_bot_token.value_as_string,
@@ -320,11 +521,134 @@ class AwsDigestStack(Stack):
                 "HANDLER_FUNCTION_NAME":  handler_fn.function_name,
                 "EVAL_LOG_GROUP":         "",   # Online Evaluation 設定後に手動で更新
                 "REPORT_MODEL_ID":        weekly_report_model_id.value_as_string,
+                "REPORT_NARRATIVE":       "false",  # true で所感欄を LLM で生成
+                "ROLLUP_BUCKET":          rollup_bucket.bucket_name,
+                "ARCHIVE_BUCKET":         rollup_bucket.bucket_name,  # 週次ベストオブが読む配信済み記事
+                "FEED_REGISTRY":          feed_registry_uri,          # ベストオブのランキング（優先度・関心）
             },
         )
+        rollup_bucket.grant_read(weekly_fn)
+
+        # ─────────────────────────────────────────
+        # 7. ファンアウト構成（任意）— フィード単位の取得ワーカー + バッチ単位の翻訳ワーカー
+        #    有効時は朝・昼のスケジュールが dispatcher を起動し、集約結果を handler に渡す
+        # ─────────────────────────────────────────
+        digest_target_fn = handler_fn
+        fanout_enabled = str(self.node.try_get_context("fanout")).lower() == "true"
+        if fanout_enabled:
+            fanout_max_receives = 3
+            lambda_code = lambda_.Code.from_asset(
+                os.path.join(os.path.dirname(__file__), "../../lambda"),
+                follow_symlinks=SymlinkFollowMode.ALWAYS,
+            )
+
+            # ジョブ状態（カウンター・フィード完了マーカー・翻訳結果）。7日で TTL 削除
+            fanout_table = dynamodb.Table(
+                self,
+                "FanoutJobTable",
+                partition_key=dynamodb.Attribute(name="pk", type=dynamodb.AttributeType.STRING),
+                sort_key=dynamodb.Attribute(name="sk", type=dynamodb.AttributeType.STRING),
+                billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+                time_to_live_attribute="expires_at",
+                removal_policy=RemovalPolicy.DESTROY,
+            )
+
+            # 可視性タイムアウトはワーカーのタイムアウトの 6 倍（AWS 推奨値）
+            fetch_queue = sqs.Queue(
+                self,
+                "FanoutFetchQueue",
+                visibility_timeout=Duration.minutes(6),
+                dead_letter_queue=sqs.DeadLetterQueue(
+                    max_receive_count=fanout_max_receives,
+                    queue=sqs.Queue(self, "FanoutFetchDlq", retention_period=Duration.days(14)),
+                ),
+            )
+            translate_queue = sqs.Queue(
+                self,
+                "FanoutTranslateQueue",
+                visibility_timeout=Duration.minutes(30),
+                dead_letter_queue=sqs.DeadLetterQueue(
+                    max_receive_count=fanout_max_receives,
+                    queue=sqs.Queue(self, "FanoutTranslateDlq", retention_period=Duration.days(14)),
+                ),
+            )
+
+            fanout_env = {
+                "FETCH_QUEUE_URL":       fetch_queue.queue_url,
+                "TRANSLATE_QUEUE_URL":   translate_queue.queue_url,
+                "FANOUT_TABLE":          fanout_table.table_name,
+                "FANOUT_MAX_RECEIVES":   str(fanout_max_receives),
+                "HANDLER_FUNCTION_NAME": handler_fn.function_name,
+                "TRANSLATE_MODEL_ID":    weekly_report_model_id.value_as_string,
+                "TRANSLATE_BATCH_SIZE":  "10",
+                "FEED_REGISTRY":         feed_registry_uri,
+            }
+
+            dispatch_fn = lambda_.Function(
+                self,
+                "FanoutDispatchFunction",
+                function_name="aws-digest-fanout-dispatch",
+                runtime=lambda_.Runtime.PYTHON_3_11,
+                handler="fanout.dispatch_handler",
+                timeout=Duration.seconds(30),
+                memory_size=256,
+                code=lambda_code,
+                environment=fanout_env,
+            )
+            fetch_fn = lambda_.Function(
+                self,
+                "FanoutFetchFunction",
+                function_name="aws-digest-fanout-fetch",
+                runtime=lambda_.Runtime.PYTHON_3_11,
+                handler="fanout.fetch_handler",
+                timeout=Duration.minutes(1),
+                memory_size=256,
+                code=lambda_code,
+                environment=fanout_env,
+            )
+            translate_fn = lambda_.Function(
+                self,
+                "FanoutTranslateFunction",
+                function_name="aws-digest-fanout-translate",
+                runtime=lambda_.Runtime.PYTHON_3_11,
+                handler="fanout.translate_handler",
+                timeout=Duration.minutes(5),
+                memory_size=256,
+                code=lambda_code,
+                environment=fanout_env,
+                initial_policy=[
+                    iam.PolicyStatement(
+                        actions=["bedrock:InvokeModel"],
+                        resources=[
+                            f"arn:aws:bedrock:{self.region}::foundation-model/*",
+                            f"arn:aws:bedrock:*:{self.account}:inference-profile/*",
+                        ],
+                    ),
+                ],
+            )
+
+            fetch_fn.add_event_source(lambda_event_sources.SqsEventSource(
+                fetch_queue, batch_size=1, report_batch_item_failures=True,
+            ))
+            # 翻訳の同時実行数を絞り、Bedrock のスロットリングを避ける
+            translate_fn.add_event_source(lambda_event_sources.SqsEventSource(
+                translate_queue, batch_size=1, report_batch_item_failures=True, max_concurrency=4,
+            ))
+
+            fetch_queue.grant_send_messages(dispatch_fn)
+            translate_queue.grant_send_messages(fetch_fn)
+            for fn in (dispatch_fn, fetch_fn, translate_fn):
+                fanout_table.grant_read_write_data(fn)
+            for fn in (dispatch_fn, fetch_fn):
+                rollup_bucket.grant_read(fn, "config/*")
+            # 最後のフィード / バッチを処理したワーカーが集約して handler を呼ぶ
+            for fn in (fetch_fn, translate_fn):
+                handler_fn.grant_invoke(fn)
+
+            digest_target_fn = dispatch_fn
 
         # ─────────────────────────────────────────
-        # 7. EventBridge — 朝9時・昼12時（JST）
+        # 8. EventBridge — 朝9時・昼12時（JST）
         # ─────────────────────────────────────────
 
         # 朝 9:00 JST = 00:00 UTC — What's New 速報
@@ -336,7 +660,7 @@ class AwsDigestStack(Stack):
             schedule=events.Schedule.cron(hour="0", minute="0"),
             targets=[
                 targets.LambdaFunction(
-                    handler_fn,
+                    digest_target_fn,
                     event=events.RuleTargetInput.from_object({"mode": "morning"}),
                 )
             ],
@@ -351,12 +675,59 @@ class AwsDigestStack(Stack):
             schedule=events.Schedule.cron(hour="3", minute="0"),
             targets=[
                 targets.LambdaFunction(
-                    handler_fn,
+                    digest_target_fn,
                     event=events.RuleTargetInput.from_object({"mode": "noon"}),
                 )
             ],
         )
 
+        # prefetch — 15分ごと（:10 / :25 / :40 / :55）
+        # 朝・昼の digest（:00）の5分前にスナップショットが更新されるようにずらす
+        events.Rule(
+            self,
+            "PrefetchRule",
+            rule_name="aws-digest-prefetch",
+            description="AWS Daily Digest — フィードスナップショットの事前取得（15分ごと）",
+            schedule=events.Schedule.cron(minute="10/15"),
+            targets=[
+                targets.LambdaFunction(
+                    prefetch_fn,
+                    event=events.RuleTargetInput.from_object({"mode": "prefetch"}),
+                )
+            ],
+        )
+
+        # 昼のバッチ推論の投入 — 10:30 JST = 01:30 UTC（結果は 15分ごとの prefetch が回収する）
+        if noon_batch_enabled:
+            events.Rule(
+                self,
+                "NoonBatchRule",
+                rule_name="aws-digest-noon-batch",
+                description="AWS Daily Digest — 昼の技術ブログまとめのバッチ推論ジョブ投入",
+                schedule=events.Schedule.cron(hour="1", minute="30"),
+                targets=[
+                    targets.LambdaFunction(
+                        prefetch_fn,
+                        event=events.RuleTargetInput.from_object({"mode": "batch_submit"}),
+                    )
+                ],
+            )
+
+        # alert — 15分ごと（:03 / :18 / :33 / :48）。prefetch と同じフィードを更新するため時刻をずらす
+        events.Rule(
+            self,
+            "AlertRule",
+            rule_name="aws-digest-alert",
+            description="AWS Daily Digest — 重要アップデート速報（15分ごと）",
+            schedule=events.Schedule.cron(minute="3/15"),
+            targets=[
+                targets.LambdaFunction(
+                    alert_fn,
+                    event=events.RuleTargetInput.from_object({"mode": "alert"}),
+                )
+            ],
+        )
+
         # 週次レポート — 月曜 10:00 JST = 月曜 01:00 UTC
         # 朝の digest（00:00 UTC）完了後に実行するため 1時間ずらす
         events.Rule(
@@ -368,6 +739,21 @@ class AwsDigestStack(Stack):
             targets=[targets.LambdaFunction(weekly_fn)],
         )
 
+        # 週次ベストオブ — 月曜 10:00 JST（運用レポートと同時刻。アーカイブを読むだけでモデルは総評の1回のみ）
+        events.Rule(
+            self,
+            "WeeklyBestOfRule",
+            rule_name="aws-digest-weekly-best-of",
+            description="AWS Daily Digest — 週次ベストオブ（月曜 10:00 JST）",
+            schedule=events.Schedule.cron(hour="1", minute="0", week_day="MON"),
+            targets=[
+                targets.LambdaFunction(
+                    weekly_fn,
+                    event=events.RuleTargetInput.from_object({"mode": "best_of"}),
+                )
+            ],
+        )
+
         # ─────────────────────────────────────────
         # Outputs
         # ─────────────────────────────────────────
@@ -377,6 +763,10 @@ class AwsDigestStack(Stack):
         CfnOutput(self, "HandlerFunctionName",
                   description="Lambda 関数名",
                   value=handler_fn.function_name)
+        if fanout_enabled:
+            CfnOutput(self, "FanoutDispatchFunctionName",
+                      description="ファンアウト構成の dispatcher Lambda 関数名",
+                      value=dispatch_fn.function_name)
         CfnOutput(self, "WeeklyReportFunctionName",
                   description="週次レポート Lambda 関数名",
                   value=weekly_fn.function_name)
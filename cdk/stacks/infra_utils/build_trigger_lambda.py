@@ -1,26 +1,38 @@
 """
 CloudFormation カスタムリソース用 Lambda
-CodeBuild のビルド（ARM64 Dockerイメージ）を起動し、完了まで待機する
+CodeBuild のビルド（ARM64 Dockerイメージ）を起動し、完了は CodeBuild のイベントで CloudFormation に通知する
+
+  handler        : カスタムリソースのリクエストを受ける。ImageTag（agent/ の内容ハッシュ）のイメージが
+                   ECR にあればビルドせずに成功を返す。なければビルドを起動して応答せずに終わる
+                   （CloudFormation への応答先は Parameter Store の SecureString に保存し、
+                   ビルドの環境変数にはパラメータ名だけを載せる）
+  on_build_event : EventBridge の「CodeBuild Build State Change」（完了状態）を受け、
+                   ビルドの環境変数のパラメータ名から応答先を取り出して結果を返す
+
+応答先の ResponseURL は署名付き URL のため、ビルドの環境変数（BatchGetBuilds やコンソールで見える）には載せない。
 """
 import json
 import logging
-import time
 import urllib3
 import boto3
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Parameter Store に保存する CloudFormation の応答先（on_build_event が取り出す）
+_CFN_KEYS = ("ResponseURL", "StackId", "RequestId", "LogicalResourceId")
+CALLBACK_PARAM_PREFIX = "/aws-digest/build-callback/"
+
 
 class cfnresponse:
     SUCCESS = "SUCCESS"
     FAILED = "FAILED"
 
     @staticmethod
-    def send(event, context, status, data, physical_id=None):
+    def send(event, context, status, data, physical_id=None, reason=None):
         body = json.dumps({
             "Status": status,
-            "Reason": f"CloudWatch Log: {context.log_stream_name}",
+            "Reason": reason or f"CloudWatch Log: {context.log_stream_name}",
             "PhysicalResourceId": physical_id or context.log_stream_name,
             "StackId": event["StackId"],
             "RequestId": event["RequestId"],
@@ -36,43 +48,99 @@ class cfnresponse:
         )
 
 
+def _physical_id(props: dict) -> str:
+    return f"{props['ProjectName']}:{props['ImageTag']}"
+
+
+def _image_exists(ecr, repo: str, tag: str) -> bool:
+    try:
+        ecr.describe_images(repositoryName=repo, imageIds=[{"imageTag": tag}])
+        return True
+    except ecr.exceptions.ImageNotFoundException:
+        return False
+
+
+def _latest_tag(ecr, repo: str) -> str | None:
+    """直近に push したイメージのタグ（レイヤーキャッシュの取得元）。"""
+    images = []
+    for page in ecr.get_paginator("describe_images").paginate(repositoryName=repo, filter={"tagStatus": "TAGGED"}):
+        images.extend(page["imageDetails"])
+    if not images:
+        return None
+    return max(images, key=lambda d: d["imagePushedAt"])["imageTags"][0]
+
+
 def handler(event, context):
-    logger.info("Event: %s", json.dumps(event))
+    logger.info("Event: %s", json.dumps({k: v for k, v in event.items() if k != "ResponseURL"}))
 
     try:
         # スタック削除時は何もしない
         if event["RequestType"] == "Delete":
-            cfnresponse.send(event, context, cfnresponse.SUCCESS, {})
+            cfnresponse.send(event, context, cfnresponse.SUCCESS, {}, physical_id=event.get("PhysicalResourceId"))
             return
 
-        project_name = event["ResourceProperties"]["ProjectName"]
-        codebuild = boto3.client("codebuild")
+        props = event["ResourceProperties"]
+        repo, tag = props["RepositoryName"], props["ImageTag"]
+        ecr = boto3.client("ecr")
 
-        # ビルド開始
-        build_id = codebuild.start_build(projectName=project_name)["build"]["id"]
-        logger.info("Build started: %s", build_id)
+        # 同じ内容のイメージがあればビルドしない（ロールバック・再作成時など）
+        if _image_exists(ecr, repo, tag):
+            logger.info("Image exists, skip build: %s:%s", repo, tag)
+            cfnresponse.send(event, context, cfnresponse.SUCCESS, {"ImageTag": tag, "BuildId": ""},
+                             physical_id=_physical_id(props))
+            return
 
-        # タイムアウトまで待機（Lambda の残り時間 - 30秒）
-        deadline = context.get_remaining_time_in_millis() / 1000 - 30
-        start = time.time()
+        overrides = [{"name": "IMAGE_TAG", "value": tag, "type": "PLAINTEXT"}]
+        cache_tag = _latest_tag(ecr, repo)
+        if cache_tag:
+            overrides.append({"name": "CACHE_FROM_TAG", "value": cache_tag, "type": "PLAINTEXT"})
+        param = CALLBACK_PARAM_PREFIX + event["RequestId"]
+        overrides.append({"name": "CFN_CALLBACK_PARAM", "value": param, "type": "PLAINTEXT"})
+        overrides.append({"name": "CFN_PHYSICAL_ID", "value": _physical_id(props), "type": "PLAINTEXT"})
 
-        while True:
-            if time.time() - start > deadline:
-                cfnresponse.send(event, context, cfnresponse.FAILED, {"Error": "Build timeout"})
-                return
+        ssm = boto3.client("ssm")
+        ssm.put_parameter(Name=param, Type="SecureString", Overwrite=True,
+                          Value=json.dumps({key: event[key] for key in _CFN_KEYS}))
+        try:
+            build_id = boto3.client("codebuild").start_build(
+                projectName=props["ProjectName"],
+                environmentVariablesOverride=overrides,
+            )["build"]["id"]
+        except Exception:
+            ssm.delete_parameter(Name=param)
+            raise
+        # 完了は on_build_event が CloudFormation に通知する
+        logger.info("Build started: %s (tag=%s, cache_from=%s)", build_id, tag, cache_tag)
 
-            status = codebuild.batch_get_builds(ids=[build_id])["builds"][0]["buildStatus"]
-            logger.info("Build status: %s", status)
+    except Exception as e:
+        logger.error("Error: %s", str(e))
+        cfnresponse.send(event, context, cfnresponse.FAILED, {"Error": str(e)}, reason=str(e)[:200])
 
-            if status == "SUCCEEDED":
-                cfnresponse.send(event, context, cfnresponse.SUCCESS, {"BuildId": build_id})
-                return
-            elif status in ("FAILED", "FAULT", "STOPPED", "TIMED_OUT"):
-                cfnresponse.send(event, context, cfnresponse.FAILED, {"Error": f"Build {status}"})
-                return
 
-            time.sleep(30)
+def on_build_event(event, context):
+    detail = event["detail"]
+    env = {
+        v["name"]: v["value"]
+        for v in detail.get("additional-information", {}).get("environment", {}).get("environment-variables", [])
+    }
+    if "CFN_CALLBACK_PARAM" not in env:
+        logger.info("Build %s was not started by the custom resource, ignore", detail.get("build-id"))
+        return
 
-    except Exception as e:
-        logger.error("Error: %s", str(e))
-        cfnresponse.send(event, context, cfnresponse.FAILED, {"Error": str(e)})
+    status = detail["build-status"]
+    ssm = boto3.client("ssm")
+    param = env["CFN_CALLBACK_PARAM"]
+    try:
+        request = json.loads(ssm.get_parameter(Name=param, WithDecryption=True)["Parameter"]["Value"])
+    except ssm.exceptions.ParameterNotFound:
+        logger.info("Build %s: callback %s was already answered, ignore", detail.get("build-id"), param)
+        return
+    logger.info("Build %s: %s", detail.get("build-id"), status)
+    if status == "SUCCEEDED":
+        cfnresponse.send(request, context, cfnresponse.SUCCESS,
+                         {"ImageTag": env["IMAGE_TAG"], "BuildId": detail.get("build-id", "")},
+                         physical_id=env["CFN_PHYSICAL_ID"])
+    else:
+        cfnresponse.send(request, context, cfnresponse.FAILED, {"Error": f"Build {status}"},
+                         physical_id=env["CFN_PHYSICAL_ID"], reason=f"Build {status}: {detail.get('build-id')}")
+    ssm.delete_parameter(Name=param)
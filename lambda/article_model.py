@@ -0,0 +1 @@
+../shared/article_model.py
\ No newline at end of file
@@ -0,0 +1,357 @@
+"""
+AWS Daily Digest — 配信済み記事のアーカイブと全文検索
+
+handler が Slack に投稿した記事（invoke() の処理結果）を、実行ごとに1つの JSONL セグメントとして追記する。
+セグメントは書き換えない（追記のみ）。検索用の SQLite インデックスはセグメントから差分で組み立てる。
+
+  セグメント : {prefix}segments/{YYYY-MM-DD}/{HHMMSS}-{mode}-{run_id}.jsonl（日付・時刻は JST、キーの辞書順 = 時系列）
+  インデックス: SQLite（FTS5 trigram で日本語・英語の部分一致。カテゴリ・重要度・日付に通常のインデックス）
+
+trigram は3文字未満の語を検索できないため、2文字以下の語（「料金」など）は LIKE による絞り込みに切り替える。
+英語の原題は出力に含まれないため、リンクのスラッグ（.../fixture-aurora-dsql-regions/ → "aurora dsql regions"）も索引に入れる。
+
+バックエンド（セグメントの保存先）:
+  S3ArchiveStore    : ARCHIVE_BUCKET 設定時（本番。プレフィックスは ARCHIVE_PREFIX、デフォルト archive/）
+  LocalArchiveStore : ARCHIVE_DIR 設定時（ローカル）
+
+Usage:
+  python digest_archive.py sync                                   # セグメントをインデックス（ARCHIVE_DB, デフォルト archive.db）に取り込む
+  python digest_archive.py search "Aurora DSQL" --since 2026-07-01
+  python digest_archive.py search 脆弱性 --importance HIGH --category "Amazon Linux Security" --json
+  python digest_archive.py stats
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from article_model import FIELDS as ARTICLE_FIELDS
+
+logger = logging.getLogger()
+
+JST = timezone(timedelta(hours=9))
+
+TRIGRAM_MIN_CHARS = 3
+ARCHIVE_READ_CONCURRENCY = 8   # load_period でセグメントを並列に読む数
+
+
+# ─────────────────────────────────────────────────────────
+# セグメントの保存先
+# ─────────────────────────────────────────────────────────
+
+class LocalArchiveStore:
+    def __init__(self, root: str):
+        self.root = root
+
+    def put(self, key: str, body: bytes) -> None:
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(body)
+        os.replace(tmp, path)
+
+    def list_after(self, start_after: str) -> list[str]:
+        keys = []
+        base = os.path.join(self.root, "segments")
+        for dirpath, _, files in os.walk(base):
+            for name in files:
+                if name.endswith(".jsonl"):
+                    keys.append(os.path.relpath(os.path.join(dirpath, name), self.root).replace(os.sep, "/"))
+        return sorted(k for k in keys if k > start_after)
+
+    def get(self, key: str) -> bytes:
+        with open(os.path.join(self.root, key), "rb") as f:
+            return f.read()
+
+
+class S3ArchiveStore:
+    def __init__(self, bucket: str, prefix: str = "archive/"):
+        import boto3
+
+        self._s3     = boto3.client("s3")
+        self._bucket = bucket
+        self._prefix = prefix
+
+    def put(self, key: str, body: bytes) -> None:
+        self._s3.put_object(
+            Bucket=self._bucket, Key=self._prefix + key, Body=body, ContentType="application/x-ndjson",
+        )
+
+    def list_after(self, start_after: str) -> list[str]:
+        """start_after より後のセグメントキーを辞書順で返す。"""
+        keys = []
+        paginator = self._s3.get_paginator("list_objects_v2")
+        pages = paginator.paginate(
+            Bucket=self._bucket,
+            Prefix=self._prefix + "segments/",
+            StartAfter=self._prefix + start_after if start_after else "",
+        )
+        for page in pages:
+            keys.extend(item["Key"][len(self._prefix):] for item in page.get("Contents", []))
+        return keys
+
+    def get(self, key: str) -> bytes:
+        return self._s3.get_object(Bucket=self._bucket, Key=self._prefix + key)["Body"].read()
+
+
+def get_archive_store():
+    """環境変数からストアを生成する。未設定の場合は None（アーカイブ無効）。"""
+    bucket = os.environ.get("ARCHIVE_BUCKET", "")
+    if bucket:
+        return S3ArchiveStore(bucket, os.environ.get("ARCHIVE_PREFIX", "archive/"))
+    root = os.environ.get("ARCHIVE_DIR", "")
+    if root:
+        return LocalArchiveStore(root)
+    return None
+
+
+def append_run(store, mode: str, articles: list, run_id: str, now: datetime | None = None) -> str | None:
+    """配信した記事（Article または記事 dict）を1セグメントとして追記する。記事がなければ何もしない。"""
+    if not articles:
+        return None
+    now_jst = (now or datetime.now(timezone.utc)).astimezone(JST)
+    key = f"segments/{now_jst:%Y-%m-%d}/{now_jst:%H%M%S}-{mode}-{run_id[:12]}.jsonl"
+    lines = [
+        json.dumps({
+            "archived_at": now_jst.isoformat(),
+            "date":        now_jst.date().isoformat(),
+            "mode":        mode,
+            **{k: a.get(k, "") for k in ARTICLE_FIELDS},
+        }, ensure_ascii=False)
+        for a in articles
+    ]
+    store.put(key, ("\n".join(lines) + "\n").encode("utf-8"))
+    logger.info("アーカイブ追記: %s (%d件)", key, len(articles))
+    return key
+
+
+def load_period(store, first: str, last: str) -> list[dict]:
+    """
+    first〜last（JST 日付 YYYY-MM-DD、両端を含む）のセグメントの記事レコードを時系列順に返す。
+    インデックスを使わずセグメントを直接読む（週次ベストオブのように1週間分だけ読む用途向け）。
+    """
+    keys = [k for k in store.list_after(f"segments/{first}") if k.split("/")[1] <= last]
+    with ThreadPoolExecutor(max_workers=ARCHIVE_READ_CONCURRENCY) as pool:
+        bodies = list(pool.map(store.get, keys))
+    return [json.loads(line) for body in bodies for line in body.decode("utf-8").splitlines() if line.strip()]
+
+
+# ─────────────────────────────────────────────────────────
+# 検索インデックス（SQLite FTS5）
+# ─────────────────────────────────────────────────────────
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id          INTEGER PRIMARY KEY,
+    segment     TEXT NOT NULL,
+    archived_at TEXT NOT NULL,
+    date        TEXT NOT NULL,
+    mode        TEXT NOT NULL,
+    category    TEXT NOT NULL,
+    importance  TEXT NOT NULL,
+    title_ja    TEXT NOT NULL,
+    summary_ja  TEXT NOT NULL,
+    change      TEXT NOT NULL,
+    benefit     TEXT NOT NULL,
+    link        TEXT NOT NULL,
+    slug        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS articles_date       ON articles (date);
+CREATE INDEX IF NOT EXISTS articles_category   ON articles (category, date);
+CREATE INDEX IF NOT EXISTS articles_importance ON articles (importance, date);
+CREATE INDEX IF NOT EXISTS articles_link       ON articles (link);
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+    title_ja, summary_ja, change, benefit, slug,
+    content='articles', content_rowid='id', tokenize='trigram'
+);
+CREATE TABLE IF NOT EXISTS segments (key TEXT PRIMARY KEY, ingested_at TEXT NOT NULL, articles INTEGER NOT NULL);
+"""
+
+_SEARCH_COLUMNS = ("title_ja", "summary_ja", "change", "benefit", "slug")
+
+
+def link_slug(link: str) -> str:
+    """リンクの末尾のパス（英語のスラッグ）を単語列にする。"""
+    path = re.sub(r"[?#].*$", "", link).rstrip("/")
+    last = path.rsplit("/", 1)[-1]
+    last = re.sub(r"\.html?$", "", last)
+    return " ".join(w for w in re.split(r"[-_.]+", last) if w)
+
+
+class ArchiveIndex:
+    """セグメントを取り込んだ SQLite インデックス。"""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    # ── 取り込み ──────────────────────────────────
+
+    def last_segment(self) -> str:
+        row = self._conn.execute("SELECT MAX(key) FROM segments").fetchone()
+        return row[0] or ""
+
+    def _has_segment(self, key: str) -> bool:
+        return self._conn.execute("SELECT 1 FROM segments WHERE key = ?", (key,)).fetchone() is not None
+
+    def ingest_segment(self, key: str, body: bytes) -> int:
+        """1セグメントを取り込む。取り込み済みなら 0 を返す（同じセグメントを二重に数えない）。"""
+        if self._has_segment(key):
+            return 0
+        rows = [json.loads(line) for line in body.decode("utf-8").splitlines() if line.strip()]
+        with self._conn:
+            for r in rows:
+                cur = self._conn.execute(
+                    "INSERT INTO articles (segment, archived_at, date, mode, category, importance,"
+                    " title_ja, summary_ja, change, benefit, link, slug)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, r["archived_at"], r["date"], r["mode"], r.get("category", ""), r.get("importance", ""),
+                     r.get("title_ja", ""), r.get("summary_ja", ""), r.get("change", ""), r.get("benefit", ""),
+                     r.get("link", ""), link_slug(r.get("link", ""))),
+                )
+                self._conn.execute(
+                    "INSERT INTO articles_fts (rowid, title_ja, summary_ja, change, benefit, slug)"
+                    " SELECT id, title_ja, summary_ja, change, benefit, slug FROM articles WHERE id = ?",
+                    (cur.lastrowid,),
+                )
+            self._conn.execute(
+                "INSERT INTO segments (key, ingested_at, articles) VALUES (?, ?, ?)",
+                (key, datetime.now(timezone.utc).isoformat(), len(rows)),
+            )
+        return len(rows)
+
+    def sync(self, store) -> dict:
+        """
+        取り込み済みの最後のセグメントの日付以降だけを一覧・取得して取り込む。
+        同じ日の後から書かれたセグメント（実行が重なった場合）も拾えるよう、その日は一覧し直す。
+        """
+        last = self.last_segment()
+        listed = store.list_after(last.rsplit("/", 1)[0] + "/" if last else "")
+        keys = [k for k in listed if not self._has_segment(k)]
+        added = sum(self.ingest_segment(k, store.get(k)) for k in keys)
+        return {"segments": len(keys), "articles": added}
+
+    # ── 検索 ──────────────────────────────────────
+
+    def search(self, query: str = "", category: str | None = None, importance: str | None = None,
+               since: str | None = None, until: str | None = None, limit: int = 20,
+               latest_only: bool = True) -> list[dict]:
+        """
+        全文検索。query は空白区切りの AND。日付は JST の YYYY-MM-DD（両端を含む）。
+        latest_only=True では同じリンクの記事（alert と digest の両方に出たものなど）は最新の1件だけ返す。
+        """
+        where, params = [], []
+        terms = query.split()
+        fts_terms = [t for t in terms if len(t) >= TRIGRAM_MIN_CHARS]
+        short_terms = [t for t in terms if len(t) < TRIGRAM_MIN_CHARS]
+        if fts_terms:
+            where.append("a.id IN (SELECT rowid FROM articles_fts WHERE articles_fts MATCH ?)")
+            params.append(" AND ".join('"' + t.replace('"', '""') + '"' for t in fts_terms))
+        for t in short_terms:
+            where.append("(" + " OR ".join(f"a.{c} LIKE ?" for c in _SEARCH_COLUMNS) + ")")
+            params.extend([f"%{t}%"] * len(_SEARCH_COLUMNS))
+        for column, value in (("category", category), ("importance", importance)):
+            if value:
+                where.append(f"a.{column} = ?")
+                params.append(value)
+        if since:
+            where.append("a.date >= ?")
+            params.append(since)
+        if until:
+            where.append("a.date <= ?")
+            params.append(until)
+
+        condition = " AND ".join(where) or "1"
+        cursor = self._conn.execute(f"SELECT a.* FROM articles a WHERE {condition} ORDER BY a.id DESC", params)
+        results, seen = [], set()
+        for r in cursor:  # 新しい順に読み、limit 件そろった時点で打ち切る
+            if latest_only:
+                if r["link"] in seen:
+                    continue
+                seen.add(r["link"])
+            results.append({k: r[k] for k in ("date", "mode", *ARTICLE_FIELDS)})
+            if len(results) >= limit:
+                break
+        cursor.close()
+        return results
+
+    def stats(self) -> dict:
+        row = self._conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT link), MIN(date), MAX(date) FROM articles"
+        ).fetchone()
+        segments = self._conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+        return {"articles": row[0], "distinct_links": row[1], "first_date": row[2], "last_date": row[3],
+                "segments": segments}
+
+
+# ─────────────────────────────────────────────────────────
+# CLI
+# ─────────────────────────────────────────────────────────
+
+def _print_results(results: list[dict], elapsed_ms: float) -> None:
+    for r in results:
+        print(f"{r['date']} [{r['importance']}] {r['category']} — {r['title_ja']}")
+        print(f"    {r['summary_ja']}")
+        print(f"    {r['link']}")
+    print(f"\n{len(results)} 件（{elapsed_ms:.1f}ms）")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=os.environ.get("ARCHIVE_DB", "archive.db"))
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("sync", help="新しいセグメントをインデックスに取り込む")
+    search = sub.add_parser("search", help="全文検索")
+    search.add_argument("query", nargs="?", default="")
+    search.add_argument("--category")
+    search.add_argument("--importance", choices=["HIGH", "MEDIUM", "LOW"])
+    search.add_argument("--since", help="YYYY-MM-DD（JST）")
+    search.add_argument("--until", help="YYYY-MM-DD（JST）")
+    search.add_argument("--limit", type=int, default=20)
+    search.add_argument("--all", action="store_true", help="同じリンクの記事をすべて表示する")
+    search.add_argument("--sync", action="store_true", help="検索前に sync する")
+    search.add_argument("--json", action="store_true")
+    sub.add_parser("stats", help="インデックスの件数・期間")
+    args = parser.parse_args()
+
+    index = ArchiveIndex(args.db)
+    try:
+        if args.command == "sync" or getattr(args, "sync", False):
+            store = get_archive_store()
+            if store is None:
+                print("ARCHIVE_BUCKET または ARCHIVE_DIR を設定してください", file=sys.stderr)
+                return 2
+            result = index.sync(store)
+            print(f"取り込み: セグメント {result['segments']} 件 / 記事 {result['articles']} 件", file=sys.stderr)
+        if args.command == "search":
+            start = time.perf_counter()
+            results = index.search(args.query, args.category, args.importance, args.since, args.until,
+                                   args.limit, latest_only=not args.all)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if args.json:
+                print(json.dumps(results, ensure_ascii=False, indent=2))
+            else:
+                _print_results(results, elapsed_ms)
+        elif args.command == "stats":
+            print(json.dumps(index.stats(), ensure_ascii=False, indent=2))
+    finally:
+        index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    sys.exit(main())
@@ -0,0 +1,318 @@
+"""
+AWS Daily Digest — ファンアウト構成（任意）
+
+AgentCore で1つのエージェントが全フィードを順に取得・翻訳する代わりに、キュー経由で並列化する。
+
+  dispatcher        : モードのフィードごとに取得タスクを取得キューへ投入し、ジョブを作成する
+  fetch worker      : 1フィードを取得・パースし、新着記事をジョブに保存する
+  select            : 最後のフィードを処理したワーカーが1回だけ実行し、全フィードの記事を重複排除・選定して
+                      選ばれた記事だけを TRANSLATE_BATCH_SIZE 件ずつ翻訳キューへ投入する
+  translate worker  : 1バッチを Bedrock で翻訳・要約し、結果をジョブに保存する
+  aggregator        : 最後のバッチ（またはフィード）を処理したワーカーが1回だけ実行し、
+                      結果を選定の順に結合して handler Lambda に {"mode", "articles"} を渡す
+                      （articles はワイヤー形式。Lambda の非同期呼び出しのペイロード上限 256KB に収める）
+
+Lambda では SQS + DynamoDB（fanout_store.py）、ローカルでは run_local() がプロセス内キューと
+スレッドで同じ処理を動かす。
+
+Usage（ローカル実行。翻訳に Bedrock を使うため AWS 認証情報が必要）:
+  python fanout.py noon
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable
+
+from article_model import decode_articles, encode_articles, parse_articles
+from fanout_store import LocalQueue, MemoryJobStore, get_job_store, get_queues, is_complete
+from feed_pipeline import cap_articles, dedup_articles, fetch_feed, parse_feed, select_articles
+from feed_registry import get_registry
+from prompts import BATCH_SYSTEM_PROMPT, PROMPT_VERSION, anthropic_system
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+FETCH_HOURS  = 25   # agent.py と同じ値
+MAX_ARTICLES = 30   # agent.py と同じ値（Slack に載せる最大記事数）
+
+TRANSLATE_BATCH_SIZE = int(os.environ.get("TRANSLATE_BATCH_SIZE", "10"))
+TRANSLATE_MODEL_ID   = os.environ.get("TRANSLATE_MODEL_ID", "us.anthropic.claude-3-5-sonnet-20241022-v2:0")
+TRANSLATE_MAX_TOKENS = 4096
+# SQS の maxReceiveCount と揃える。最後の試行でも失敗したバッチは空として完了扱いにし、ジョブを止めない
+MAX_RECEIVES = int(os.environ.get("FANOUT_MAX_RECEIVES", "3"))
+HANDLER_FUNCTION_NAME = os.environ.get("HANDLER_FUNCTION_NAME", "")
+
+_bedrock = None
+_lambda = None
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def feeds_for(mode: str) -> dict[str, str]:
+    return get_registry().feeds_for(mode) or get_registry().feeds_for("noon")
+
+
+# ─────────────────────────────────────────────────────────
+# 各ステージ
+# ─────────────────────────────────────────────────────────
+
+def dispatch(mode: str, store, fetch_queue, feeds: dict[str, str] | None = None) -> str:
+    """ジョブを作成し、フィードごとの取得タスクを投入して job_id を返す。"""
+    feeds = feeds if feeds is not None else feeds_for(mode)
+    job_id = uuid.uuid4().hex
+    cutoff = (_now() - timedelta(hours=FETCH_HOURS)).isoformat()
+    store.create_job(job_id, mode, len(feeds), cutoff)
+    fetch_queue.send_batch([
+        {"job_id": job_id, "index": i, "category": category, "url": url, "cutoff": cutoff}
+        for i, (category, url) in enumerate(feeds.items())
+    ])
+    logger.info("ジョブ開始: job_id=%s mode=%s feeds=%d", job_id, mode, len(feeds))
+    return job_id
+
+
+def process_fetch(task: dict, store, translate_queue, on_complete: Callable[[str], None]) -> None:
+    """1フィードを取得して新着記事をジョブに保存する。最後のフィードなら選定に進む。"""
+    job_id, category = task["job_id"], task["category"]
+    policy = get_registry().policy(category)
+    try:
+        body = fetch_feed(task["url"], policy["timeout"])
+        articles = parse_feed(category, body, datetime.fromisoformat(task["cutoff"]), policy)
+        # フィード単位でも上限をかけ、ジョブに保存する記事数（DynamoDB の項目サイズ）を抑える
+        articles = select_articles(dedup_articles(cap_articles(articles, policy)), MAX_ARTICLES)
+    except Exception as e:
+        # agent.py と同じく、取得できないフィードは飛ばして残りで続行する
+        logger.warning("フィード取得エラー [%s]: %s", task["url"], e)
+        articles = []
+
+    job = store.complete_feed(job_id, category, task["index"], articles)
+    logger.info("フィード取得完了: job_id=%s [%s] 記事=%d", job_id, category, len(articles))
+    if job["feeds_done"] >= job["feeds_total"]:
+        process_select(job_id, store, translate_queue, on_complete)
+
+
+def process_select(job_id: str, store, translate_queue, on_complete: Callable[[str], None]) -> None:
+    """全フィードの記事を重複排除・選定し、選ばれた記事だけをバッチに分けて翻訳キューへ投入する（1回だけ）。"""
+    feeds = store.load_feeds(job_id)
+    fetched = sum(len(f) for f in feeds)
+    articles = select_articles(dedup_articles([a for f in feeds for a in f]), MAX_ARTICLES)
+    batches = [articles[i:i + TRANSLATE_BATCH_SIZE] for i in range(0, len(articles), TRANSLATE_BATCH_SIZE)]
+    # バッチ数を確定してから投入する（先に終わった翻訳ワーカーが途中で集約しないように）
+    if not store.claim_selection(job_id, len(batches)):
+        return
+    # batch_id は選定順でソートできる形にする（集約時に選定の並び順を保つため）
+    translate_queue.send_batch([
+        {"job_id": job_id, "batch_id": f"{n:03d}", "articles": batch}
+        for n, batch in enumerate(batches)
+    ])
+    logger.info("選定完了: job_id=%s 取得=%d 選定=%d バッチ=%d", job_id, fetched, len(articles), len(batches))
+    if not batches:
+        on_complete(job_id)
+
+
+def process_translate(task: dict, store, translate: Callable[[list], tuple[list, dict]],
+                      on_complete: Callable[[str], None], final_attempt: bool = False) -> None:
+    """1バッチを翻訳して保存する。final_attempt で失敗した場合は空バッチとして完了させる。"""
+    job_id, batch_id = task["job_id"], task["batch_id"]
+    try:
+        articles, usage = translate(task["articles"])
+    except Exception:
+        if not final_attempt:
+            raise
+        logger.exception("翻訳バッチを破棄: job_id=%s batch=%s", job_id, batch_id)
+        articles, usage = [], {}
+
+    job = store.complete_batch(job_id, batch_id, articles, usage)
+    logger.info("翻訳完了: job_id=%s batch=%s 記事=%d", job_id, batch_id, len(articles))
+    if is_complete(job):
+        on_complete(job_id)
+
+
+def aggregate(job_id: str, store) -> dict[str, Any]:
+    """翻訳結果を選定の順に結合して handler に渡す event を作る（選定は翻訳前に済んでいる）。"""
+    job = store.get_job(job_id)
+    t = time.perf_counter()
+    batches = store.load_batches(job_id)
+    articles = [a for b in batches for a in b["articles"]]
+
+    usage: dict[str, int] = {}
+    for b in batches:
+        for k, v in b["usage"].items():
+            usage[k] = usage.get(k, 0) + v
+    metrics = {
+        "stages_ms": {
+            "fanout_total": round((time.time() - job["started_at"]) * 1000),
+            "aggregate":    round((time.perf_counter() - t) * 1000),
+        },
+        "translate_batches": len(batches),
+        "usage": usage,
+        "prompt_version": PROMPT_VERSION,
+    }
+    logger.info("集約完了: job_id=%s 記事=%d バッチ=%d", job_id, len(articles), len(batches))
+    return {"mode": job["mode"], "articles": encode_articles(articles), "metrics": metrics, "job_id": job_id}
+
+
+# ─────────────────────────────────────────────────────────
+# 翻訳（Bedrock InvokeModel）
+# ─────────────────────────────────────────────────────────
+
+def _parse_articles(raw: str) -> list:
+    """モデル出力から JSON 配列を取り出す（agent.py の _parse_result と同じ方針）。"""
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        start, end = raw.find("["), raw.rfind("]") + 1
+        if start != -1 and end > start:
+            return json.loads(raw[start:end])
+        raise ValueError(f"JSONパース失敗: {raw[:200]}")
+
+
+def translate_batch(articles: list[dict]) -> tuple[list, dict]:
+    """記事バッチを Bedrock で翻訳・要約し (検証済みの記事リスト, トークン使用量) を返す。"""
+    global _bedrock
+    if _bedrock is None:
+        import boto3
+        _bedrock = boto3.client("bedrock-runtime")
+
+    response = _bedrock.invoke_model(
+        modelId=TRANSLATE_MODEL_ID,
+        contentType="application/json",
+        accept="application/json",
+        body=json.dumps({
+            "anthropic_version": "bedrock-2023-05-31",
+            "system": anthropic_system(BATCH_SYSTEM_PROMPT),
+            "messages": [{"role": "user", "content": json.dumps(articles, ensure_ascii=False)}],
+            "max_tokens": TRANSLATE_MAX_TOKENS,
+        }),
+    )
+    data = json.loads(response["body"].read())
+    usage = data.get("usage", {})
+    articles = [a.to_dict() for a in parse_articles(_parse_articles(data["content"][0]["text"]))]
+    return articles, {
+        "input_tokens":             usage.get("input_tokens", 0),
+        "output_tokens":            usage.get("output_tokens", 0),
+        "total_tokens":             usage.get("input_tokens", 0) + usage.get("output_tokens", 0),
+        "cache_read_input_tokens":  usage.get("cache_read_input_tokens", 0),
+        "cache_write_input_tokens": usage.get("cache_creation_input_tokens", 0),
+    }
+
+
+# ─────────────────────────────────────────────────────────
+# Lambda エントリーポイント
+# ─────────────────────────────────────────────────────────
+
+def _deliver(job_id: str) -> None:
+    """集約を1回だけ実行し、handler Lambda に非同期で渡す。"""
+    store = get_job_store()
+    if not store.claim_aggregation(job_id):
+        return
+    global _lambda
+    if _lambda is None:
+        import boto3
+        _lambda = boto3.client("lambda")
+    event = aggregate(job_id, store)
+    _lambda.invoke(
+        FunctionName=HANDLER_FUNCTION_NAME,
+        InvocationType="Event",
+        Payload=json.dumps(event, ensure_ascii=False).encode("utf-8"),
+    )
+
+
+def _each_record(event: dict, process: Callable[[dict, dict], None]) -> dict:
+    """SQS レコードを1件ずつ処理し、失敗分だけを batchItemFailures で返す（部分バッチ応答）。"""
+    failures = []
+    for record in event.get("Records", []):
+        try:
+            process(json.loads(record["body"]), record)
+        except Exception:
+            logger.exception("メッセージ処理失敗: %s", record.get("messageId"))
+            failures.append({"itemIdentifier": record["messageId"]})
+    return {"batchItemFailures": failures}
+
+
+def dispatch_handler(event, context):
+    """EventBridge から {"mode": ...} を受け取ってジョブを開始する。"""
+    fetch_queue, _ = get_queues()
+    mode = (event or {}).get("mode", "morning")
+    job_id = dispatch(mode, get_job_store(), fetch_queue)
+    return {"statusCode": 200, "job_id": job_id}
+
+
+def fetch_handler(event, context):
+    _, translate_queue = get_queues()
+    store = get_job_store()
+    return _each_record(event, lambda task, _: process_fetch(task, store, translate_queue, _deliver))
+
+
+def translate_handler(event, context):
+    store = get_job_store()
+
+    def process(task: dict, record: dict) -> None:
+        receives = int(record.get("attributes", {}).get("ApproximateReceiveCount", "1"))
+        process_translate(task, store, translate_batch, _deliver, final_attempt=receives >= MAX_RECEIVES)
+
+    return _each_record(event, process)
+
+
+# ─────────────────────────────────────────────────────────
+# ローカル実行
+# ─────────────────────────────────────────────────────────
+
+def run_local(mode: str, fetch_workers: int = 8, translate_workers: int = 4,
+              translate: Callable[[list], tuple[list, dict]] = translate_batch,
+              feeds: dict[str, str] | None = None, timeout: float = 600) -> dict[str, Any]:
+    """プロセス内キューとスレッドでパイプライン全体を実行し、handler に渡す event を返す。"""
+    store = MemoryJobStore()
+    fetch_queue, translate_queue = LocalQueue("fetch"), LocalQueue("translate")
+    done = threading.Event()
+    result: dict[str, Any] = {}
+
+    def on_complete(job_id: str) -> None:
+        if store.claim_aggregation(job_id):
+            result.update(aggregate(job_id, store))
+            done.set()
+
+    def worker(q: LocalQueue, process: Callable[[dict], None]) -> None:
+        while not done.is_set():
+            task = q.receive(timeout=0.1)
+            if task is None:
+                continue
+            try:
+                process(task)
+            except Exception:
+                logger.exception("ローカルワーカーで失敗: %s", q.name)
+
+    threads = [
+        threading.Thread(target=worker, args=(fetch_queue, lambda t: process_fetch(
+            t, store, translate_queue, on_complete)), daemon=True)
+        for _ in range(fetch_workers)
+    ] + [
+        # ローカルでは SQS の再配信がないため、1回目の失敗で空バッチとして完了させる
+        threading.Thread(target=worker, args=(translate_queue, lambda t: process_translate(
+            t, store, translate, on_complete, final_attempt=True)), daemon=True)
+        for _ in range(translate_workers)
+    ]
+    for th in threads:
+        th.start()
+
+    feeds = feeds if feeds is not None else feeds_for(mode)
+    job_id = dispatch(mode, store, fetch_queue, feeds)
+    if not feeds:
+        process_select(job_id, store, translate_queue, on_complete)
+    if not done.wait(timeout):
+        raise TimeoutError(f"ファンアウト実行がタイムアウトしました: {store.get_job(job_id)}")
+    return result
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    result = run_local(sys.argv[1] if len(sys.argv) > 1 else "morning")
+    result["articles"] = [a.to_dict() for a in decode_articles(result["articles"])]
+    print(json.dumps(result, ensure_ascii=False, indent=2))
@@ -0,0 +1,307 @@
+"""
+ファンアウト構成のキューとジョブ状態ストア
+
+キュー:
+  LocalQueue : プロセス内キュー（ローカル実行・テスト用）
+  SqsQueue   : Amazon SQS（Lambda のイベントソースとして消費する）
+
+ジョブ状態（1回の digest 実行 = 1ジョブ）:
+  MemoryJobStore : プロセス内（ローカル実行用）
+  DynamoJobStore : DynamoDB（pk=job_id, sk="job" | "feed#<カテゴリ>" | "batch#<番号>"）
+
+ジョブは「全フィードの取得が終わり、選定した記事の翻訳バッチがすべて完了した」時点で完了とみなす。
+SQS は少なくとも1回配信のため、フィード完了・バッチ完了はマーカーの条件付き書き込みで冪等にしている。
+選定（翻訳バッチ数の確定）と集約は条件付き更新で1回だけ実行する。
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any
+
+JOB_TTL_DAYS = 7
+SQS_BATCH_MAX = 10  # SendMessageBatch の上限
+
+
+def is_complete(job: dict) -> bool:
+    """全フィードの取得・選定・全翻訳バッチが終わっているか。"""
+    return (
+        job["feeds_done"] >= job["feeds_total"]
+        and job["selected"]
+        and job["batches_done"] >= job["batches_expected"]
+    )
+
+
+# ─────────────────────────────────────────────────────────
+# キュー
+# ─────────────────────────────────────────────────────────
+
+class LocalQueue:
+    """プロセス内キュー。run_local() のワーカースレッドが receive() で取り出す。"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._queue: queue.Queue = queue.Queue()
+
+    def send(self, message: dict) -> None:
+        self._queue.put(message)
+
+    def send_batch(self, messages: list[dict]) -> None:
+        for m in messages:
+            self._queue.put(m)
+
+    def receive(self, timeout: float) -> dict | None:
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class SqsQueue:
+    def __init__(self, url: str):
+        import boto3  # ローカル実行では不要なため遅延インポート
+        self.url = url
+        self._client = boto3.client("sqs")
+
+    def send(self, message: dict) -> None:
+        self._client.send_message(QueueUrl=self.url, MessageBody=json.dumps(message, ensure_ascii=False))
+
+    def send_batch(self, messages: list[dict]) -> None:
+        for i in range(0, len(messages), SQS_BATCH_MAX):
+            chunk = messages[i:i + SQS_BATCH_MAX]
+            resp = self._client.send_message_batch(
+                QueueUrl=self.url,
+                Entries=[
+                    {"Id": str(n), "MessageBody": json.dumps(m, ensure_ascii=False)}
+                    for n, m in enumerate(chunk)
+                ],
+            )
+            if resp.get("Failed"):
+                raise RuntimeError(f"SQS 送信失敗: {resp['Failed']}")
+
+
+# ─────────────────────────────────────────────────────────
+# ジョブ状態
+# ─────────────────────────────────────────────────────────
+
+class MemoryJobStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs: dict[str, dict] = {}
+        self._feeds: dict[str, dict[str, tuple[int, list[dict]]]] = {}
+        self._batches: dict[str, dict[str, dict]] = {}
+
+    def create_job(self, job_id: str, mode: str, feeds_total: int, cutoff: str) -> dict:
+        job = {
+            "job_id": job_id, "mode": mode, "cutoff": cutoff, "started_at": time.time(),
+            "feeds_total": feeds_total, "feeds_done": 0,
+            "selected": False, "batches_expected": 0, "batches_done": 0, "aggregated": False,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._feeds[job_id] = {}
+            self._batches[job_id] = {}
+        return dict(job)
+
+    def get_job(self, job_id: str) -> dict:
+        with self._lock:
+            return dict(self._jobs[job_id])
+
+    def complete_feed(self, job_id: str, category: str, index: int, articles: list[dict]) -> dict:
+        with self._lock:
+            job = self._jobs[job_id]
+            if category not in self._feeds[job_id]:
+                self._feeds[job_id][category] = (index, articles)
+                job["feeds_done"] += 1
+            return dict(job)
+
+    def load_feeds(self, job_id: str) -> list[list[dict]]:
+        """取得した記事をフィードごとに dispatch の順で返す。"""
+        with self._lock:
+            return [articles for _, articles in sorted(self._feeds[job_id].values(), key=lambda f: f[0])]
+
+    def claim_selection(self, job_id: str, batches: int) -> bool:
+        with self._lock:
+            job = self._jobs[job_id]
+            if job["selected"] or job["feeds_done"] < job["feeds_total"]:
+                return False
+            job["selected"] = True
+            job["batches_expected"] = batches
+            return True
+
+    def complete_batch(self, job_id: str, batch_id: str, articles: list[dict], usage: dict) -> dict:
+        with self._lock:
+            job = self._jobs[job_id]
+            if batch_id not in self._batches[job_id]:
+                self._batches[job_id][batch_id] = {"articles": articles, "usage": usage}
+                job["batches_done"] += 1
+            return dict(job)
+
+    def claim_aggregation(self, job_id: str) -> bool:
+        with self._lock:
+            job = self._jobs[job_id]
+            if job["aggregated"] or not is_complete(job):
+                return False
+            job["aggregated"] = True
+            return True
+
+    def load_batches(self, job_id: str) -> list[dict]:
+        with self._lock:
+            return [self._batches[job_id][k] for k in sorted(self._batches[job_id])]
+
+
+class DynamoJobStore:
+    def __init__(self, table_name: str):
+        import boto3  # ローカル実行では不要なため遅延インポート
+        self.table_name = table_name
+        self._client = boto3.client("dynamodb")
+
+    def _expires_at(self) -> dict:
+        return {"N": str(int(time.time()) + JOB_TTL_DAYS * 86400)}
+
+    def create_job(self, job_id: str, mode: str, feeds_total: int, cutoff: str) -> dict:
+        self._client.put_item(
+            TableName=self.table_name,
+            Item={
+                "pk": {"S": job_id}, "sk": {"S": "job"},
+                "mode": {"S": mode}, "cutoff": {"S": cutoff},
+                "started_at": {"N": str(time.time())},
+                "feeds_total": {"N": str(feeds_total)}, "feeds_done": {"N": "0"},
+                "batches_expected": {"N": "0"}, "batches_done": {"N": "0"},
+                "expires_at": self._expires_at(),
+            },
+        )
+        return self.get_job(job_id)
+
+    def get_job(self, job_id: str) -> dict:
+        item = self._client.get_item(
+            TableName=self.table_name,
+            Key={"pk": {"S": job_id}, "sk": {"S": "job"}},
+            ConsistentRead=True,
+        )["Item"]
+        return {
+            "job_id":           job_id,
+            "mode":             item["mode"]["S"],
+            "cutoff":           item["cutoff"]["S"],
+            "started_at":       float(item["started_at"]["N"]),
+            "feeds_total":      int(item["feeds_total"]["N"]),
+            "feeds_done":       int(item["feeds_done"]["N"]),
+            "batches_expected": int(item["batches_expected"]["N"]),
+            "batches_done":     int(item["batches_done"]["N"]),
+            "selected":         item.get("selected", {}).get("BOOL", False),
+            "aggregated":       item.get("aggregated", {}).get("BOOL", False),
+        }
+
+    def _mark_and_count(self, job_id: str, marker: dict, update: str, values: dict) -> None:
+        """マーカー項目の新規作成とカウンター更新を1トランザクションで行う（再配信時は何もしない）。"""
+        try:
+            self._client.transact_write_items(TransactItems=[
+                {"Put": {
+                    "TableName": self.table_name,
+                    "Item": {**marker, "expires_at": self._expires_at()},
+                    "ConditionExpression": "attribute_not_exists(pk)",
+                }},
+                {"Update": {
+                    "TableName": self.table_name,
+                    "Key": {"pk": {"S": job_id}, "sk": {"S": "job"}},
+                    "UpdateExpression": update,
+                    "ExpressionAttributeValues": values,
+                }},
+            ])
+        except self._client.exceptions.TransactionCanceledException as e:
+            reasons = [r.get("Code") for r in e.response.get("CancellationReasons", [])]
+            if reasons and reasons[0] == "ConditionalCheckFailed":
+                return  # 処理済み
+            raise
+
+    def complete_feed(self, job_id: str, category: str, index: int, articles: list[dict]) -> dict:
+        self._mark_and_count(
+            job_id,
+            {
+                "pk": {"S": job_id}, "sk": {"S": f"feed#{category}"},
+                "index": {"N": str(index)},
+                "articles": {"S": json.dumps(articles, ensure_ascii=False)},
+            },
+            "ADD feeds_done :one",
+            {":one": {"N": "1"}},
+        )
+        return self.get_job(job_id)
+
+    def load_feeds(self, job_id: str) -> list[list[dict]]:
+        """取得した記事をフィードごとに dispatch の順で返す。"""
+        items = self._query(job_id, "feed#")
+        return [json.loads(item["articles"]["S"]) for item in sorted(items, key=lambda i: int(i["index"]["N"]))]
+
+    def claim_selection(self, job_id: str, batches: int) -> bool:
+        try:
+            self._client.update_item(
+                TableName=self.table_name,
+                Key={"pk": {"S": job_id}, "sk": {"S": "job"}},
+                UpdateExpression="SET selected = :t, batches_expected = :n",
+                ConditionExpression="attribute_not_exists(selected) AND feeds_done >= feeds_total",
+                ExpressionAttributeValues={":t": {"BOOL": True}, ":n": {"N": str(batches)}},
+            )
+            return True
+        except self._client.exceptions.ConditionalCheckFailedException:
+            return False
+
+    def complete_batch(self, job_id: str, batch_id: str, articles: list[dict], usage: dict) -> dict:
+        self._mark_and_count(
+            job_id,
+            {
+                "pk": {"S": job_id}, "sk": {"S": f"batch#{batch_id}"},
+                "articles": {"S": json.dumps(articles, ensure_ascii=False)},
+                "usage": {"S": json.dumps(usage)},
+            },
+            "ADD batches_done :one",
+            {":one": {"N": "1"}},
+        )
+        return self.get_job(job_id)
+
+    def claim_aggregation(self, job_id: str) -> bool:
+        try:
+            self._client.update_item(
+                TableName=self.table_name,
+                Key={"pk": {"S": job_id}, "sk": {"S": "job"}},
+                UpdateExpression="SET aggregated = :t",
+                ConditionExpression=(
+                    "attribute_not_exists(aggregated) AND selected = :t"
+                    " AND feeds_done >= feeds_total AND batches_done >= batches_expected"
+                ),
+                ExpressionAttributeValues={":t": {"BOOL": True}},
+            )
+            return True
+        except self._client.exceptions.ConditionalCheckFailedException:
+            return False
+
+    def load_batches(self, job_id: str) -> list[dict]:
+        return [
+            {"articles": json.loads(item["articles"]["S"]), "usage": json.loads(item["usage"]["S"])}
+            for item in self._query(job_id, "batch#")
+        ]
+
+    def _query(self, job_id: str, prefix: str) -> list[dict]:
+        items: list[dict] = []
+        kwargs: dict[str, Any] = {
+            "TableName": self.table_name,
+            "KeyConditionExpression": "pk = :pk AND begins_with(sk, :prefix)",
+            "ExpressionAttributeValues": {":pk": {"S": job_id}, ":prefix": {"S": prefix}},
+            "ConsistentRead": True,
+        }
+        while True:
+            resp = self._client.query(**kwargs)
+            items.extend(resp.get("Items", []))
+            if "LastEvaluatedKey" not in resp:
+                return items
+            kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+
+def get_queues() -> tuple[SqsQueue, SqsQueue]:
+    """(取得キュー, 翻訳キュー)。CDK が設定する環境変数から作る。"""
+    return SqsQueue(os.environ["FETCH_QUEUE_URL"]), SqsQueue(os.environ["TRANSLATE_QUEUE_URL"])
+
+
+def get_job_store() -> DynamoJobStore:
+    return DynamoJobStore(os.environ["FANOUT_TABLE"])
@@ -0,0 +1 @@
+../shared/feed_pipeline.py
\ No newline at end of file
@@ -6,13 +6,21 @@ EventBridge から mode を受け取り、AgentCore Runtime を呼び出して S
 import json
 import logging
 import os
+import time
 import uuid
 from datetime import datetime, timedelta, timezone
 
 import boto3
+from botocore.config import Config
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
 
+from article_model import Article, decode_articles
+from digest_archive import append_run, get_archive_store
+from profiling import NULL_PROFILER, get_profiler
+from rollup_store import get_rollup_store, record_feed_health, record_run
+from single_flight import OWNER, get_lease_store, lease_seconds, run, window_key
+
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
@@ -21,13 +29,34 @@ SLACK_BOT_TOKEN = os.environ["SLACK_BOT_TOKEN"]
 SLACK_CHANNEL_ID = os.environ["SLACK_CHANNEL_ID"]
 
 agentcore_client = boto3.client("bedrock-agentcore")
-slack_client = WebClient(token=SLACK_BOT_TOKEN)
+# SLACK_API_URL はローカルのスタンドイン（tools/standins.py）に向ける場合のみ設定する
+slack_client = WebClient(token=SLACK_BOT_TOKEN, base_url=os.environ.get("SLACK_API_URL", WebClient.BASE_URL))
+rollup_store = get_rollup_store()  # ROLLUP_BUCKET / ROLLUP_DB_PATH 未設定なら None
+archive_store = get_archive_store()  # ARCHIVE_BUCKET / ARCHIVE_DIR 未設定なら None
+lease_store = get_lease_store()  # SINGLE_FLIGHT_TABLE / SINGLE_FLIGHT_DB_PATH 未設定なら None
 
 MODE_HEADER = {
     "morning": "☀️ AWS What's New — 朝の速報",
     "noon": "📚 AWS 技術ブログ — お昼まとめ",
+    "alert": "🚨 AWS 重要アップデート速報",
+    "backfill": "🗂️ AWS バックフィル",
 }
 
+BACKFILL_POST_SIZE = 20            # Slack の1メッセージに載せる記事数（ブロック数の上限 50 に収める）
+# バックフィルの1回の invoke でエージェントが新しいチャンクに着手してよい秒数（残り時間が少なければ短くする）
+BACKFILL_BUDGET_S      = int(os.environ.get("BACKFILL_BUDGET_S", "300"))
+BACKFILL_CALL_MARGIN_S = 120  # 予算を過ぎてから処理中のチャンクを書き終えて応答するまで + 配信の余裕
+BACKFILL_MIN_BUDGET_S  = 60   # 予算がこれ未満しか取れなければ次の処理を頼まずに終了する
+
+# バックフィル用: 1回の invoke が既定の読み取りタイムアウト（60秒）より長く、リトライされると同じジョブを
+# 二重に進めてしまうため、タイムアウトを予算 + 余裕にしてリトライしない
+backfill_client = boto3.client(
+    "bedrock-agentcore",
+    config=Config(read_timeout=BACKFILL_BUDGET_S + BACKFILL_CALL_MARGIN_S, retries={"max_attempts": 1}),
+)
+
+SINGLE_FLIGHT_WAIT_S = float(os.environ.get("SINGLE_FLIGHT_WAIT_S", "0"))  # 同じ窓の実行中の実行の完了を待つ秒数
+
 IMPORTANCE_EMOJI = {
     "HIGH": "🔴",
     "MEDIUM": "🟡",
@@ -35,29 +64,35 @@ IMPORTANCE_EMOJI = {
 }
 
 
-def invoke_agent(mode: str) -> list:
-    """AgentCore Runtime を呼び出して記事リストを返す。"""
-    payload = json.dumps({"mode": mode}).encode("utf-8")
-
-    response = agentcore_client.invoke_agent_runtime(
+def _invoke_runtime(payload: dict, client=None) -> dict:
+    """AgentCore Runtime を呼び出してレスポンス JSON を返す（client 省略時は agentcore_client）。"""
+    response = (client or agentcore_client).invoke_agent_runtime(
         agentRuntimeArn=AGENT_RUNTIME_ARN,
         contentType="application/json",
         accept="application/json",
-        payload=payload,
+        payload=json.dumps(payload).encode("utf-8"),
         runtimeSessionId=str(uuid.uuid4()),
     )
 
     body = response["response"].read().decode("utf-8")
     logger.info("AgentCore レスポンス (先頭200文字): %s", body[:200])
+    return json.loads(body)
+
 
-    data = json.loads(body)
-    return data.get("articles", [])
+def invoke_agent(mode: str, options: dict | None = None) -> tuple[list[Article], dict]:
+    """
+    AgentCore Runtime を呼び出して (記事リスト, エージェント側メトリクス) を返す。
+    options は payload にそのまま追加する（profile / run_id など）。
+    """
+    data = _invoke_runtime({"mode": mode, **(options or {})})
+    return decode_articles(data.get("articles")), data.get("metrics", {})
 
 
-def build_slack_blocks(mode: str, articles: list) -> list:
+def build_slack_blocks(mode: str, articles: list[Article]) -> list:
     """Slack Block Kit 形式のメッセージブロックを組み立てる。"""
     jst = timezone(timedelta(hours=9))
-    date_str = datetime.now(jst).strftime("%Y年%m月%d日")
+    # 速報は1日に複数回届くため時刻まで表示する
+    date_str = datetime.now(jst).strftime("%Y年%m月%d日 %H:%M" if mode == "alert" else "%Y年%m月%d日")
     header_text = MODE_HEADER.get(mode, "AWS Daily Digest")
 
     blocks = [
@@ -80,22 +115,14 @@ def build_slack_blocks(mode: str, articles: list) -> list:
         return blocks
 
     for article in articles:
-        importance = article.get("importance", "LOW")
-        emoji = IMPORTANCE_EMOJI.get(importance, "⚪")
-        category = article.get("category", "")
-        title_ja = article.get("title_ja", "")
-        summary_ja = article.get("summary_ja", "")
-        change = article.get("change", "")
-        benefit = article.get("benefit", "")
-        link = article.get("link", "")
-
+        emoji = IMPORTANCE_EMOJI.get(article.importance, "⚪")
         text = "\n".join([
-            f"{emoji} *{title_ja}*  `{category}`",
+            f"{emoji} *{article.title_ja}*  `{article.category}`",
             "",
-            f"📌 *概要*: {summary_ja}",
-            f"🔄 *変更点*: {change}",
-            f"✅ *メリット*: {benefit}",
-            f"🔗 <{link}|記事を読む>",
+            f"📌 *概要*: {article.summary_ja}",
+            f"🔄 *変更点*: {article.change}",
+            f"✅ *メリット*: {article.benefit}",
+            f"🔗 <{article.link}|記事を読む>",
         ])
 
         blocks.append({
@@ -107,25 +134,212 @@ def build_slack_blocks(mode: str, articles: list) -> list:
     return blocks
 
 
+def _record_rollup(mode: str, articles_count: int, started: float, error: bool,
+                   metrics: dict | None = None) -> None:
+    """日次ロールアップを更新する。失敗しても通知処理には影響させない。"""
+    if rollup_store is None:
+        return
+    try:
+        duration_ms = int((time.perf_counter() - started) * 1000)
+        metrics = metrics or {}
+        record_run(
+            rollup_store, mode, articles_count, duration_ms, error=error,
+            stages_ms=metrics.get("stages_ms"), usage=metrics.get("usage"),
+        )
+    except Exception as e:
+        logger.warning("ロールアップ更新失敗: %s", e)
+
+
+def _archive(mode: str, articles: list[Article], run_id: str) -> None:
+    """配信した記事をアーカイブに追記する。失敗しても通知処理には影響させない。"""
+    if archive_store is None:
+        return
+    try:
+        append_run(archive_store, mode, articles, run_id)
+    except Exception as e:
+        logger.warning("アーカイブ追記失敗: %s", e)
+
+
+def _record_feed_health(metrics: dict) -> None:
+    """エージェント側のフィード取得結果を日次の健全性レコードに反映する。失敗しても通知処理には影響させない。"""
+    if rollup_store is None or not metrics.get("feed_health"):
+        return
+    try:
+        record_feed_health(rollup_store, metrics["feed_health"])
+    except Exception as e:
+        logger.warning("フィード健全性の更新失敗: %s", e)
+
+
 def handler(event, context):
-    """Lambda エントリーポイント。"""
+    """
+    Lambda エントリーポイント。
+
+    event:
+      mode   : "morning" | "noon" | "prefetch" | "alert" | "backfill" | "batch_submit"（デフォルト: "morning"）
+               prefetch はエージェント側のフィードスナップショットを更新するだけで Slack には投稿しない
+               batch_submit は昼の記事をバッチ推論ジョブとして投入させるだけで Slack には投稿しない
+               alert は前回以降の新着のうち HIGH の記事があるときだけ投稿する
+               backfill は start / end（ISO 8601）の期間を処理する。同じイベントで再実行すると続きから再開する
+                 source: 対象フィードのモード（デフォルト "noon"、"all" で全フィード）
+                 output: "archive"（デフォルト。アーカイブにのみ追記）| "slack"（時間窓ごとに投稿）
+      profile: true でこの実行とエージェント側の実行をプロファイルする（環境変数 DIGEST_PROFILE でも可）
+      articles: 組み立て済みの記事（ワイヤー形式または記事 dict の配列）。指定時は AgentCore を呼ばずに
+                通知だけ行う（ファンアウト構成の集約結果）
+      metrics : articles と一緒に渡す上流側のメトリクス（任意）
+      force  : true で同じモード・同じ時間窓の実行の重複防止（single_flight.py）を使わずに実行する
+               （既定では morning / noon は JST 日付ごと、alert は 15分の窓ごとに最初の実行だけが処理・投稿する）
+    """
     mode = event.get("mode", "morning")
+    if mode in ("prefetch", "batch_submit"):
+        return _prefetch(mode)
+    if mode == "backfill":
+        return _backfill(event, context)
+    run_id = getattr(context, "aws_request_id", None) or uuid.uuid4().hex
+    profiler = get_profiler(event, "handler", run_id)
+    prebuilt = (decode_articles(event["articles"]), event.get("metrics", {})) if "articles" in event else None
+
+    def work() -> dict:
+        with profiler:
+            return _handle(mode, profiler, prebuilt)
+
+    key = window_key(mode) if lease_store is not None and not event.get("force") else None
+    if key is None:
+        return work()
+    outcome, result = run(
+        lease_store, key, run_id, work, lease_s=lease_seconds(context), wait_s=SINGLE_FLIGHT_WAIT_S,
+    )
+    if outcome == OWNER:
+        return result
+    # 先行の実行が処理する（した）ため、AgentCore の呼び出しも投稿もしない
+    return {**(result or {"statusCode": 200}), "single_flight": outcome}
+
+
+def _prefetch(mode: str = "prefetch") -> dict:
+    """
+    フィードのスナップショットを更新させる（batch_submit では昼の記事のバッチ推論ジョブを投入させる）。
+    通知・ロールアップ（週次レポートの記事数集計）には含めない。
+    フィード健全性だけは記録する（取得の大半は prefetch で行われるため）。
+    """
+    data = _invoke_runtime({"mode": mode})
+    summary = data.get("summary") if mode == "prefetch" else {k: data.get(k) for k in ("status", "records")}
+    logger.info("%s 完了: %s", mode, json.dumps(summary))
+    _record_feed_health(data.get("metrics", {}))
+    return {"statusCode": 200, "summary": summary}
+
+
+def _deliver_backfill_chunk(chunk: dict, output: str) -> None:
+    """バックフィルの1チャンク（時間窓）を配信する。"""
+    articles = decode_articles(chunk["articles"])
+    if output == "slack":
+        jst = timezone(timedelta(hours=9))
+        window = (
+            f"{datetime.fromisoformat(chunk['start']).astimezone(jst):%m/%d %H:%M}〜"
+            f"{datetime.fromisoformat(chunk['end']).astimezone(jst):%m/%d %H:%M}"
+        )
+        for i in range(0, len(articles), BACKFILL_POST_SIZE):
+            blocks = build_slack_blocks("backfill", articles[i:i + BACKFILL_POST_SIZE])
+            blocks[0]["text"]["text"] = f"{MODE_HEADER['backfill']}  ({window})"
+            slack_client.chat_postMessage(channel=SLACK_CHANNEL_ID, blocks=blocks,
+                                          text=f"AWS Daily Digest — {MODE_HEADER['backfill']}")
+    elif archive_store is not None:
+        append_run(archive_store, "backfill", articles, uuid.uuid4().hex)
+    else:
+        raise RuntimeError("output=archive ですが ARCHIVE_BUCKET / ARCHIVE_DIR が未設定です")
+
+
+def _backfill(event: dict, context) -> dict:
+    """
+    エージェントにバックフィルを進めさせ、処理済みのチャンクを配信して ack する。
+    Lambda の残り時間が足りなくなったら終了する（同じイベントで再実行すると続きから再開する）。
+    通知・ロールアップ（週次レポートの集計）には含めない。
+    """
+    output = event.get("output", "archive")
+    # 毎回同じ request を送る（end を省略したジョブはエージェントがチェックポイントの end で再開する。
+    # 応答の end を補うと別のジョブになる）
+    request = {"mode": "backfill", **{k: event[k] for k in ("start", "end", "source", "chunk_hours") if k in event}}
+    ack: list[str] = []
+    delivered = 0
+    data: dict = {}
+    while True:
+        remaining_s = getattr(context, "get_remaining_time_in_millis", lambda: 900_000)() / 1000
+        budget_s = min(BACKFILL_BUDGET_S, remaining_s - BACKFILL_CALL_MARGIN_S)
+        if budget_s < BACKFILL_MIN_BUDGET_S:
+            if ack:
+                # 配信済みを記録してから終わる（次回の再実行で同じチャンクを重複配信しない）
+                data = _invoke_runtime({**request, "ack": ack, "budget_s": 0}, backfill_client)
+            logger.info("backfill: 残り時間が少ないため中断します。同じイベントで再実行すると再開します")
+            break
+        data = _invoke_runtime({**request, "ack": ack, "budget_s": round(budget_s)}, backfill_client)
+        ack = []
+        try:
+            for chunk in data.get("chunks", []):
+                _deliver_backfill_chunk(chunk, output)
+                ack.append(chunk["chunk"])
+                delivered += len(chunk["articles"])
+        except Exception:
+            # 配信できたチャンクだけは ack してから失敗させる（再実行で重複配信しない）
+            if ack:
+                try:
+                    _invoke_runtime({**request, "ack": ack, "budget_s": 0}, backfill_client)
+                except Exception as e:
+                    logger.warning("backfill: 配信済みチャンクの ack に失敗 %s: %s", ack, e)
+            raise
+        logger.info("backfill: job=%s status=%s 進捗=%s 今回の配信 %d件",
+                    data.get("job_id"), data.get("status"), json.dumps(data.get("progress")), delivered)
+        if data.get("status") == "done" and not ack:
+            break
+    # end はエージェントが決めた期間の終わり（イベントで省略した場合は最初の実行時刻）
+    return {"statusCode": 200, "job_id": data.get("job_id"), "status": data.get("status"), "end": data.get("end"),
+            "progress": data.get("progress"), "delivered": delivered}
+
+
+def _handle(mode: str, profiler=NULL_PROFILER, prebuilt: tuple[list[Article], dict] | None = None) -> dict:
     logger.info("handler 開始: mode=%s", mode)
+    started = time.perf_counter()
 
-    articles = invoke_agent(mode)
-    logger.info("取得記事数: %d 件", len(articles))
+    t = time.perf_counter()
+    if prebuilt is not None:
+        articles, metrics = prebuilt
+    else:
+        options = {"profile": True, "run_id": profiler.run_id} if profiler.enabled else None
+        with profiler.span("invoke_agent"):
+            articles, metrics = invoke_agent(mode, options)
+    agent_ms = (time.perf_counter() - t) * 1000
+    logger.info("取得記事数: %d 件 mode=%s", len(articles), mode)
+    _record_feed_health(metrics)
+    if mode == "alert" and not articles:
+        # 速報対象なし。10〜15分ごとの空実行はロールアップ（記事数の統計）にも含めない
+        logger.info("alert: 新着の HIGH 記事なし（metrics=%s）", json.dumps(metrics))
+        return {"statusCode": 200, "articles_count": 0}
 
-    blocks = build_slack_blocks(mode, articles)
+    t = time.perf_counter()
+    with profiler.span("render"):
+        blocks = build_slack_blocks(mode, articles)
+    render_ms = (time.perf_counter() - t) * 1000
 
+    # エージェント側のステージ（fetch / parse / dedup / llm …）に handler 側のステージを加える
+    stages_ms = dict(metrics.get("stages_ms", {}))
+    if prebuilt is None:
+        stages_ms["agent_total"] = round(agent_ms)
+    stages_ms["render"] = round(render_ms)
+    metrics = {**metrics, "stages_ms": stages_ms}
+
+    t = time.perf_counter()
     try:
-        slack_client.chat_postMessage(
-            channel=SLACK_CHANNEL_ID,
-            blocks=blocks,
-            text=f"AWS Daily Digest — {MODE_HEADER.get(mode, 'まとめ')}",
-        )
+        with profiler.span("slack_post"):
+            slack_client.chat_postMessage(
+                channel=SLACK_CHANNEL_ID,
+                blocks=blocks,
+                text=f"AWS Daily Digest — {MODE_HEADER.get(mode, 'まとめ')}",
+            )
         logger.info("Slack 通知完了")
     except SlackApiError as e:
         logger.error("Slack 通知失敗: %s", e.response["error"])
+        _record_rollup(mode, len(articles), started, error=True, metrics=metrics)
         raise
+    stages_ms["post"] = round((time.perf_counter() - t) * 1000)
 
+    logger.info("実行メトリクス: mode=%s %s", mode, json.dumps(metrics))
+    _record_rollup(mode, len(articles), started, error=False, metrics=metrics)
+    _archive(mode, articles, profiler.run_id or uuid.uuid4().hex)
     return {"statusCode": 200, "articles_count": len(articles)}
@@ -0,0 +1 @@
+../shared/prompts.py
\ No newline at end of file
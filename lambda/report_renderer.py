@@ -0,0 +1,180 @@
+"""
+AWS Daily Digest — 週次レポートのレンダラー
+
+weekly_report.py が収集した raw_data を Slack mrkdwn に変換する。
+しきい値判定（実行漏れ・エラー・評価スコア）と単位変換（ms → 秒）はすべてコードで行い、
+モデル呼び出しは不要（ナラティブ欄を有効にした場合のみ weekly_report 側で LLM を呼ぶ）。
+週次ベストオブ（render_best_of）も同様に、アーカイブの翻訳済みの記事をそのまま並べる。
+"""
+
+from rollup_store import LATENCY_BUCKETS_MS
+
+EVAL_GOOD    = 0.8   # avg_score >= 0.8 → ✅ 良好
+EVAL_WARNING = 0.6   # 0.6〜0.8 → ⚠️ 要注視、< 0.6 → 🔴 要改善
+
+FEED_ERROR_WARNING = 0.1   # エラー率 10% 以上 → ⚠️
+FEED_STALE_HOURS   = 24    # 最終成功から 24 時間以上 → 🔴
+
+
+def _seconds(ms: float) -> str:
+    """ミリ秒を秒表記に変換する（例: 47230 → 47.2秒）。"""
+    return f"{ms / 1000:,.1f}秒"
+
+
+def _eval_label(score: float) -> str:
+    if score >= EVAL_GOOD:
+        return "✅ 良好"
+    if score >= EVAL_WARNING:
+        return "⚠️ 要注視"
+    return "🔴 要改善"
+
+
+# ─────────────────────────────────────────────────────────
+# セクション
+# ─────────────────────────────────────────────────────────
+
+def render_lambda_metrics(m: dict) -> list[str]:
+    invocations, expected = m.get("invocations", 0), m.get("expected", 0)
+    errors = m.get("errors", 0)
+
+    if invocations < expected:
+        runs_line = f"⚠️ 実行回数: {invocations} / {expected} 回（{expected - invocations} 回の実行漏れ）"
+    else:
+        runs_line = f"✅ 実行回数: {invocations} / {expected} 回"
+
+    if errors > 0:
+        errors_line = f"🔴 エラー: {errors} 件 — CloudWatch Logs で原因を調査してください"
+    else:
+        errors_line = "✅ エラー: 0 件"
+
+    return [
+        "*⚙️ 実行状況*",
+        f"• {runs_line}",
+        f"• {errors_line}",
+        f"• ⏱️ 実行時間: 平均 {_seconds(m.get('duration_avg_ms', 0))} / "
+        f"最大 {_seconds(m.get('duration_max_ms', 0))}",
+    ]
+
+
+def render_article_stats(a: dict) -> list[str]:
+    lines = [
+        "*📰 記事取得数（朝・昼の digest）*",
+        f"• 合計 {a.get('total_articles', 0):,} 件（{a.get('runs', 0)} 回実行）",
+        f"• 1回あたり: 平均 {a.get('avg_articles', 0.0)} / "
+        f"最小 {a.get('min_articles', 0)} / 最大 {a.get('max_articles', 0)} 件",
+    ]
+    by_mode = a.get("by_mode", {})
+    if by_mode:
+        lines.append("• モード別実行数: " + " / ".join(
+            f"{mode} {runs} 回" for mode, runs in sorted(by_mode.items())
+        ))
+    return lines
+
+
+def render_eval_scores(scores: list[dict]) -> list[str]:
+    lines = ["*🧪 評価スコア*"]
+    if not scores:
+        lines.append("• 評価スコア: 未設定（Online Evaluation 設定後に反映されます）")
+        return lines
+    for s in scores:
+        lines.append(
+            f"• {s['evaluator']}: {s['avg_score']:.3f} {_eval_label(s['avg_score'])}"
+            f"（最小 {s['min_score']:.3f} / 最大 {s['max_score']:.3f}, {s['count']} 件）"
+        )
+    return lines
+
+
+def render_performance(perf: dict) -> list[str]:
+    lines = ["*🚦 ステージ別レイテンシ・トークン*"]
+    if not perf:
+        lines.append("• 未集計（日次ロールアップ設定後に反映されます）")
+        return lines
+
+    for stage, p in perf.get("stages", {}).items():
+        lines.append(
+            f"• {stage}: p50 {_seconds(p['p50'])} / p95 {_seconds(p['p95'])} / "
+            f"p99 {_seconds(p['p99'])}（{p['count']} 回）"
+        )
+    for r in perf.get("regressions", []):
+        lines.append(
+            f"• ⚠️ {r['stage']} の p95 が前週より悪化: "
+            f"{_seconds(r['prev_p95'])} → {_seconds(r['p95'])}（+{_seconds(r['delta_ms'])}）"
+        )
+    for mode, u in sorted(perf.get("usage", {}).items()):
+        cached = u.get("cache_read_input_tokens", 0)
+        lines.append(
+            f"• 🪙 {mode}: {u['total_tokens']:,} tokens"
+            f"（入力 {u['input_tokens']:,} / 出力 {u['output_tokens']:,}"
+            + (f" / キャッシュ読込 {cached:,}" if cached else "")
+            + f"）≈ ${u['cost_usd']:.2f}"
+        )
+    return lines
+
+
+def _latency(ms: float | None) -> str:
+    return f"≤{_seconds(ms)}" if ms is not None else f">{_seconds(LATENCY_BUCKETS_MS[-1])}"
+
+
+def render_feed_health(feeds: dict) -> list[str]:
+    """問題のあるフィードだけを列挙する（全フィードが正常なら1行）。"""
+    lines = ["*📡 フィード健全性*"]
+    if not feeds:
+        lines.append("• 未集計（日次ロールアップ設定後に反映されます）")
+        return lines
+
+    attempts = sum(f["attempts"] for f in feeds.values())
+    errors = sum(f["errors"] for f in feeds.values())
+    hedged = sum(f["hedged"] for f in feeds.values())
+    lines.append(f"• {len(feeds)} フィード / 取得 {attempts:,} 回 / 失敗 {errors:,} 回 / ヘッジ {hedged:,} 回")
+
+    problems = []
+    for name, f in feeds.items():
+        stale = f["hours_since_success"] is None or f["hours_since_success"] >= FEED_STALE_HOURS
+        if stale:
+            since = "期間内の成功なし" if f["last_success"] is None else f"最終成功 {f['hours_since_success']:.0f} 時間前"
+            problems.append(f"• 🔴 {name}: {since}（直近のエラー: {f['last_error'] or '不明'}）")
+        elif f["error_rate"] >= FEED_ERROR_WARNING or f["skipped"]:
+            problems.append(
+                f"• ⚠️ {name}: エラー率 {f['error_rate']:.0%}（{f['errors']} / {f['attempts']} 回）"
+                + (f", ブレーカーでスキップ {f['skipped']} 回" if f["skipped"] else "")
+                + f", p95 {_latency(f['p95_ms'])}"
+            )
+    lines.extend(problems or ["• ✅ すべてのフィードが正常に取得できています"])
+    return lines
+
+
+# ─────────────────────────────────────────────────────────
+# レポート全体
+# ─────────────────────────────────────────────────────────
+
+def render_weekly_report(raw_data: dict, period_label: str, narrative: str = "") -> str:
+    """週次レポートの Slack mrkdwn テキストを組み立てる。narrative があれば末尾に追加する。"""
+    sections = [
+        [f"*📊 AWS Digest 週次レポート（{period_label}）*"],
+        render_lambda_metrics(raw_data.get("lambda_metrics", {})),
+        render_article_stats(raw_data.get("article_stats", {})),
+        render_eval_scores(raw_data.get("eval_scores", [])),
+        render_performance(raw_data.get("performance", {})),
+        render_feed_health(raw_data.get("feed_health", {})),
+    ]
+    if narrative:
+        sections.append(["*💬 所感*", narrative.strip()])
+
+    return "\n\n".join("\n".join(lines) for lines in sections)
+
+
+def render_best_of(best_of: dict, period_label: str, summary: str = "") -> str:
+    """週次ベストオブの Slack mrkdwn テキストを組み立てる。summary があれば見出しの直後に入れる。"""
+    sections = [[f"*🏆 AWS 今週のハイライト（{period_label}）*"]]
+    if summary:
+        sections.append([summary.strip()])
+    if not best_of.get("groups"):
+        sections.append(["今週配信した重要度 HIGH の記事はありませんでした。"])
+    for group in best_of.get("groups", []):
+        lines = [f"*{group['category']}*"]
+        for a in group["articles"]:
+            lines.append(f"• <{a['link']}|{a['title_ja']}>")
+            if a.get("summary_ja"):
+                lines.append(f"    {a['summary_ja']}")
+        sections.append(lines)
+    return "\n\n".join("\n".join(lines) for lines in sections)
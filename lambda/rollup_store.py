@@ -0,0 +1,421 @@
+"""
+AWS Daily Digest — 日次ロールアップストア
+
+handler の実行ごとに (日付, モード) 単位の集計レコードを1件だけ更新しておき、
+週次レポート（将来の月次レポートも）はその期間のレコードをマージするだけで統計を得る。
+生ログのスキャンが不要になり、集計コストは O(日数 × モード数) になる。
+
+バックエンド:
+  S3RollupStore     : ROLLUP_BUCKET 設定時（本番）
+  SQLiteRollupStore : ROLLUP_DB_PATH 設定時（ローカル・テスト）
+
+レコードの更新（update）は読み込み・加算・保存を1単位で行う。alert・prefetch・digest の実行が重なっても
+加算を失わないよう、S3 は条件付き書き込み（作成は If-None-Match、更新は ETag の If-Match）が
+競合したら読み直して再試行し、SQLite は BEGIN IMMEDIATE で排他する。
+
+レコード形式（日付は JST）:
+  {"date": "2026-10-19", "mode": "morning", "runs": 1, "errors": 0,
+   "total_articles": 12, "min_articles": 12, "max_articles": 12,
+   "duration_ms_total": 48210, "duration_ms_max": 48210,
+   "stage_samples": {"fetch": [2310], "llm": [41200], "post": [380]},
+   "input_tokens": 18234, "output_tokens": 4121, "total_tokens": 22355,
+   "cache_read_input_tokens": 0, "cache_write_input_tokens": 0}
+input_tokens はキャッシュされなかった入力。キャッシュから読んだ入力・キャッシュに書いた入力は別に数える（単価が違うため）。
+
+stage_samples は実行ごとのステージ別所要時間（ms）。1日数回の実行なので生値をそのまま持ち、
+パーセンタイルは集計側でマージ後に計算する。
+
+フィード健全性は mode="feed_health" の別レコードに日単位で集計する（prefetch・alert を含む全実行の取得結果）。
+15分ごとの取得が加わるため、レイテンシは生値ではなく固定バケットのヒストグラムで持つ:
+  {"date": "2026-10-19", "mode": "feed_health",
+   "feeds": {"What's New": {"ok": 95, "errors": 1, "skipped": 0, "hedged": 2,
+                            "latency_hist": [80, 12, 3, 1, 0, 0, 0, 0],
+                            "last_success": "2026-10-19T14:55:01+00:00", "last_error": "TimeoutError: ..."}}}
+"""
+
+import json
+import logging
+import os
+import random
+import sqlite3
+import time
+from bisect import bisect_left
+from datetime import date, datetime, timedelta, timezone
+
+logger = logging.getLogger()
+
+JST = timezone(timedelta(hours=9))
+
+FEED_HEALTH_MODE = "feed_health"
+DIGEST_MODES = ("morning", "noon")  # 記事数の統計の対象（alert は速報のため実行数だけを by_mode に数える）
+USAGE_KEYS = ("input_tokens", "output_tokens", "total_tokens", "cache_read_input_tokens", "cache_write_input_tokens")
+LATENCY_BUCKETS_MS = (250, 500, 1000, 2000, 5000, 10000, 15000)  # 上限値。最後のバケットはそれより遅いもの
+UPDATE_ATTEMPTS = 5       # 条件付き書き込みが競合した場合の試行回数
+UPDATE_BACKOFF_S = 0.1    # 再試行前の待機の基準（試行ごとに倍、ジッターあり）
+
+
+# ─────────────────────────────────────────────────────────
+# レコード操作（純粋関数）
+# ─────────────────────────────────────────────────────────
+
+def empty_record(day: str, mode: str) -> dict:
+    """(日付, モード) の空レコードを返す。"""
+    return {
+        "date":              day,
+        "mode":              mode,
+        "runs":              0,
+        "errors":            0,
+        "total_articles":    0,
+        "min_articles":      None,
+        "max_articles":      None,
+        "duration_ms_total": 0,
+        "duration_ms_max":   0,
+        "stage_samples":     {},
+        "input_tokens":      0,
+        "output_tokens":     0,
+        "total_tokens":      0,
+        "cache_read_input_tokens":  0,
+        "cache_write_input_tokens": 0,
+    }
+
+
+def apply_run(record: dict, articles_count: int, duration_ms: int, error: bool = False,
+              stages_ms: dict | None = None, usage: dict | None = None) -> dict:
+    """1回分の実行結果をレコードに加算する（record を更新して返す）。"""
+    record["runs"] += 1
+    if error:
+        record["errors"] += 1
+    record["total_articles"] += articles_count
+    record["min_articles"] = (
+        articles_count if record["min_articles"] is None
+        else min(record["min_articles"], articles_count)
+    )
+    record["max_articles"] = (
+        articles_count if record["max_articles"] is None
+        else max(record["max_articles"], articles_count)
+    )
+    record["duration_ms_total"] += duration_ms
+    record["duration_ms_max"] = max(record["duration_ms_max"], duration_ms)
+
+    samples = record.setdefault("stage_samples", {})
+    for stage, ms in (stages_ms or {}).items():
+        samples.setdefault(stage, []).append(ms)
+    for key in USAGE_KEYS:
+        record[key] = record.get(key, 0) + int((usage or {}).get(key, 0))
+    return record
+
+
+def merge_rollups(records: list[dict]) -> dict:
+    """
+    日次レコードをマージして weekly_report.collect_article_stats と同じ形式の統計を返す。
+    記事数・実行数は DIGEST_MODES のレコードだけで計算し、by_mode には全モードの実行数を入れる。
+    期間の長さには依存しないため、月次レポートにもそのまま使える。
+    """
+    result: dict = {
+        "total_articles": 0,
+        "avg_articles":   0.0,
+        "min_articles":   0,
+        "max_articles":   0,
+        "runs":           0,
+        "by_mode":        {},
+    }
+    mins, maxs = [], []
+
+    for r in records:
+        mode = r.get("mode", "unknown")
+        result["by_mode"][mode] = result["by_mode"].get(mode, 0) + r.get("runs", 0)
+        if mode not in DIGEST_MODES:
+            continue
+        result["total_articles"] += r.get("total_articles", 0)
+        result["runs"]           += r.get("runs", 0)
+        if r.get("min_articles") is not None:
+            mins.append(r["min_articles"])
+        if r.get("max_articles") is not None:
+            maxs.append(r["max_articles"])
+
+    if result["runs"]:
+        result["avg_articles"] = round(result["total_articles"] / result["runs"], 1)
+    result["min_articles"] = min(mins) if mins else 0
+    result["max_articles"] = max(maxs) if maxs else 0
+    return result
+
+
+def _empty_feed_health() -> dict:
+    return {
+        "ok": 0, "errors": 0, "skipped": 0, "hedged": 0,
+        "latency_hist": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+        "last_success": None, "last_error": None,
+    }
+
+
+def _merge_feed_health(target: dict, source: dict) -> None:
+    for key in ("ok", "errors", "skipped", "hedged"):
+        target[key] += source.get(key, 0)
+    if source.get("last_success"):
+        target["last_success"] = max(target["last_success"] or "", source["last_success"])
+    if source.get("errors") and source.get("last_error"):
+        target["last_error"] = source["last_error"]
+
+
+def apply_feed_health(record: dict, feed_health: dict) -> dict:
+    """1回分のフィード取得結果（feed_health.FeedHealth.run_metrics()）を健全性レコードに加算する。"""
+    feeds = record.setdefault("feeds", {})
+    for name, obs in feed_health.items():
+        f = feeds.setdefault(name, _empty_feed_health())
+        _merge_feed_health(f, obs)
+        for ms in obs.get("latency_ms", []):
+            f["latency_hist"][bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+    return record
+
+
+def histogram_percentile(hist: list[int], pct: float) -> float | None:
+    """ヒストグラムのパーセンタイル（該当バケットの上限値）。最後のバケットは None（上限なし）。"""
+    total = sum(hist)
+    if not total:
+        return 0.0
+    rank = max(1, -(-total * pct // 100))
+    seen = 0
+    for i, count in enumerate(hist):
+        seen += count
+        if seen >= rank:
+            return float(LATENCY_BUCKETS_MS[i]) if i < len(LATENCY_BUCKETS_MS) else None
+    return None
+
+
+def summarize_feed_health(records: list[dict]) -> dict[str, dict]:
+    """健全性レコードをマージし、フィードごとのエラー率・p50 / p95（バケット上限）・最終成功時刻を返す。"""
+    merged: dict[str, dict] = {}
+    for r in records:  # 日付順（last_error は後の日付が残る）
+        for name, f in r.get("feeds", {}).items():
+            m = merged.setdefault(name, _empty_feed_health())
+            _merge_feed_health(m, f)
+            m["latency_hist"] = [a + b for a, b in zip(m["latency_hist"], f.get("latency_hist", []))]
+
+    result = {}
+    for name, m in sorted(merged.items()):
+        attempts = m["ok"] + m["errors"]
+        result[name] = {
+            "attempts":     attempts,
+            "errors":       m["errors"],
+            "error_rate":   round(m["errors"] / attempts, 3) if attempts else 0.0,
+            "skipped":      m["skipped"],
+            "hedged":       m["hedged"],
+            "p50_ms":       histogram_percentile(m["latency_hist"], 50),
+            "p95_ms":       histogram_percentile(m["latency_hist"], 95),
+            "last_success": m["last_success"],
+            "last_error":   m["last_error"],
+        }
+    return result
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """最近傍順位法によるパーセンタイル（values が空なら 0）。"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))  # ceil(n * pct / 100)
+    return float(ordered[int(rank) - 1])
+
+
+def summarize_stages(records: list[dict]) -> dict[str, dict]:
+    """日次レコードのステージ別サンプルをマージし、p50 / p95 / p99 を計算する。"""
+    merged: dict[str, list] = {}
+    for r in records:
+        for stage, values in r.get("stage_samples", {}).items():
+            merged.setdefault(stage, []).extend(values)
+    return {
+        stage: {
+            "p50":   round(percentile(values, 50)),
+            "p95":   round(percentile(values, 95)),
+            "p99":   round(percentile(values, 99)),
+            "count": len(values),
+        }
+        for stage, values in sorted(merged.items())
+    }
+
+
+def summarize_usage(records: list[dict]) -> dict[str, dict]:
+    """日次レコードのトークン使用量をモード別に合算する。"""
+    by_mode: dict[str, dict] = {}
+    for r in records:
+        m = by_mode.setdefault(r.get("mode", "unknown"), {"runs": 0, **{k: 0 for k in USAGE_KEYS}})
+        m["runs"] += r.get("runs", 0)
+        for key in USAGE_KEYS:
+            m[key] += r.get(key, 0)
+    return by_mode
+
+
+def days_between(start: datetime, end: datetime) -> list[str]:
+    """
+    start〜end（UTC）の JST 日付を YYYY-MM-DD 形式で列挙する。
+    レコードは日単位のため、start が日の途中の場合はその日を含めない
+    （月曜 10:00 起点の7日間 → 火曜〜当日月曜の7日分）。
+    """
+    start_jst = start.astimezone(JST)
+    first: date = start_jst.date()
+    if start_jst.time() != datetime.min.time():
+        first += timedelta(days=1)
+    last: date = end.astimezone(JST).date()
+    return [(first + timedelta(days=i)).isoformat() for i in range((last - first).days + 1)]
+
+
+# ─────────────────────────────────────────────────────────
+# バックエンド
+# ─────────────────────────────────────────────────────────
+
+class SQLiteRollupStore:
+    """ローカルファイル（または :memory:）に保存するロールアップストア。"""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rollups ("
+            " day TEXT NOT NULL, mode TEXT NOT NULL, record TEXT NOT NULL,"
+            " PRIMARY KEY (day, mode))"
+        )
+        self._conn.commit()
+
+    def get(self, day: str, mode: str) -> dict | None:
+        row = self._conn.execute(
+            "SELECT record FROM rollups WHERE day = ? AND mode = ?", (day, mode)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, record: dict) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO rollups (day, mode, record) VALUES (?, ?, ?)",
+            (record["date"], record["mode"], json.dumps(record, ensure_ascii=False)),
+        )
+        self._conn.commit()
+
+    def query(self, days: list[str]) -> list[dict]:
+        if not days:
+            return []
+        placeholders = ",".join("?" * len(days))
+        rows = self._conn.execute(
+            f"SELECT record FROM rollups WHERE day IN ({placeholders}) ORDER BY day, mode",
+            days,
+        ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def update(self, day: str, mode: str, apply) -> dict:
+        """apply(現在のレコード or None) の結果を保存する。別プロセスの更新とは BEGIN IMMEDIATE で排他する。"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            record = apply(self.get(day, mode))
+            self.put(record)
+        except BaseException:
+            self._conn.rollback()
+            raise
+        return record
+
+
+class S3RollupStore:
+    """s3://{bucket}/{prefix}daily/{YYYY-MM-DD}/{mode}.json に保存するロールアップストア。"""
+
+    def __init__(self, bucket: str, prefix: str = "rollups/"):
+        import boto3
+
+        self._s3     = boto3.client("s3")
+        self._bucket = bucket
+        self._prefix = prefix
+
+    def _key(self, day: str, mode: str) -> str:
+        return f"{self._prefix}daily/{day}/{mode}.json"
+
+    def get(self, day: str, mode: str) -> dict | None:
+        try:
+            obj = self._s3.get_object(Bucket=self._bucket, Key=self._key(day, mode))
+        except self._s3.exceptions.NoSuchKey:
+            return None
+        return json.loads(obj["Body"].read())
+
+    def put(self, record: dict) -> None:
+        self._s3.put_object(
+            Bucket=self._bucket,
+            Key=self._key(record["date"], record["mode"]),
+            Body=json.dumps(record, ensure_ascii=False).encode("utf-8"),
+            ContentType="application/json",
+        )
+
+    def query(self, days: list[str]) -> list[dict]:
+        records = []
+        for day in days:
+            resp = self._s3.list_objects_v2(Bucket=self._bucket, Prefix=f"{self._prefix}daily/{day}/")
+            for item in resp.get("Contents", []):
+                obj = self._s3.get_object(Bucket=self._bucket, Key=item["Key"])
+                records.append(json.loads(obj["Body"].read()))
+        return records
+
+    def update(self, day: str, mode: str, apply) -> dict:
+        """
+        apply(現在のレコード or None) の結果を条件付き書き込みで保存する。
+        読み込んでから他の実行が書き込んでいれば（412 / 409）読み直して apply からやり直す。
+        """
+        key = self._key(day, mode)
+        for attempt in range(UPDATE_ATTEMPTS):
+            try:
+                obj = self._s3.get_object(Bucket=self._bucket, Key=key)
+                current, condition = json.loads(obj["Body"].read()), {"IfMatch": obj["ETag"]}
+            except self._s3.exceptions.NoSuchKey:
+                current, condition = None, {"IfNoneMatch": "*"}
+            record = apply(current)
+            try:
+                self._s3.put_object(
+                    Bucket=self._bucket,
+                    Key=key,
+                    Body=json.dumps(record, ensure_ascii=False).encode("utf-8"),
+                    ContentType="application/json",
+                    **condition,
+                )
+                return record
+            except self._s3.exceptions.ClientError as e:
+                if e.response.get("Error", {}).get("Code") not in ("PreconditionFailed", "ConditionalRequestConflict"):
+                    raise
+            logger.info("ロールアップの同時更新を検出したため読み直します [%s] (%d回目)", key, attempt + 1)
+            time.sleep(random.uniform(0, UPDATE_BACKOFF_S * 2 ** attempt))
+        raise RuntimeError(f"ロールアップの更新が {UPDATE_ATTEMPTS} 回競合したため中断しました: {key}")
+
+
+def get_rollup_store():
+    """環境変数からストアを生成する。未設定の場合は None（ロールアップ無効）。"""
+    bucket = os.environ.get("ROLLUP_BUCKET", "")
+    if bucket:
+        return S3RollupStore(bucket, os.environ.get("ROLLUP_PREFIX", "rollups/"))
+    db_path = os.environ.get("ROLLUP_DB_PATH", "")
+    if db_path:
+        return SQLiteRollupStore(db_path)
+    return None
+
+
+# ─────────────────────────────────────────────────────────
+# handler / weekly_report から使う入口
+# ─────────────────────────────────────────────────────────
+
+def record_run(store, mode: str, articles_count: int, duration_ms: int,
+               error: bool = False, stages_ms: dict | None = None, usage: dict | None = None,
+               now: datetime | None = None) -> dict:
+    """実行1回分を当日 (JST) の (日付, モード) レコードに反映して保存する。"""
+    day = (now or datetime.now(timezone.utc)).astimezone(JST).date().isoformat()
+    record = store.update(day, mode, lambda current: apply_run(
+        current or empty_record(day, mode), articles_count, duration_ms, error, stages_ms, usage))
+    logger.info("ロールアップ更新: %s", json.dumps(record, ensure_ascii=False))
+    return record
+
+
+def record_feed_health(store, feed_health: dict, now: datetime | None = None) -> dict:
+    """実行1回分のフィード取得結果を当日 (JST) の健全性レコードに反映して保存する。"""
+    day = (now or datetime.now(timezone.utc)).astimezone(JST).date().isoformat()
+    return store.update(day, FEED_HEALTH_MODE, lambda current: apply_feed_health(
+        current or {"date": day, "mode": FEED_HEALTH_MODE, "feeds": {}}, feed_health))
+
+
+def load_period(store, start: datetime, end: datetime) -> list[dict]:
+    """期間内の日次レコード（実行単位の集計）をすべて取得する。"""
+    return [r for r in store.query(days_between(start, end)) if r.get("mode") != FEED_HEALTH_MODE]
+
+
+def load_feed_health(store, start: datetime, end: datetime) -> list[dict]:
+    """期間内のフィード健全性レコードを日付順に取得する。"""
+    records = [r for r in store.query(days_between(start, end)) if r.get("mode") == FEED_HEALTH_MODE]
+    return sorted(records, key=lambda r: r["date"])
@@ -0,0 +1,249 @@
+"""
+同じモード・同じ時間窓の handler 実行の重複防止（single-flight）
+
+EventBridge の非同期リトライ・手動の再実行・前回の実行の長引きで、同じモードの handler が同時に2つ動くと、
+それぞれが AgentCore のセッションを使い、同じ digest を2回投稿してしまう。
+(モード, 時間窓) をキーにしたリースを条件付き書き込みで取り、最初の実行だけが処理する。
+
+  キー     : morning / noon は "{mode}#{JST日付}"、alert は "{mode}#{JST日付}T{HH:MM}"（ALERT_WINDOW_MINUTES 単位）
+  リース   : status=running と期限（lease_until）を書き込めた実行が処理する（owner）
+             期限は Lambda の残り時間 + LEASE_MARGIN_S（タイムアウト・クラッシュした実行は期限切れで引き継げる）
+  完了     : owner が status=done と結果（handler の戻り値）を書く。owner が変わっていれば書かない
+  失敗     : owner が例外で終わった場合は status=failed にする（リトライがすぐに引き継げる）
+  後続     : done なら owner の結果を返す（attached）。running なら wait_s まで完了を待ち
+             （その間に owner が失敗・期限切れになれば引き継ぐ）、完了しなければ何もせずに終わる（in_progress）
+
+ストアの障害時は重複防止をあきらめて処理を続ける（投稿の重複より欠落のほうが困るため）。
+
+制約: alert のキーは 15 分の窓ごとに変わるため、窓をまたいで長引いた alert の実行と、次の窓の alert の実行は
+別のキーになり重なりうる（後者も同じ記事を通知しうる）。防ぐ必要があれば alert のキーをモードだけにし、
+前回の実行の完了を待つ（wait_s）か、in_progress で終わらせる。
+
+バックエンド:
+  DynamoLeaseStore  : SINGLE_FLIGHT_TABLE 設定時（本番。pk=キー、expires_at で TTL 削除）
+  SQLiteLeaseStore  : SINGLE_FLIGHT_DB_PATH 設定時（ローカル・テスト。プロセスをまたいで排他できる）
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+JST = timezone(timedelta(hours=9))
+
+COALESCED_MODES      = ("morning", "noon", "alert")
+ALERT_WINDOW_MINUTES = 15     # alert のスケジュール間隔
+LEASE_MARGIN_S       = 60     # Lambda の残り時間に足す余裕
+DEFAULT_LEASE_S      = 900    # 残り時間が分からない場合（Lambda の最大実行時間）
+POLL_INTERVAL_S      = 2
+RECORD_TTL_DAYS      = 7
+
+RUNNING, DONE, FAILED = "running", "done", "failed"
+OWNER, ATTACHED, IN_PROGRESS = "owner", "attached", "in_progress"
+
+
+def window_key(mode: str, now: datetime | None = None) -> str | None:
+    """(モード, 時間窓) のキー。重複防止の対象外のモードは None。"""
+    if mode not in COALESCED_MODES:
+        return None
+    now_jst = (now or datetime.now(timezone.utc)).astimezone(JST)
+    if mode == "alert":
+        slot = now_jst.minute - now_jst.minute % ALERT_WINDOW_MINUTES
+        return f"{mode}#{now_jst:%Y-%m-%dT%H}:{slot:02d}"
+    return f"{mode}#{now_jst:%Y-%m-%d}"
+
+
+def lease_seconds(context) -> float:
+    """Lambda の残り時間 + 余裕。この実行がこれより長く生きることはない。"""
+    remaining = getattr(context, "get_remaining_time_in_millis", None)
+    return remaining() / 1000 + LEASE_MARGIN_S if remaining else DEFAULT_LEASE_S
+
+
+# ─────────────────────────────────────────────────────────
+# バックエンド
+# ─────────────────────────────────────────────────────────
+
+class SQLiteLeaseStore:
+    """ローカルファイル（または :memory:）に保存するリースストア。BEGIN IMMEDIATE で読み書きを排他する。"""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS leases ("
+            " key TEXT PRIMARY KEY, owner TEXT NOT NULL, status TEXT NOT NULL,"
+            " lease_until REAL NOT NULL, started_at REAL NOT NULL, result TEXT)"
+        )
+
+    def _row(self, key: str) -> dict | None:
+        row = self._conn.execute(
+            "SELECT owner, status, lease_until, started_at, result FROM leases WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"key": key, "owner": row[0], "status": row[1], "lease_until": row[2],
+                "started_at": row[3], "result": json.loads(row[4]) if row[4] else None}
+
+    def try_acquire(self, key: str, owner: str, lease_until: float, now: float) -> dict | None:
+        """リースを取れれば None、取れなければ現在のレコードを返す。"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            current = self._row(key)
+            if current and not (current["status"] == FAILED
+                                or (current["status"] == RUNNING and current["lease_until"] < now)):
+                return current
+            self._conn.execute(
+                "INSERT OR REPLACE INTO leases (key, owner, status, lease_until, started_at, result)"
+                " VALUES (?, ?, ?, ?, ?, NULL)",
+                (key, owner, RUNNING, lease_until, now),
+            )
+            return None
+        finally:
+            self._conn.execute("COMMIT")
+
+    def get(self, key: str) -> dict | None:
+        return self._row(key)
+
+    def _finish(self, key: str, owner: str, status: str, result: dict | None) -> bool:
+        cur = self._conn.execute(
+            "UPDATE leases SET status = ?, result = ? WHERE key = ? AND owner = ? AND status = ?",
+            (status, json.dumps(result, ensure_ascii=False) if result is not None else None, key, owner, RUNNING),
+        )
+        return cur.rowcount == 1
+
+    def complete(self, key: str, owner: str, result: dict) -> bool:
+        return self._finish(key, owner, DONE, result)
+
+    def release(self, key: str, owner: str) -> bool:
+        return self._finish(key, owner, FAILED, None)
+
+
+class DynamoLeaseStore:
+    """DynamoDB（pk=キー）のリースストア。期限切れ・失敗の判定は条件式で行う。"""
+
+    def __init__(self, table_name: str):
+        import boto3  # ローカル実行では不要なため遅延インポート
+        self.table_name = table_name
+        self._client = boto3.client("dynamodb")
+
+    def try_acquire(self, key: str, owner: str, lease_until: float, now: float) -> dict | None:
+        """リースを取れれば None、取れなければ現在のレコードを返す。"""
+        try:
+            self._client.put_item(
+                TableName=self.table_name,
+                Item={
+                    "pk": {"S": key}, "owner": {"S": owner}, "status": {"S": RUNNING},
+                    "lease_until": {"N": str(lease_until)}, "started_at": {"N": str(now)},
+                    "expires_at": {"N": str(int(now) + RECORD_TTL_DAYS * 86400)},
+                },
+                ConditionExpression=(
+                    "attribute_not_exists(pk) OR #s = :failed OR (#s = :running AND lease_until < :now)"
+                ),
+                ExpressionAttributeNames={"#s": "status"},
+                ExpressionAttributeValues={
+                    ":failed": {"S": FAILED}, ":running": {"S": RUNNING}, ":now": {"N": str(now)},
+                },
+            )
+            return None
+        except self._client.exceptions.ConditionalCheckFailedException:
+            return self.get(key)
+
+    def get(self, key: str) -> dict | None:
+        item = self._client.get_item(
+            TableName=self.table_name, Key={"pk": {"S": key}}, ConsistentRead=True,
+        ).get("Item")
+        if item is None:
+            return None
+        return {
+            "key":         key,
+            "owner":       item["owner"]["S"],
+            "status":      item["status"]["S"],
+            "lease_until": float(item["lease_until"]["N"]),
+            "started_at":  float(item["started_at"]["N"]),
+            "result":      json.loads(item["result"]["S"]) if "result" in item else None,
+        }
+
+    def _finish(self, key: str, owner: str, status: str, result: dict | None) -> bool:
+        values = {":status": {"S": status}, ":owner": {"S": owner}, ":running": {"S": RUNNING}}
+        update = "SET #s = :status"
+        if result is not None:
+            update += ", #r = :result"
+            values[":result"] = {"S": json.dumps(result, ensure_ascii=False)}
+        try:
+            self._client.update_item(
+                TableName=self.table_name,
+                Key={"pk": {"S": key}},
+                UpdateExpression=update,
+                ConditionExpression="#o = :owner AND #s = :running",
+                ExpressionAttributeNames={"#s": "status", "#o": "owner",
+                                          **({"#r": "result"} if result is not None else {})},
+                ExpressionAttributeValues=values,
+            )
+            return True
+        except self._client.exceptions.ConditionalCheckFailedException:
+            return False
+
+    def complete(self, key: str, owner: str, result: dict) -> bool:
+        return self._finish(key, owner, DONE, result)
+
+    def release(self, key: str, owner: str) -> bool:
+        return self._finish(key, owner, FAILED, None)
+
+
+def get_lease_store():
+    """環境変数からストアを生成する。未設定の場合は None（重複防止なし）。"""
+    table = os.environ.get("SINGLE_FLIGHT_TABLE", "")
+    if table:
+        return DynamoLeaseStore(table)
+    db_path = os.environ.get("SINGLE_FLIGHT_DB_PATH", "")
+    if db_path:
+        return SQLiteLeaseStore(db_path)
+    return None
+
+
+# ─────────────────────────────────────────────────────────
+# 実行
+# ─────────────────────────────────────────────────────────
+
+def run(store, key: str, owner: str, work: Callable[[], dict],
+        lease_s: float = DEFAULT_LEASE_S, wait_s: float = 0) -> tuple[str, dict | None]:
+    """
+    リースを取れれば work() を実行して (OWNER, 結果) を返す。
+    取れなければ (ATTACHED, owner の結果) または (IN_PROGRESS, None) を返す。
+    """
+    now = time.time()
+    lease_until = now + lease_s   # 待っている間も Lambda の期限は変わらない
+    try:
+        while (current := store.try_acquire(key, owner, lease_until, time.time())) is not None:
+            if current["status"] == DONE:
+                logger.info("single-flight: 完了済みの実行の結果を返します [%s] owner=%s", key, current["owner"])
+                return ATTACHED, current["result"]
+            if time.time() >= now + wait_s:
+                logger.info("single-flight: 実行中のため終了します [%s] owner=%s 期限=%s", key, current["owner"],
+                            datetime.fromtimestamp(current["lease_until"], JST).isoformat(timespec="seconds"))
+                return IN_PROGRESS, None
+            time.sleep(POLL_INTERVAL_S)
+    except Exception as e:
+        logger.warning("single-flight: リース取得に失敗したため重複防止なしで実行します [%s]: %s", key, e)
+        return OWNER, work()
+
+    logger.info("single-flight: リース取得 [%s] owner=%s 期間=%.0f秒", key, owner, lease_s)
+    try:
+        result = work()
+    except BaseException:
+        _finish(store.release, key, owner)
+        raise
+    _finish(lambda k, o: store.complete(k, o, result), key, owner)
+    return OWNER, result
+
+
+def _finish(finish: Callable[[str, str], bool], key: str, owner: str) -> None:
+    try:
+        if not finish(key, owner):
+            logger.warning("single-flight: リースが他の実行に引き継がれていたため結果を記録しません [%s]", key)
+    except Exception as e:
+        logger.warning("single-flight: リースの更新に失敗 [%s]: %s", key, e)
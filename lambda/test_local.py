@@ -0,0 +1,52 @@
+"""
+ローカルテストスクリプト（AWS・Slack 不要）
+
+Step 1: 日次ロールアップの記事数の統計（alert の実行を朝・昼の digest と混ぜないこと）
+
+Usage:
+  python test_local.py
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+# handler.py と同じディレクトリで実行するための設定
+sys.path.insert(0, os.path.dirname(__file__))
+
+
+# ─────────────────────────────────────────────
+# Step 1: ロールアップの記事数の統計
+# ─────────────────────────────────────────────
+
+def test_rollup_article_stats():
+    print("=" * 60)
+    print("Step 1: ロールアップの記事数の統計（alert を含む週）")
+    print("=" * 60)
+
+    from rollup_store import SQLiteRollupStore, load_period, merge_rollups, record_run
+
+    store = SQLiteRollupStore(":memory:")
+    end = datetime(2026, 10, 19, 1, 0, tzinfo=timezone.utc)   # 月曜 10:00 JST
+    start = end - timedelta(days=7)
+    day = end - timedelta(hours=2)
+    record_run(store, "morning", 10, 40_000, now=day)
+    record_run(store, "noon", 20, 60_000, now=day)
+    for count in (1, 1, 2):
+        record_run(store, "alert", count, 20_000, now=day)
+
+    stats = merge_rollups(load_period(store, start, end))
+    print(f"  {stats}")
+    expected = {"total_articles": 30, "avg_articles": 15.0, "min_articles": 10, "max_articles": 20, "runs": 2,
+                "by_mode": {"morning": 1, "noon": 1, "alert": 3}}
+    ok = stats == expected
+    print("  ✅ OK" if ok else f"  ❌ NG（期待値: {expected}）")
+    return ok
+
+
+# ─────────────────────────────────────────────
+# メイン
+# ─────────────────────────────────────────────
+
+if __name__ == "__main__":
+    sys.exit(0 if test_rollup_article_stats() else 1)
@@ -3,10 +3,19 @@ AWS Daily Digest — 週次レポート Lambda
 
 毎週月曜 09:00 JST（UTC 00:00）に実行し:
   1. CloudWatch Metrics からハンドラー Lambda の過去7日分の実行データを収集
-  2. CloudWatch Logs Insights からハンドラーログの記事数を集計
+  2. 日次ロールアップ（ROLLUP_BUCKET 設定時）または CloudWatch Logs Insights から記事数を集計
   3. CloudWatch Logs Insights から Online Evaluation スコアを集計（EVAL_LOG_GROUP 設定済みの場合）
-  4. Bedrock InvokeModel で Slack 用レポートを生成
+     日次ロールアップからステージ別レイテンシ（p50/p95/p99）・モード別トークン数とコストを集計し、
+     前週比の悪化を検出
+     日次ロールアップからフィードごとの健全性（エラー率・レイテンシ・最終成功時刻）を集計
+  4. report_renderer で Slack 用レポートを組み立て（しきい値判定・単位変換はコードで実施）
+     ナラティブ欄が有効な場合のみ Bedrock InvokeModel で所感を生成して追記
   5. Slack に投稿
+
+event の mode が "best_of" の場合は運用レポートの代わりに週次ベストオブを投稿する:
+  配信済み記事のアーカイブ（ARCHIVE_BUCKET の archive/segments/）から今週の記事レコードを読み、
+  HIGH の記事を relevance でランキングしてカテゴリ別に並べる。フィードの再取得・翻訳は行わない。
+  総評（narrative 有効時のみ）も選んだ記事のカテゴリとタイトルだけを渡す1回の呼び出しで生成する。
 """
 
 import json
@@ -19,6 +28,21 @@ import boto3
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
 
+from digest_archive import get_archive_store
+from digest_archive import load_period as load_archive_period
+from report_renderer import render_best_of, render_weekly_report
+from rollup_store import (
+    DIGEST_MODES,
+    days_between,
+    get_rollup_store,
+    load_feed_health,
+    load_period,
+    merge_rollups,
+    summarize_feed_health,
+    summarize_stages,
+    summarize_usage,
+)
+
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
@@ -27,15 +51,31 @@ SLACK_CHANNEL_ID      = os.environ["SLACK_CHANNEL_ID"]
 HANDLER_FUNCTION_NAME = os.environ["HANDLER_FUNCTION_NAME"]
 EVAL_LOG_GROUP        = os.environ.get("EVAL_LOG_GROUP", "")   # Online Evaluation 設定後に追加
 REPORT_MODEL_ID       = os.environ["REPORT_MODEL_ID"]
+REPORT_NARRATIVE      = os.environ.get("REPORT_NARRATIVE", "false").lower() == "true"
 
 cw           = boto3.client("cloudwatch")
 logs_client  = boto3.client("logs")
-bedrock      = boto3.client("bedrock-runtime")
-slack_client = WebClient(token=SLACK_BOT_TOKEN)
+slack_client = WebClient(token=SLACK_BOT_TOKEN, base_url=os.environ.get("SLACK_API_URL", WebClient.BASE_URL))
+rollup_store = get_rollup_store()  # 未設定なら Logs Insights で生ログを集計
 
 REPORT_DAYS           = 7
 LOGS_INSIGHTS_TIMEOUT = 60  # seconds
 
+# トークン単価（USD / 1K tokens）。既定値は Claude 3.5 Sonnet のオンデマンド料金
+PRICE_INPUT_PER_1K  = float(os.environ.get("PRICE_INPUT_PER_1K",  "0.003"))
+PRICE_OUTPUT_PER_1K = float(os.environ.get("PRICE_OUTPUT_PER_1K", "0.015"))
+# プロンプトキャッシュ: 読み込みは入力の 1/10、書き込みは入力の 1.25 倍
+PRICE_CACHE_READ_PER_1K  = float(os.environ.get("PRICE_CACHE_READ_PER_1K",  "0.0003"))
+PRICE_CACHE_WRITE_PER_1K = float(os.environ.get("PRICE_CACHE_WRITE_PER_1K", "0.00375"))
+
+# 前週比の悪化判定: p95 が 20% 以上かつ 1秒以上悪化したステージを警告する
+REGRESSION_RATIO  = 0.2
+REGRESSION_MIN_MS = 1000
+
+# 週次ベストオブ: 全体・カテゴリごとの掲載件数の上限
+BEST_OF_LIMIT        = 15
+BEST_OF_PER_CATEGORY = 5
+
 
 # ─────────────────────────────────────────────────────────
 # 1. CloudWatch Metrics（Lambda の標準メトリクス）
@@ -113,14 +153,25 @@ def _run_logs_query(log_group: str, query: str, start: datetime, end: datetime)
 
 
 def collect_article_stats(start: datetime, end: datetime) -> dict:
-    """ハンドラー Lambda のログから記事数とモード別実行数を集計する。"""
+    """
+    記事数とモード別実行数を集計する。記事数は朝・昼の digest（DIGEST_MODES）だけを対象にする。
+    ロールアップストアが設定されていれば日次レコードをマージし（O(日数)）、
+    未設定の場合はハンドラー Lambda のログを Logs Insights で集計する。
+    """
+    if rollup_store is not None:
+        records = load_period(rollup_store, start, end)
+        logger.info("ロールアップから集計: %d レコード", len(records))
+        return merge_rollups(records)
+
     log_group = f"/aws/lambda/{HANDLER_FUNCTION_NAME}"
 
-    # handler.py の logger.info("取得記事数: %d 件", ...) を集計
-    article_query = """
+    # handler.py の logger.info("取得記事数: %d 件 mode=%s", ...) を digest のモードだけ集計
+    # （mode のない行は mode を出力する前の handler のもの。alert を区別できないため含める）
+    article_query = f"""
 fields @message
 | filter @message like /取得記事数/
-| parse @message /取得記事数: (?<count>\\d+) 件/
+| parse @message /取得記事数: (?<count>\\d+) 件( mode=(?<mode>\\S+))?/
+| filter isblank(mode) or mode in {json.dumps(list(DIGEST_MODES))}
 | stats
     sum(count) as total_articles,
     avg(count) as avg_articles,
@@ -204,35 +255,190 @@ fields score, evaluatorName
 
 
 # ─────────────────────────────────────────────────────────
-# 4. Bedrock InvokeModel で Slack 用レポートを生成
+# 3b. ステージ別レイテンシ・トークン使用量（日次ロールアップ設定時のみ）
 # ─────────────────────────────────────────────────────────
 
-def format_with_llm(raw_data: dict, period_label: str) -> str:
-    """収集したデータを Claude に渡して Slack mrkdwn 形式のレポートを生成する。"""
+def _find_regressions(current: dict, previous: dict) -> list[dict]:
+    """前週と比べて p95 が悪化したステージを抽出する。"""
+    regressions = []
+    for stage, cur in current.items():
+        prev = previous.get(stage)
+        if not prev or not prev["count"]:
+            continue
+        delta = cur["p95"] - prev["p95"]
+        if delta >= REGRESSION_MIN_MS and cur["p95"] > prev["p95"] * (1 + REGRESSION_RATIO):
+            regressions.append({
+                "stage":    stage,
+                "p95":      cur["p95"],
+                "prev_p95": prev["p95"],
+                "delta_ms": delta,
+            })
+    return regressions
+
+
+def collect_performance(start: datetime, end: datetime) -> dict:
+    """
+    今週と前週の日次ロールアップからステージ別パーセンタイルとトークン使用量を集計する。
+    ロールアップ未設定の場合は空の dict を返す。
+    """
+    if rollup_store is None:
+        return {}
+
+    span = end - start
+    current  = load_period(rollup_store, start, end)
+    previous = load_period(rollup_store, start - span, start)
+
+    stages      = summarize_stages(current)
+    prev_stages = summarize_stages(previous)
+
+    usage = summarize_usage(current)
+    for m in usage.values():
+        m["cost_usd"] = round(
+            m["input_tokens"] / 1000 * PRICE_INPUT_PER_1K
+            + m["output_tokens"] / 1000 * PRICE_OUTPUT_PER_1K
+            + m["cache_read_input_tokens"] / 1000 * PRICE_CACHE_READ_PER_1K
+            + m["cache_write_input_tokens"] / 1000 * PRICE_CACHE_WRITE_PER_1K,
+            2,
+        )
+
+    return {
+        "stages":      stages,
+        "regressions": _find_regressions(stages, prev_stages),
+        "usage":       usage,
+    }
+
+
+# ─────────────────────────────────────────────────────────
+# 3c. フィード健全性（日次ロールアップ設定時のみ）
+# ─────────────────────────────────────────────────────────
+
+def collect_feed_health(start: datetime, end: datetime) -> dict[str, dict]:
+    """
+    期間内のフィードごとの取得結果を集計する。最終成功からの経過時間（時間）を付ける。
+    ロールアップ未設定の場合は空の dict を返す。
+    """
+    if rollup_store is None:
+        return {}
+    feeds = summarize_feed_health(load_feed_health(rollup_store, start, end))
+    for f in feeds.values():
+        f["hours_since_success"] = (
+            round((end - datetime.fromisoformat(f["last_success"])).total_seconds() / 3600, 1)
+            if f["last_success"] else None
+        )
+    return feeds
+
+
+# ─────────────────────────────────────────────────────────
+# 4. ナラティブ欄（任意）— Bedrock InvokeModel で所感を生成
+# ─────────────────────────────────────────────────────────
+
+_bedrock = None
+
+
+def _bedrock_client():
+    """ナラティブ無効時はクライアント生成コストも払わないよう遅延生成する。"""
+    global _bedrock
+    if _bedrock is None:
+        _bedrock = boto3.client("bedrock-runtime")
+    return _bedrock
+
+
+def generate_narrative(raw_data: dict, period_label: str) -> str:
+    """
+    収集したデータを Claude に渡し、数値の読み解き（所感）を数文で生成する。
+    表・しきい値判定・単位変換は report_renderer が行うため、ここでは文章のみを求める。
+    """
     prompt = f"""以下はAWS Digest Agentの運用データです（{period_label}）。
-このデータをSlackのmrkdwn形式で週次レポートとして整形してください。
+数値表はすでに別途掲載済みです。運用担当者向けに、今週の傾向と注意点を日本語で3文以内にまとめてください。
 
 {json.dumps(raw_data, ensure_ascii=False, indent=2)}
 
 出力ルール:
-- Slack mrkdwn 形式のテキストのみ出力する（前置き・後書き不要）
-- ヘッダーに *太字* を使い、セクションを区切る
-- 絵文字で視認性を上げる
-- lambda_metrics.invocations < lambda_metrics.expected の場合 ⚠️ で実行漏れを警告する
-- lambda_metrics.errors > 0 の場合 🔴 で警告し調査を促す
-- duration は ms から秒に変換して表示する（例: 47,230ms → 47.2秒）
-- eval_scores がある場合: avg_score >= 0.8 → ✅ 良好、0.6〜0.8 → ⚠️ 要注視、< 0.6 → 🔴 要改善
-- eval_scores が空の場合: 「評価スコア: 未設定（Online Evaluation 設定後に反映されます）」と記載する
+- Slack mrkdwn 形式のテキストのみ出力する（前置き・後書き・見出し不要）
+- 数値を書き写したり再計算したりしない
 """.strip()
 
-    response = bedrock.invoke_model(
+    response = _bedrock_client().invoke_model(
         modelId=REPORT_MODEL_ID,
         contentType="application/json",
         accept="application/json",
         body=json.dumps({
             "anthropic_version": "bedrock-2023-05-31",
             "messages": [{"role": "user", "content": prompt}],
-            "max_tokens": 1200,
+            "max_tokens": 400,
+        }),
+    )
+    return json.loads(response["body"].read())["content"][0]["text"]
+
+
+# ─────────────────────────────────────────────────────────
+# 5. 週次ベストオブ（配信済み記事のアーカイブから組み立てる）
+# ─────────────────────────────────────────────────────────
+
+def collect_best_of(start: datetime, end: datetime) -> dict:
+    """
+    期間内に配信した HIGH の記事をランキングし、カテゴリ別に返す。
+    同じリンクが複数回配信されていれば最新の翻訳を使う（backfill の記事は対象外）。
+    カテゴリはフィードの優先度の高い順、カテゴリ内はランキング順。
+    """
+    store = get_archive_store()
+    if store is None:
+        logger.warning("ARCHIVE_BUCKET / ARCHIVE_DIR が未設定のため週次ベストオブを作れません")
+        return {"records": 0, "candidates": 0, "groups": []}
+
+    days = days_between(start, end)
+    records = [r for r in load_archive_period(store, days[0], days[-1]) if r.get("mode") != "backfill"]
+    latest = {r["link"]: r for r in records}   # 時系列順なので後勝ち
+    candidates = [
+        {**r, "title": r["title_ja"], "summary": r["summary_ja"], "published": r["archived_at"]}
+        for r in latest.values() if r.get("importance") == "HIGH"
+    ]
+
+    # numpy（relevance）とフィードレジストリの読み込みは週次ベストオブでしか使わないため遅延インポート
+    import relevance
+    from feed_registry import get_registry
+
+    registry = get_registry()
+    ranked = relevance.rank_articles(candidates, len(candidates), registry.priority_weights, registry.interests)
+    groups: dict[str, list[dict]] = {}
+    selected = 0
+    for a in ranked:
+        items = groups.setdefault(a["category"], [])
+        if selected < BEST_OF_LIMIT and len(items) < BEST_OF_PER_CATEGORY:
+            items.append({k: a[k] for k in ("title_ja", "summary_ja", "link", "date")})
+            selected += 1
+    order = sorted(groups, key=lambda c: -registry.priority_weights.get(c, 0))   # 同じ優先度はランキング順
+    return {
+        "records":    len(records),
+        "candidates": len(candidates),
+        "groups":     [{"category": c, "articles": groups[c]} for c in order if groups[c]],
+    }
+
+
+def generate_best_of_summary(best_of: dict, period_label: str) -> str:
+    """選んだ記事のカテゴリとタイトルだけを渡し、今週の総評を1回の呼び出しで生成する。"""
+    compact = [
+        {"category": g["category"], "titles": [a["title_ja"] for a in g["articles"]]}
+        for g in best_of["groups"]
+    ]
+    prompt = f"""以下は今週（{period_label}）AWS Digest で配信した重要度 HIGH の記事のカテゴリとタイトルです。
+チーム向けに、今週の AWS の動向を日本語で2〜3文にまとめてください。
+
+{json.dumps(compact, ensure_ascii=False)}
+
+出力ルール:
+- Slack mrkdwn 形式のテキストのみ出力する（前置き・後書き・見出し不要）
+- 記事のタイトルを列挙しない
+""".strip()
+
+    response = _bedrock_client().invoke_model(
+        modelId=REPORT_MODEL_ID,
+        contentType="application/json",
+        accept="application/json",
+        body=json.dumps({
+            "anthropic_version": "bedrock-2023-05-31",
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": 300,
         }),
     )
     return json.loads(response["body"].read())["content"][0]["text"]
@@ -242,7 +448,50 @@ def format_with_llm(raw_data: dict, period_label: str) -> str:
 # Lambda エントリーポイント
 # ─────────────────────────────────────────────────────────
 
+def _post(text: str) -> None:
+    try:
+        slack_client.chat_postMessage(
+            channel=SLACK_CHANNEL_ID,
+            text=text,
+            mrkdwn=True,
+        )
+        logger.info("Slack 投稿完了")
+    except SlackApiError as e:
+        logger.error("Slack 投稿失敗: %s", e.response["error"])
+        raise
+
+
+def best_of_handler(event: dict, start_utc: datetime, end_utc: datetime, period_label: str) -> dict:
+    """週次ベストオブを組み立てて投稿する。"""
+    started = time.perf_counter()
+    logger.info("週次ベストオブ開始: %s", period_label)
+    best_of = collect_best_of(start_utc, end_utc)
+    logger.info("ベストオブ集計: レコード %d件 / HIGH %d件 / 掲載 %d件",
+                best_of["records"], best_of["candidates"], sum(len(g["articles"]) for g in best_of["groups"]))
+
+    summary = ""
+    if best_of["groups"] and event.get("narrative", REPORT_NARRATIVE):
+        try:
+            summary = generate_best_of_summary(best_of, period_label)
+            logger.info("総評生成完了")
+        except Exception as e:
+            # 総評は付加情報のため、失敗しても記事一覧は投稿する
+            logger.warning("総評生成失敗: %s", e)
+
+    _post(render_best_of(best_of, period_label, summary))
+    logger.info("週次ベストオブ完了: %.1f秒", time.perf_counter() - started)
+    return {"statusCode": 200, "period": period_label, "mode": "best_of"}
+
+
 def handler(event, context):
+    """
+    Lambda エントリーポイント。
+
+    event:
+      mode:      "best_of" で週次ベストオブを投稿する（省略時は運用レポート）
+      narrative: true で所感欄（ベストオブでは総評）を LLM で生成する（デフォルト: REPORT_NARRATIVE 環境変数）
+    """
+    event = event or {}
     jst       = timezone(timedelta(hours=9))
     now_jst   = datetime.now(jst)
     end_utc   = datetime.now(timezone.utc)
@@ -252,6 +501,8 @@ def handler(event, context):
         f"{(now_jst - timedelta(days=REPORT_DAYS)).strftime('%m/%d')}〜"
         f"{now_jst.strftime('%m/%d')}"
     )
+    if event.get("mode") == "best_of":
+        return best_of_handler(event, start_utc, end_utc, period_label)
     logger.info("週次レポート開始: %s", period_label)
 
     raw_data = {
@@ -259,21 +510,19 @@ def handler(event, context):
         "lambda_metrics": collect_lambda_metrics(start_utc, end_utc),
         "article_stats":  collect_article_stats(start_utc, end_utc),
         "eval_scores":    collect_eval_scores(start_utc, end_utc),
+        "performance":    collect_performance(start_utc, end_utc),
+        "feed_health":    collect_feed_health(start_utc, end_utc),
     }
     logger.info("データ収集完了: %s", json.dumps(raw_data, ensure_ascii=False))
 
-    slack_text = format_with_llm(raw_data, period_label)
-    logger.info("LLMフォーマット完了")
-
-    try:
-        slack_client.chat_postMessage(
-            channel=SLACK_CHANNEL_ID,
-            text=slack_text,
-            mrkdwn=True,
-        )
-        logger.info("Slack 投稿完了")
-    except SlackApiError as e:
-        logger.error("Slack 投稿失敗: %s", e.response["error"])
-        raise
+    narrative = ""
+    if event.get("narrative", REPORT_NARRATIVE):
+        try:
+            narrative = generate_narrative(raw_data, period_label)
+            logger.info("ナラティブ生成完了")
+        except Exception as e:
+            # 所感は付加情報のため、失敗してもレポート本体は投稿する
+            logger.warning("ナラティブ生成失敗: %s", e)
 
+    _post(render_weekly_report(raw_data, period_label, narrative))
     return {"statusCode": 200, "period": period_label}
@@ -0,0 +1,156 @@
+"""
+記事モデルとワイヤーコーデック（agent / handler / fanout で共通）
+
+Article はモデルが翻訳・要約した1記事（Slack 投稿・アーカイブの単位）。__slots__ のレコードで、
+dict より1件あたりのメモリが小さく、項目名の打ち間違いは属性エラーになる。
+
+検証（Article.from_dict / parse_articles）:
+  link       : 必須。http(s) の URL
+  title_ja   : 必須。空文字は不可
+  importance : 大文字に正規化し、HIGH / MEDIUM / LOW のいずれか
+  その他     : 文字列に変換して前後の空白を除く（欠けていれば空文字）
+モデルの出力は揺れがあるため、parse_articles は不正な要素を警告して捨てる（strict=True なら例外）。
+
+ワイヤー形式（AgentCore の応答などの "articles"）:
+  {"v": 1, "fields": [...], "rows": [[...], ...]}   項目名を1回だけ持つ行形式
+  {"v": 1, "fields": [...], "z": "<base64>"}         rows の JSON が WIRE_COMPRESS_BYTES を超える場合は zlib で圧縮
+  decode_articles は旧形式（記事 dict の配列）も読める（更新途中のエージェント・ファンアウトの集約結果・記録済みカセット）。
+  fields は受け手の FIELDS と順序・過不足が違ってもよい（名前で対応付ける）。
+
+JSON の変換には orjson があれば使う（なければ標準の json）。
+"""
+
+import base64
+import json
+import logging
+import zlib
+from dataclasses import dataclass
+from typing import Any, Iterable
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("category", "title_ja", "summary_ja", "change", "benefit", "importance", "link")
+IMPORTANCE_LEVELS = ("HIGH", "MEDIUM", "LOW")
+
+WIRE_VERSION        = 1
+WIRE_COMPRESS_BYTES = 16_384   # これを超える rows は圧縮する（30件の digest でおよそ 20〜30KB）
+
+try:
+    import orjson
+
+    JSON_BACKEND = "orjson"
+
+    def _dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    _loads = orjson.loads
+except ImportError:  # orjson は任意
+    JSON_BACKEND = "json"
+
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    _loads = json.loads
+
+
+class ArticleValidationError(ValueError):
+    """記事の項目が不正。"""
+
+
+# ─────────────────────────────────────────────────────────
+# モデル
+# ─────────────────────────────────────────────────────────
+
+@dataclass(slots=True)
+class Article:
+    category:   str
+    title_ja:   str
+    summary_ja: str
+    change:     str
+    benefit:    str
+    importance: str
+    link:       str
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Article":
+        """dict を検証・正規化してレコードにする。不正なら ArticleValidationError。"""
+        if not isinstance(data, dict):
+            raise ArticleValidationError(f"記事が object ではありません: {type(data).__name__}")
+        values = {k: _text(data.get(k)) for k in FIELDS}
+        if not values["link"].startswith(("https://", "http://")):
+            raise ArticleValidationError(f"link が不正です: {values['link'][:100]!r}")
+        if not values["title_ja"]:
+            raise ArticleValidationError(f"title_ja がありません: {values['link']}")
+        values["importance"] = values["importance"].upper()
+        if values["importance"] not in IMPORTANCE_LEVELS:
+            raise ArticleValidationError(f"importance が不正です: {data.get('importance')!r} ({values['link']})")
+        return cls(**values)
+
+    def to_dict(self) -> dict[str, str]:
+        return {k: getattr(self, k) for k in FIELDS}
+
+    def to_row(self) -> list[str]:
+        return [getattr(self, k) for k in FIELDS]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """dict と同じ読み方（記事 dict を受け取っていた呼び出し元向け）。"""
+        return getattr(self, key, default) if key in FIELDS else default
+
+
+def _text(value: Any) -> str:
+    return "" if value is None else str(value).strip()
+
+
+def parse_articles(items: Any, strict: bool = False) -> list[Article]:
+    """モデル出力などの記事 dict の配列を検証する。strict でなければ不正な要素は警告して捨てる。"""
+    if not isinstance(items, list):
+        if strict:
+            raise ArticleValidationError(f"記事の配列ではありません: {type(items).__name__}")
+        logger.warning("記事の配列ではないため破棄します: %s", type(items).__name__)
+        return []
+    articles, dropped = [], 0
+    for item in items:
+        try:
+            articles.append(Article.from_dict(item))
+        except ArticleValidationError as e:
+            if strict:
+                raise
+            dropped += 1
+            logger.warning("不正な記事を破棄: %s", e)
+    if dropped:
+        logger.warning("記事の検証: %d件中 %d件を破棄しました", len(items), dropped)
+    return articles
+
+
+# ─────────────────────────────────────────────────────────
+# ワイヤーコーデック
+# ─────────────────────────────────────────────────────────
+
+def encode_articles(articles: Iterable[Article | dict], compress_bytes: int = WIRE_COMPRESS_BYTES) -> dict:
+    """記事（レコードまたは検証済みの dict）をワイヤー形式にする。"""
+    rows = [a.to_row() if isinstance(a, Article) else [a.get(k, "") for k in FIELDS] for a in articles]
+    envelope: dict[str, Any] = {"v": WIRE_VERSION, "fields": list(FIELDS)}
+    raw = _dumps(rows)
+    if len(raw) > compress_bytes:
+        envelope["z"] = base64.b64encode(zlib.compress(raw, 6)).decode("ascii")
+    else:
+        envelope["rows"] = rows
+    return envelope
+
+
+def decode_articles(data: Any) -> list[Article]:
+    """ワイヤー形式（または旧形式の記事 dict の配列）をレコードのリストにする。"""
+    if data is None:
+        return []
+    if isinstance(data, list):
+        return parse_articles(data)
+    if not isinstance(data, dict) or data.get("v") != WIRE_VERSION:
+        raise ValueError(f"未対応の記事ワイヤー形式です: v={data.get('v') if isinstance(data, dict) else data!r}")
+
+    rows = _loads(zlib.decompress(base64.b64decode(data["z"]))) if "z" in data else data.get("rows", [])
+    fields = data.get("fields", list(FIELDS))
+    if tuple(fields) == FIELDS:
+        return [Article(*row) for row in rows]
+    # 送り手と項目が違う場合は名前で対応付け、受け手にない項目は捨て、足りない項目は空文字にする
+    index = [fields.index(k) if k in fields else None for k in FIELDS]
+    return [Article(*("" if i is None else row[i] for i in index)) for row in rows]
@@ -0,0 +1,136 @@
+"""
+RSS 取得パイプライン（fetch → parse → dedup → select）
+
+agent.py の fetch_recent_articles ツールと、ファンアウト構成の取得ワーカー（lambda/fanout.py）から呼ばれる。
+各ステージを分けておくことで、実行ごとのステージ別所要時間を計測できるようにしている。
+"""
+
+import logging
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+from typing import Any
+
+import feedparser
+
+from feed_registry import get_registry
+from relevance import rank_articles
+
+logger = logging.getLogger(__name__)
+
+FEED_TIMEOUT = 15  # 秒。応答しないフィードで実行全体が止まらないようにする
+USER_AGENT   = "aws-digest-agent/1.0"
+DATE_FIELDS  = ("published_parsed", "updated_parsed")
+
+
+def parse_entry_datetime(entry: Any, date_fields: tuple[str, ...] | list[str] = DATE_FIELDS) -> datetime | None:
+    """エントリの公開日時を取得する。date_fields の順（既定: published_parsed → updated_parsed）に試みる。"""
+    for attr in date_fields:
+        parsed = getattr(entry, attr, None) or entry.get(attr)
+        if parsed:
+            try:
+                return datetime(*parsed[:6], tzinfo=timezone.utc)
+            except (ValueError, TypeError):
+                continue
+    return None
+
+
+def fetch_feed(url: str, timeout: float = FEED_TIMEOUT) -> bytes:
+    """フィード本体を HTTP で取得する（パースはしない）。"""
+    req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return resp.read()
+
+
+def fetch_feed_conditional(url: str, etag: str | None = None, last_modified: str | None = None,
+                           timeout: float = FEED_TIMEOUT) -> tuple[bytes | None, dict[str, str | None]]:
+    """
+    ETag / Last-Modified を使った条件付き GET。
+    (本体, {"etag", "last_modified"}) を返す。304 Not Modified の場合は本体が None。
+    """
+    headers = {"User-Agent": USER_AGENT}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    req = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            validators = {"etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified")}
+            return resp.read(), validators
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return None, {"etag": etag, "last_modified": last_modified}
+        raise
+
+
+def parse_entries(body: bytes) -> list:
+    """フィード本体（RSS / Atom）をパースしてエントリ一覧を返す。"""
+    return feedparser.parse(body).entries
+
+
+def filter_recent(category: str, entries: list, cutoff: datetime, policy: dict | None = None) -> list[dict]:
+    """
+    cutoff より新しいエントリだけを記事 dict に変換する。
+    policy（フィードレジストリのポリシー）があればパーサーのヒントと言語を反映する。
+    """
+    parser = (policy or {}).get("parser") or {}
+    date_fields = parser.get("date_fields") or DATE_FIELDS
+    summary_max = parser.get("summary_max_chars")
+    language = (policy or {}).get("language", "en")
+
+    articles = []
+    for entry in entries:
+        pub_dt = parse_entry_datetime(entry, date_fields)
+        if pub_dt is None or pub_dt <= cutoff:
+            continue
+        summary = entry.get("summary", entry.get("description", ""))
+        article = {
+            "category": category,
+            "title": entry.get("title", ""),
+            "summary": summary[:summary_max] if summary_max else summary,
+            "link": entry.get("link", ""),
+            "published": pub_dt.isoformat(),
+        }
+        if language != "en":
+            article["language"] = language
+        articles.append(article)
+    return articles
+
+
+def parse_feed(category: str, body: bytes, cutoff: datetime, policy: dict | None = None) -> list[dict]:
+    """フィード本体をパースし、cutoff より新しいエントリを記事 dict に変換する。"""
+    return filter_recent(category, parse_entries(body), cutoff, policy)
+
+
+def cap_articles(articles: list[dict], policy: dict | None) -> list[dict]:
+    """フィード単位の件数上限（max_items）を適用する。"""
+    cap = (policy or {}).get("max_items")
+    return articles[:cap] if cap else articles
+
+
+def dedup_articles(articles: list[dict]) -> list[dict]:
+    """同じリンクの記事（複数フィードに掲載されたもの）を先勝ちで1件にまとめる。"""
+    seen: set[str] = set()
+    unique = []
+    for a in articles:
+        key = a.get("link") or a.get("title", "")
+        if key in seen:
+            continue
+        seen.add(key)
+        unique.append(a)
+    return unique
+
+
+def select_articles(articles: list[dict], limit: int, weights: dict[str, float] | None = None,
+                    interests: dict | None = None) -> list[dict]:
+    """
+    上限を超えた場合、関心プロファイルとの類似度・カテゴリの優先度・新しさの合成スコアで上位 limit 件を残す
+    （relevance.py を参照）。weights / interests の既定はフィードレジストリの priority / interests。
+    """
+    if len(articles) <= limit:
+        return articles
+    registry = get_registry()
+    weights = weights if weights is not None else registry.priority_weights
+    interests = interests if interests is not None else registry.interests
+    return rank_articles(articles, limit, weights, interests)
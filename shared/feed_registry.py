@@ -0,0 +1,156 @@
+"""
+フィードレジストリ
+
+フィードごとのポリシー（対象モード・優先度・件数上限・タイムアウト・言語・パーサーのヒント）を持つ一覧。
+環境変数 FEED_REGISTRY にローカルパスか s3://bucket/key を指定すると実行時に読み込み、
+未指定（または読み込み失敗）の場合は rss_feeds.py の一覧から既定のレジストリを組み立てる。
+フィードの追加・変更にイメージの再ビルドは不要。
+
+読み込みはプロセスごとに1回（get_registry() の lru_cache）で、モード別・名前別の参照表にコンパイルする。
+
+JSON 形式:
+  {
+    "version": 1,
+    "defaults": {"timeout": 15, "language": "en"},
+    "feeds": [
+      {"name": "What's New", "url": "https://...", "modes": ["morning", "alert"], "priority": 4,
+       "max_items": 30, "timeout": 10, "language": "en",
+       "parser": {"date_fields": ["published_parsed", "updated_parsed"], "summary_max_chars": 2000}}
+    ],
+    "interests": {"services": ["Lambda", "Aurora DSQL"], "keywords": {"graviton": 2.0}}
+  }
+
+interests は記事数が上限を超えたときのランキングに使う関心プロファイル（relevance.py を参照。省略可）。
+
+Usage（既定のレジストリを JSON で書き出す）:
+  python feed_registry.py > feeds.json
+"""
+
+import json
+import logging
+import os
+import sys
+from functools import lru_cache
+
+from rss_feeds import ALERT_FEEDS, MORNING_FEEDS, NOON_FEEDS
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_VERSION = 1
+
+DEFAULT_POLICY = {
+    "modes":     [],
+    "priority":  0,      # 大きいほど優先（記事数が上限を超えたときに残す順）
+    "max_items": None,   # フィード単位の件数上限（None は上限なし）
+    "timeout":   15,     # 秒
+    "language":  "en",
+    "parser":    {},     # date_fields: 公開日時として見る属性の順, summary_max_chars: 概要の最大文字数
+}
+
+# 既定レジストリの優先度（旧 PRIORITY_CATEGORIES の順）
+_DEFAULT_PRIORITY = {"What's New": 4, "Security": 3, "AWS News": 2, "Machine Learning": 1}
+_DEFAULT_LANGUAGE = {"AWS Japan": "ja"}
+
+
+class FeedRegistry:
+    """フィード一覧をモード別・名前別の参照表にコンパイルしたもの。"""
+
+    def __init__(self, feeds: list[dict], defaults: dict | None = None, interests: dict | None = None):
+        base = {**DEFAULT_POLICY, **(defaults or {})}
+        compiled = []
+        for i, raw in enumerate(feeds):
+            if not raw.get("name") or not raw.get("url"):
+                raise ValueError(f"feeds[{i}]: name と url は必須です")
+            feed = {**base, **raw}
+            if not isinstance(feed["modes"], list) or not feed["modes"]:
+                raise ValueError(f"feeds[{i}] ({feed['name']}): modes を1つ以上指定してください")
+            compiled.append(feed)
+
+        self.feeds: tuple[dict, ...] = tuple(compiled)
+        self._by_name = {f["name"]: f for f in compiled}
+        if len(self._by_name) != len(compiled):
+            raise ValueError("name が重複しています")
+        self._by_mode: dict[str, dict[str, str]] = {}
+        for f in compiled:
+            for mode in f["modes"]:
+                self._by_mode.setdefault(mode, {})[f["name"]] = f["url"]
+        self.priority_weights: dict[str, float] = {f["name"]: f["priority"] for f in compiled}
+        self.interests: dict = interests or {}
+        self._default = base
+
+    @property
+    def modes(self) -> list[str]:
+        return list(self._by_mode)
+
+    def feeds_for(self, mode: str) -> dict[str, str]:
+        """モードの対象フィード {名前: URL}（定義順）。"""
+        return self._by_mode.get(mode, {})
+
+    def all_feeds(self) -> dict[str, str]:
+        return {f["name"]: f["url"] for f in self.feeds}
+
+    def policy(self, name: str) -> dict:
+        """フィードのポリシー。未登録の名前には既定値を返す。"""
+        return self._by_name.get(name, self._default)
+
+
+def default_feeds() -> list[dict]:
+    """rss_feeds.py の一覧から既定のレジストリ項目を組み立てる。"""
+    feeds: dict[str, dict] = {}
+    for mode, table in (("morning", MORNING_FEEDS), ("noon", NOON_FEEDS), ("alert", ALERT_FEEDS)):
+        for name, url in table.items():
+            feed = feeds.setdefault(name, {
+                "name":     name,
+                "url":      url,
+                "modes":    [],
+                "priority": _DEFAULT_PRIORITY.get(name, 0),
+                "language": _DEFAULT_LANGUAGE.get(name, "en"),
+            })
+            feed["modes"].append(mode)
+    return list(feeds.values())
+
+
+def _read(source: str) -> dict:
+    if source.startswith("s3://"):
+        import boto3  # S3 を使う場合のみ必要
+
+        s3 = boto3.client("s3")
+        bucket, _, key = source[len("s3://"):].partition("/")
+        try:
+            obj = s3.get_object(Bucket=bucket, Key=key)
+        except s3.exceptions.NoSuchKey:
+            raise FileNotFoundError(source) from None
+        return json.loads(obj["Body"].read())
+    with open(source, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_registry(source: str | None) -> FeedRegistry:
+    """source（パス / s3:// URI）からレジストリを読み込む。失敗時は既定のレジストリを使う。"""
+    if source:
+        try:
+            data = _read(source)
+            if data.get("version") != REGISTRY_VERSION:
+                raise ValueError(f"unsupported registry version: {data.get('version')}")
+            registry = FeedRegistry(data["feeds"], data.get("defaults"), data.get("interests"))
+            logger.info("フィードレジストリ読み込み: %s (%d件)", source, len(registry.feeds))
+            return registry
+        except FileNotFoundError:
+            logger.info("フィードレジストリ未配置 [%s] — 既定の一覧を使います", source)
+        except Exception as e:
+            logger.error("フィードレジストリ読み込み失敗 [%s]: %s — 既定の一覧を使います", source, e)
+    return FeedRegistry(default_feeds())
+
+
+@lru_cache(maxsize=1)
+def get_registry() -> FeedRegistry:
+    return load_registry(os.environ.get("FEED_REGISTRY", ""))
+
+
+if __name__ == "__main__":
+    json.dump(
+        {"version": REGISTRY_VERSION, "defaults": {}, "feeds": default_feeds(),
+         "interests": {"services": [], "keywords": {}}},
+        sys.stdout, ensure_ascii=False, indent=2,
+    )
+    print()
@@ -0,0 +1,168 @@
+"""
+AWS Daily Digest — オプトインのプロファイリング
+
+agent.invoke() / handler.handler() の1回分を cProfile と tracemalloc で計測し、
+主要区間（フィード取得ツール・エージェント呼び出し・Slack 投稿など）の wall-clock スパンを記録する。
+
+有効化:
+  payload / event の "profile": true、または環境変数 DIGEST_PROFILE=true
+無効時は NULL_PROFILER（何もしないスパンを返すだけ）が使われ、計測コストはかからない。
+
+出力先（run_id ごと）:
+  PROFILE_BUCKET 設定時 : s3://{PROFILE_BUCKET}/profiles/{name}/{run_id}/
+  それ以外              : {PROFILE_DIR}/{name}/{run_id}/（デフォルト /tmp/profiles）
+  - profile.pstats : `python -m pstats` や snakeviz で開ける cProfile 結果
+  - summary.json   : スパン・メモリピーク・上位関数・上位メモリ確保箇所
+
+このファイルは shared/ が正本で、agent/ と lambda/ にはシンボリックリンクで配置している。
+"""
+
+import contextlib
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import time
+import tracemalloc
+import uuid
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ENV    = "DIGEST_PROFILE"
+TOP_FUNCTIONS  = 30
+TOP_ALLOCATION = 20
+
+
+def profiling_enabled(payload: dict | None) -> bool:
+    """payload の "profile" フラグ、または環境変数で有効化されているか。"""
+    if payload and payload.get("profile"):
+        return True
+    return os.environ.get(PROFILE_ENV, "false").lower() == "true"
+
+
+class _NullProfiler:
+    """無効時に使うプロファイラ。スパンは共有の nullcontext を返すだけ。"""
+
+    enabled = False
+    run_id  = ""
+
+    _null = contextlib.nullcontext()
+
+    def span(self, name: str):
+        return self._null
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_PROFILER = _NullProfiler()
+
+
+class Profiler:
+    """
+    with Profiler("agent", run_id) as prof:
+        with prof.span("fetch_tool"):
+            ...
+    のように使う。with ブロックを抜けた時点で結果を書き出す。
+    """
+
+    enabled = True
+
+    def __init__(self, name: str, run_id: str | None = None):
+        self.name   = name
+        self.run_id = run_id or uuid.uuid4().hex
+        self.spans: list[dict] = []
+        self._profile = cProfile.Profile()
+        self._t0 = 0.0
+
+    @contextlib.contextmanager
+    def span(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.spans.append({
+                "name":     name,
+                "start_ms": round((start - self._t0) * 1000, 1),
+                "wall_ms":  round((end - start) * 1000, 1),
+            })
+
+    def __enter__(self):
+        tracemalloc.start()
+        self._t0 = time.perf_counter()
+        self._profile.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self._profile.disable()
+        wall_ms = (time.perf_counter() - self._t0) * 1000
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        try:
+            self._write(self._summary(wall_ms, current, peak, snapshot))
+        except Exception as e:
+            # プロファイル出力の失敗で本処理を失敗させない
+            logger.warning("プロファイル出力失敗 [%s/%s]: %s", self.name, self.run_id, e)
+        return False
+
+    def _summary(self, wall_ms: float, current: int, peak: int, snapshot: Any) -> dict:
+        stats_buf = io.StringIO()
+        pstats.Stats(self._profile, stream=stats_buf).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        return {
+            "name":    self.name,
+            "run_id":  self.run_id,
+            "wall_ms": round(wall_ms, 1),
+            "spans":   self.spans,
+            "memory": {
+                "current_bytes": current,
+                "peak_bytes":    peak,
+                "top_allocations": [
+                    {"location": str(s.traceback), "size_bytes": s.size, "count": s.count}
+                    for s in snapshot.statistics("lineno")[:TOP_ALLOCATION]
+                ],
+            },
+            "top_functions": stats_buf.getvalue(),
+        }
+
+    def _write(self, summary: dict) -> None:
+        stats = pstats.Stats(self._profile)
+        summary_bytes = json.dumps(summary, ensure_ascii=False, indent=2).encode("utf-8")
+        bucket = os.environ.get("PROFILE_BUCKET", "")
+
+        if bucket:
+            import tempfile
+
+            import boto3
+
+            prefix = f"profiles/{self.name}/{self.run_id}/"
+            s3 = boto3.client("s3")
+            with tempfile.NamedTemporaryFile(suffix=".pstats") as f:
+                stats.dump_stats(f.name)
+                s3.upload_file(f.name, bucket, prefix + "profile.pstats")
+            s3.put_object(Bucket=bucket, Key=prefix + "summary.json", Body=summary_bytes,
+                          ContentType="application/json")
+            logger.info("プロファイル出力: s3://%s/%s", bucket, prefix)
+            return
+
+        out_dir = os.path.join(os.environ.get("PROFILE_DIR", "/tmp/profiles"), self.name, self.run_id)
+        os.makedirs(out_dir, exist_ok=True)
+        stats.dump_stats(os.path.join(out_dir, "profile.pstats"))
+        with open(os.path.join(out_dir, "summary.json"), "wb") as f:
+            f.write(summary_bytes)
+        logger.info("プロファイル出力: %s", out_dir)
+
+
+def get_profiler(payload: dict | None, name: str, run_id: str | None = None):
+    """有効なら Profiler、無効なら NULL_PROFILER を返す。"""
+    if not profiling_enabled(payload):
+        return NULL_PROFILER
+    return Profiler(name, run_id or (payload or {}).get("run_id"))
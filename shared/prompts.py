@@ -0,0 +1,122 @@
+"""
+ダイジェスト生成用のプロンプト
+
+処理ルール・出力形式は AgentCore エージェント（agent.py）とファンアウト構成の翻訳ワーカー
+（lambda/fanout.py）で共通。前置きだけを呼び出し方に合わせて差し替える。
+  SYSTEM_PROMPT       : モデルが fetch_recent_articles ツールで記事を取得する（DIGEST_PIPELINE=tool）
+  BATCH_SYSTEM_PROMPT : 記事の JSON 配列をユーザーメッセージで渡す（digest の既定・alert・バッチ推論・ファンアウト）
+ENRICH_SYSTEM_PROMPT は HIGH 記事を本文から書き直す2段階目（agent/enrichment.py）用。
+
+キャッシュ: システムプロンプト（とツール定義）は毎回同じで、変わるのはメッセージの記事だけ。
+  system_blocks / anthropic_system はシステムプロンプトの末尾にキャッシュポイントを置き、
+  ツール定義 → システムプロンプトまでの前置きをモデル側で再利用させる（PROMPT_CACHE=false で無効）。
+  前置きには日時など実行ごとに変わる内容を入れないこと。モデルごとの最小トークン数
+  （Claude 3.5 Sonnet は 1,024）に満たない前置きはキャッシュされず、cache_read_input_tokens は 0 のままになる。
+版: PROMPT_VERSION はすべてのプロンプトの内容から決まる。実行メトリクス・バッチ推論の結果・評価結果に記録し、
+  どのプロンプトで作った結果かを対応付ける。
+"""
+
+import hashlib
+import os
+
+PROMPT_CACHE = os.environ.get("PROMPT_CACHE", "true").lower() == "true"
+
+DIGEST_RULES = """
+## 処理ルール
+1. タイトルを自然な日本語に翻訳する（AWS Japan Blog はそのまま使用）
+2. 重要度を以下の基準で判定する
+   - HIGH  : セキュリティ脆弱性・新サービスリリース・大型アップデート
+   - MEDIUM: 既存サービスの機能追加・価格変更・リージョン展開
+   - LOW   : ブログ記事・事例紹介・パートナー情報
+3. 元のカテゴリラベルをそのまま使用する
+4. 各記事について以下の3点を日本語で記述する
+   - summary_ja : 何が発表されたかの概要（1〜2文）
+   - change     : 従来との変更点・今回新しくなった点（1〜2文）。従来の情報がない場合は「新規リリース」と記載
+   - benefit    : このアップデートによってユーザーが得られる具体的なメリット（1〜2文）
+
+## 出力形式
+JSON配列のみを返してください。前置き・後書き・コードブロック記号は不要です。
+
+[
+  {
+    "category": "カテゴリ名",
+    "title_ja": "日本語タイトル",
+    "summary_ja": "何が発表されたかの概要",
+    "change": "従来との変更点・新しくなった点",
+    "benefit": "ユーザーが得られる具体的なメリット",
+    "importance": "HIGH | MEDIUM | LOW",
+    "link": "https://..."
+  }
+]
+
+記事が0件の場合は空配列 [] を返してください。
+""".strip()
+
+SYSTEM_PROMPT = f"""
+あなたはAWSの最新情報を日本語でまとめるアシスタントです。
+
+fetch_recent_articles ツールで記事一覧を取得し、各記事を以下のルールで処理してください。
+
+{DIGEST_RULES}
+""".strip()
+
+BATCH_SYSTEM_PROMPT = f"""
+あなたはAWSの最新情報を日本語でまとめるアシスタントです。
+
+ユーザーメッセージの JSON 配列が記事一覧です。各記事を以下のルールで処理してください。
+
+{DIGEST_RULES}
+""".strip()
+
+ENRICH_SYSTEM_PROMPT = """
+あなたはAWSの最新情報を日本語でまとめるアシスタントです。
+
+ユーザーメッセージの JSON 配列は、重要度 HIGH と判定済みの記事です。
+各記事の body（記事ページの本文）を読み、RSS の概要だけで書いた summary_ja・change・benefit を詳しく書き直してください。
+
+## 処理ルール
+- summary_ja : 何が発表されたかの概要（2〜3文）。対象サービス・提供リージョン・提供形態（GA / プレビュー）がわかれば含める
+- change     : 従来との変更点（2〜3文）。具体的な上限値・対応形式・料金の変化など本文に書かれた事実を優先する
+- benefit    : ユーザーが得られる具体的なメリット（2〜3文）。どのようなワークロード・利用者に効くかを書く
+- 本文に書かれていないことは推測で補わない。本文から読み取れない場合は元の記述を維持する
+
+## 出力形式
+JSON配列のみを返してください。前置き・後書き・コードブロック記号は不要です。
+
+[
+  {
+    "link": "https://...（入力と同じ値）",
+    "summary_ja": "...",
+    "change": "...",
+    "benefit": "..."
+  }
+]
+""".strip()
+
+
+# ─────────────────────────────────────────────────────────
+# 版とキャッシュポイント
+# ─────────────────────────────────────────────────────────
+
+def prompt_version(*prompts: str) -> str:
+    """プロンプトの内容から決まる版（sha256 の先頭8桁）。"""
+    return hashlib.sha256("\0".join(prompts).encode("utf-8")).hexdigest()[:8]
+
+
+PROMPT_VERSION = prompt_version(SYSTEM_PROMPT, BATCH_SYSTEM_PROMPT, ENRICH_SYSTEM_PROMPT)
+
+
+def system_blocks(prompt: str) -> list[dict]:
+    """Converse API（Strands の Agent）のシステムプロンプト。末尾にキャッシュポイントを置く。"""
+    blocks: list[dict] = [{"text": prompt}]
+    if PROMPT_CACHE:
+        blocks.append({"cachePoint": {"type": "default"}})
+    return blocks
+
+
+def anthropic_system(prompt: str) -> list[dict]:
+    """InvokeModel（Anthropic Messages）の system。cache_control で同じ位置にキャッシュポイントを置く。"""
+    block: dict = {"type": "text", "text": prompt}
+    if PROMPT_CACHE:
+        block["cache_control"] = {"type": "ephemeral"}
+    return [block]
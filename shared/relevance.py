@@ -0,0 +1,126 @@
+"""
+関心プロファイルによる記事のランキング（select ステージ）
+
+候補記事のタイトル・概要から TF-IDF ベクトルを作り、チームの関心プロファイル（使っているサービス・キーワード）との
+コサイン類似度を NumPy の一括演算で求める。類似度・カテゴリの優先度・新しさを重み付きで合成し、上位 K 件を残す。
+モデル呼び出しは行わない。
+
+  トークン  : 英数字の語（小文字化。"aurora-dsql" のような連結語も1語）と、日本語の文字 bigram
+              タイトルは TITLE_WEIGHT 回分として数える
+  行列      : 候補 × 語彙の疎行列を (行, 列, 値) の配列で持つ（語彙は候補ごとに数千語になるため密行列にはしない）
+              IDF・行ノルム・プロファイルとの内積は np.bincount による集約1回ずつ
+  合成      : score = W_RELEVANCE × 類似度（候補内の最大値で 0〜1 に正規化）
+                    + W_CATEGORY  × カテゴリの優先度（最大値で正規化）
+                    + W_RECENCY   × 0.5 ^ (最新の候補からの経過時間 / RECENCY_HALF_LIFE_H)
+              新しさは候補の最新の公開日時を基準にする（実行時刻に依存せず、同じ候補なら同じ順位になる）
+
+関心プロファイルはフィードレジストリの "interests" で設定する（feed_registry.py を参照）。
+  {"services": ["Lambda", "Aurora DSQL"], "keywords": {"graviton": 2.0, "料金": 1.0}}
+services の語は重み 1.0、keywords は指定した重み（リストなら 1.0）。未設定なら類似度は 0 で、
+カテゴリの優先度と新しさだけで並べる。
+"""
+
+import math
+import re
+from datetime import datetime
+
+import numpy as np
+
+TITLE_WEIGHT        = 2       # タイトルの語は概要の語の何回分として数えるか
+W_RELEVANCE         = 0.6
+W_CATEGORY          = 0.25
+W_RECENCY           = 0.15
+RECENCY_HALF_LIFE_H = 24.0
+
+_TAG_RE   = re.compile(r"<[^>]+>")
+_WORD_RE  = re.compile(r"[a-z0-9][a-z0-9.+-]*[a-z0-9+]|[a-z0-9]")
+_CJK_RE   = re.compile(r"[\u3040-\u30ff\u3400-\u9fff]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """英数字の語と、日本語の連続部分の文字 bigram（1文字だけならその文字）。"""
+    text = _TAG_RE.sub(" ", text).lower()
+    tokens = _WORD_RE.findall(text)
+    for run in _CJK_RE.findall(text):
+        tokens.extend([run] if len(run) == 1 else [run[i:i + 2] for i in range(len(run) - 1)])
+    return tokens
+
+
+def profile_terms(interests: dict | None) -> dict[str, float]:
+    """関心プロファイルを {語: 重み} に展開する。複数語のサービス名は語ごとに分ける。"""
+    interests = interests or {}
+    keywords = interests.get("keywords") or {}
+    if isinstance(keywords, list):
+        keywords = {k: 1.0 for k in keywords}
+    terms: dict[str, float] = {}
+    for phrase, weight in [*((s, 1.0) for s in interests.get("services") or []), *keywords.items()]:
+        for token in tokenize(phrase):
+            terms[token] = max(terms.get(token, 0.0), float(weight))
+    return terms
+
+
+def relevance_scores(articles: list[dict], terms: dict[str, float]) -> np.ndarray:
+    """各記事の TF-IDF ベクトルとプロファイルのコサイン類似度（0〜1）。"""
+    n = len(articles)
+    if not n or not terms:
+        return np.zeros(n)
+
+    # 全候補のトークンを1本の列にし、語彙の割り当ては dict / map で一括で行う
+    docs = [tokenize(a.get("title", "")) * TITLE_WEIGHT + tokenize(a.get("summary", "")) for a in articles]
+    tokens = [t for doc in docs for t in doc]
+    if not tokens:
+        return np.zeros(n)
+    vocab = {t: i for i, t in enumerate(dict.fromkeys(tokens))}
+    v = len(vocab)
+    rows = np.repeat(np.arange(n, dtype=np.int64), [len(doc) for doc in docs])
+    cols = np.fromiter(map(vocab.__getitem__, tokens), dtype=np.int64, count=len(tokens))
+
+    # (行, 列) ごとの出現回数 → 疎行列の非ゼロ要素
+    keys, tf = np.unique(rows * v + cols, return_counts=True)
+    row, col = keys // v, keys % v
+
+    df = np.bincount(col, minlength=v)
+    idf = np.log((1 + n) / (1 + df)) + 1.0                 # smooth idf（全候補に出る語も 0 にはしない）
+    weight = (1.0 + np.log(tf)) * idf[col]                  # sublinear tf
+    norm = np.sqrt(np.bincount(row, weights=weight ** 2, minlength=n))
+
+    query = np.zeros(v)
+    for token, w in terms.items():
+        if token in vocab:
+            query[vocab[token]] = w * idf[vocab[token]]
+    query_norm = np.linalg.norm(query)
+    if not query_norm:
+        return np.zeros(n)
+
+    dot = np.bincount(row, weights=weight * query[col], minlength=n)
+    return np.divide(dot, norm * query_norm, out=np.zeros(n), where=norm > 0)
+
+
+def rank_articles(articles: list[dict], limit: int, weights: dict[str, float],
+                  interests: dict | None = None) -> list[dict]:
+    """関心度・カテゴリの優先度・新しさの合成スコアで上位 limit 件を返す（スコアの高い順。同点は元の順）。"""
+    n = len(articles)
+    if not n or limit <= 0:
+        return []
+
+    relevance = relevance_scores(articles, profile_terms(interests))
+    if relevance.max() > 0:
+        relevance = relevance / relevance.max()
+
+    category = np.array([weights.get(a["category"], 0) for a in articles], dtype=float)
+    if category.max() > 0:
+        category = category / category.max()
+
+    published = np.array([_timestamp(a.get("published")) for a in articles])
+    age_h = (np.nanmax(published) - published) / 3600 if not np.isnan(published).all() else np.zeros(n)
+    recency = np.nan_to_num(0.5 ** (age_h / RECENCY_HALF_LIFE_H), nan=0.0)
+
+    score = W_RELEVANCE * relevance + W_CATEGORY * category + W_RECENCY * recency
+    return [articles[i] for i in np.argsort(-score, kind="stable")[:limit]]
+
+
+def _timestamp(value: str | None) -> float:
+    try:
+        return datetime.fromisoformat(value).timestamp() if value else math.nan
+    except ValueError:
+        return math.nan
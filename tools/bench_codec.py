@@ -0,0 +1,154 @@
+"""
+記事モデル・ワイヤーコーデック（shared/article_model.py）のベンチマーク（AWS 不要）
+
+合成の翻訳済み記事 N 件（デフォルト 1,000 件）について、従来の記事 dict + JSON 配列と比べて
+  - メモリ : 記事 dict / Article（__slots__）のリストが保持するバイト数（文字列本体は共通のため除く）
+  - 変換   : エンコード / デコード（デコードは旧形式の検証を含む）の所要時間
+  - サイズ : AgentCore の応答などに載るバイト数（UTF-8 の JSON）
+を計測する。orjson がインストールされていれば標準の json との比較も出す。
+
+Usage:
+  python tools/bench_codec.py
+  python tools/bench_codec.py --articles 30 --repeat 50    # 1回の digest 相当
+  python tools/bench_codec.py --output codec.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "agent"))
+
+import article_model  # noqa: E402
+from article_model import FIELDS, Article, decode_articles, encode_articles, parse_articles  # noqa: E402
+
+
+def synthetic_articles(n: int) -> list[dict]:
+    """digest の出力に近い長さの記事 dict（日本語の title / summary / change / benefit）。"""
+    importance = ("HIGH", "MEDIUM", "LOW")
+    return [
+        {
+            "category":   ("What's New", "AWS Blog", "Security Bulletins")[i % 3],
+            "title_ja":   f"Amazon サービス {i} で新しい機能が利用可能になりました（{i % 17} リージョン）",
+            "summary_ja": f"サービス {i} に新機能が追加され、" + "設定画面と API から利用できるようになりました。" * 3,
+            "change":     f"従来は手動で設定が必要でしたが、今回の更新 {i} で自動化されました。" * 2,
+            "benefit":    f"運用の手間が減り、コストを最大 {i % 40 + 10}% 削減できます。" * 2,
+            "importance": importance[i % 3],
+            "link":       f"https://aws.amazon.com/about-aws/whats-new/2026/10/feature-{i:05d}/",
+        }
+        for i in range(n)
+    ]
+
+
+def _median_ms(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t) * 1000)
+    return round(statistics.median(times), 3)
+
+
+def _retained_bytes(build) -> int:
+    """build() が返すオブジェクトを保持したまま、確保されたバイト数を返す。"""
+    tracemalloc.start()
+    obj = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del obj
+    return size
+
+
+def _wire_bytes(payload) -> int:
+    return len(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+
+
+def run(n: int, repeat: int) -> dict:
+    dicts = synthetic_articles(n)
+    records = parse_articles(dicts, strict=True)
+    rows_only = encode_articles(records, compress_bytes=sys.maxsize)
+    compressed = encode_articles(records, compress_bytes=0)
+
+    # 文字列は dicts と共有させ、コンテナ分だけを比べる
+    values = [[d[k] for k in FIELDS] for d in dicts]
+    memory = {
+        "dict":  _retained_bytes(lambda: [dict(zip(FIELDS, v)) for v in values]),
+        "slots": _retained_bytes(lambda: [Article(*v) for v in values]),
+    }
+
+    encode_ms = {
+        "legacy_json":   _median_ms(lambda: json.dumps(dicts, ensure_ascii=False), repeat),
+        "wire_rows":     _median_ms(lambda: json.dumps(encode_articles(records, sys.maxsize), ensure_ascii=False), repeat),
+        "wire_zlib":     _median_ms(lambda: json.dumps(encode_articles(records, 0), ensure_ascii=False), repeat),
+    }
+    legacy_body = json.dumps(dicts, ensure_ascii=False)
+    rows_body = json.dumps(rows_only, ensure_ascii=False)
+    zlib_body = json.dumps(compressed, ensure_ascii=False)
+    decode_ms = {
+        "legacy_json":   _median_ms(lambda: parse_articles(json.loads(legacy_body)), repeat),
+        "wire_rows":     _median_ms(lambda: decode_articles(json.loads(rows_body)), repeat),
+        "wire_zlib":     _median_ms(lambda: decode_articles(json.loads(zlib_body)), repeat),
+    }
+    sizes = {
+        "legacy_json": _wire_bytes(dicts),
+        "wire_rows":   _wire_bytes(rows_only),
+        "wire_zlib":   _wire_bytes(compressed),
+    }
+
+    backends = {"json": _median_ms(lambda: json.dumps(values, ensure_ascii=False, separators=(",", ":")), repeat)}
+    if article_model.JSON_BACKEND == "orjson":
+        import orjson
+        backends["orjson"] = _median_ms(lambda: orjson.dumps(values), repeat)
+
+    return {
+        "articles":        n,
+        "memory_bytes":    memory,
+        "encode_ms":       encode_ms,
+        "decode_ms":       decode_ms,
+        "wire_bytes":      sizes,
+        "rows_dumps_ms":   backends,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=1_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", help="結果 JSON の出力先")
+    args = parser.parse_args()
+
+    result = run(args.articles, args.repeat)
+    result["meta"] = {
+        "created_at":   datetime.now(timezone.utc).isoformat(),
+        "python":       platform.python_version(),
+        "platform":     platform.platform(),
+        "json_backend": article_model.JSON_BACKEND,
+        "repeat":       args.repeat,
+    }
+
+    n = result["articles"]
+    mem = result["memory_bytes"]
+    print(f"記事 {n:,}件（JSON バックエンド: {article_model.JSON_BACKEND}）")
+    print(f"  メモリ   : dict {mem['dict']:,}B / Article {mem['slots']:,}B"
+          f"（{mem['slots'] / mem['dict']:.0%}。1件あたり {mem['dict'] / n:.0f}B → {mem['slots'] / n:.0f}B）")
+    print(f"  {'':12}{'encode ms':>12}{'decode ms':>12}{'bytes':>12}")
+    for name in ("legacy_json", "wire_rows", "wire_zlib"):
+        print(f"  {name:12}{result['encode_ms'][name]:>12.2f}{result['decode_ms'][name]:>12.2f}"
+              f"{result['wire_bytes'][name]:>12,}")
+    print("  rows の JSON 化: " + ", ".join(f"{k} {v:.2f}ms" for k, v in result["rows_dumps_ms"].items()))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"結果を書き出しました: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
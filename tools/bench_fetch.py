@@ -0,0 +1,226 @@
+"""
+fetch_recent_articles パイプラインのオフラインベンチマーク（AWS・外部ネットワーク不要）
+
+記録済み / 合成フィクスチャをローカル HTTP サーバーから配信し、
+shared/feed_pipeline.py の各ステージ（fetch → parse → filter → dedup → select → serialize）を計測する。
+結果は JSON で出力し、--compare で以前の結果と比較できる（悪化があれば終了コード 1）。
+
+Usage:
+  python tools/bench_fetch.py                                   # 全シナリオ
+  python tools/bench_fetch.py --scenarios small,large --repeat 5
+  python tools/bench_fetch.py --latency-ms 80                    # フィードごとに 80ms の遅延を付与
+  python tools/bench_fetch.py --output new.json --compare bench_results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "agent"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import feedparser  # noqa: E402
+
+from feed_fixtures import REFERENCE_TIME, load_recorded, synthetic_feeds  # noqa: E402
+from feed_pipeline import (  # noqa: E402
+    dedup_articles,
+    fetch_feed,
+    filter_recent,
+    parse_entries,
+    select_articles,
+)
+from feed_server import FeedServer  # noqa: E402
+
+FETCH_HOURS  = 25   # agent.py と同じ値
+MAX_ARTICLES = 30   # agent.py と同じ値
+
+# name: (フィード数, 1フィードあたりの件数)。None は記録済みフィクスチャ
+SCENARIOS: dict[str, tuple[int, int] | None] = {
+    "recorded":   None,
+    "small":      (2, 10),
+    "realistic":  (18, 20),
+    "large":      (16, 1_000),
+    "xlarge":     (2, 10_000),
+    "many_feeds": (200, 25),
+}
+
+STAGES = ["fetch", "parse", "filter", "dedup", "select", "serialize", "serialize_all"]
+
+
+def _build(name: str) -> tuple[datetime, dict[str, bytes]]:
+    spec = SCENARIOS[name]
+    if spec is None:
+        return load_recorded()
+    return REFERENCE_TIME, synthetic_feeds(*spec)
+
+
+def _run_once(urls: dict[str, str], cutoff: datetime, limit: int,
+              measure_memory: bool = False) -> tuple[dict, dict, list[float], dict]:
+    """パイプラインを1回実行し (ステージ別 ms, ステージ別ピークメモリ, フィード別取得時間, 件数) を返す。"""
+    stages_ms: dict[str, float] = {}
+    peaks: dict[str, int] = {}
+    fetch_latencies: list[float] = []
+
+    def run(stage, fn):
+        if measure_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        result = fn()
+        stages_ms[stage] = (time.perf_counter() - start) * 1000
+        if measure_memory:
+            peaks[stage] = tracemalloc.get_traced_memory()[1]
+        return result
+
+    def fetch_all():
+        bodies = {}
+        for category, url in urls.items():
+            t = time.perf_counter()
+            bodies[category] = fetch_feed(url)
+            fetch_latencies.append((time.perf_counter() - t) * 1000)
+        return bodies
+
+    bodies   = run("fetch", fetch_all)
+    parsed   = run("parse", lambda: {c: parse_entries(b) for c, b in bodies.items()})
+    recent   = run("filter", lambda: [a for c, e in parsed.items() for a in filter_recent(c, e, cutoff)])
+    unique   = run("dedup", lambda: dedup_articles(recent))
+    selected = run("select", lambda: select_articles(unique, limit))
+    run("serialize", lambda: json.dumps(selected, ensure_ascii=False))
+    run("serialize_all", lambda: json.dumps(unique, ensure_ascii=False))
+
+    counts = {
+        "entries":  sum(len(e) for e in parsed.values()),
+        "recent":   len(recent),
+        "unique":   len(unique),
+        "selected": len(selected),
+        "bytes":    sum(len(b) for b in bodies.values()),
+    }
+    return stages_ms, peaks, fetch_latencies, counts
+
+
+def _pct(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run_scenario(name: str, repeat: int, latency_ms: float, hours: int, limit: int) -> dict:
+    reference, feeds = _build(name)
+    cutoff = reference - timedelta(hours=hours)
+
+    with FeedServer(latency_ms=latency_ms) as server:
+        urls = {category: server.add_feed(category, body) for category, body in feeds.items()}
+
+        _run_once(urls, cutoff, limit)  # ウォームアップ（接続・import のコストを除外）
+        runs, latencies, counts = [], [], {}
+        for _ in range(repeat):
+            stages_ms, _, fetch_lat, counts = _run_once(urls, cutoff, limit)
+            runs.append(stages_ms)
+            latencies.extend(fetch_lat)
+
+        # メモリ計測は tracemalloc のオーバーヘッドが時間計測に混ざらないよう別パスで行う
+        tracemalloc.start()
+        _, peaks, _, _ = _run_once(urls, cutoff, limit, measure_memory=True)
+        tracemalloc.stop()
+
+    stage_stats = {
+        stage: {
+            "median": round(statistics.median(r[stage] for r in runs), 3),
+            "min":    round(min(r[stage] for r in runs), 3),
+            "max":    round(max(r[stage] for r in runs), 3),
+        }
+        for stage in STAGES
+    }
+    pipeline_ms = sum(stage_stats[s]["median"] for s in ("fetch", "parse", "filter", "dedup", "select"))
+
+    return {
+        "feeds":            len(feeds),
+        "counts":           counts,
+        "stages_ms":        stage_stats,
+        "pipeline_ms":      round(pipeline_ms, 3),
+        "throughput_entries_per_s": round(counts["entries"] / (pipeline_ms / 1000), 1) if pipeline_ms else 0,
+        "fetch_latency_ms": {
+            "p50": round(_pct(latencies, 50), 3),
+            "p95": round(_pct(latencies, 95), 3),
+            "max": round(max(latencies), 3),
+        },
+        "peak_memory_bytes": peaks,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """ステージ中央値とピークメモリが threshold 以上悪化した項目を列挙する。"""
+    regressions = []
+    for name, cur in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        for stage, stats in cur["stages_ms"].items():
+            old = base["stages_ms"].get(stage, {}).get("median")
+            # 1ms 未満の揺らぎは無視する
+            if old and stats["median"] - old > 1 and stats["median"] > old * (1 + threshold):
+                regressions.append(f"{name}.{stage}: {old:.1f}ms → {stats['median']:.1f}ms")
+        for stage, peak in cur["peak_memory_bytes"].items():
+            old = base.get("peak_memory_bytes", {}).get(stage)
+            if old and peak > old * (1 + threshold):
+                regressions.append(f"{name}.{stage} peak memory: {old:,}B → {peak:,}B")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="カンマ区切りのシナリオ名")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="フィード1件ごとの擬似ネットワーク遅延")
+    parser.add_argument("--hours", type=int, default=FETCH_HOURS)
+    parser.add_argument("--limit", type=int, default=MAX_ARTICLES)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="比較対象の結果 JSON")
+    parser.add_argument("--threshold", type=float, default=0.2, help="悪化とみなす比率（デフォルト 20%%）")
+    args = parser.parse_args()
+
+    results = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python":     platform.python_version(),
+            "platform":   platform.platform(),
+            "feedparser": feedparser.__version__,
+            "repeat":     args.repeat,
+            "latency_ms": args.latency_ms,
+        },
+        "scenarios": {},
+    }
+
+    for name in args.scenarios.split(","):
+        print(f"▶ {name} ...", flush=True)
+        r = run_scenario(name, args.repeat, args.latency_ms, args.hours, args.limit)
+        results["scenarios"][name] = r
+        print(
+            f"  {r['feeds']} feeds / {r['counts']['entries']:,} entries / {r['counts']['bytes']:,} B"
+            f" → pipeline {r['pipeline_ms']:.1f}ms ({r['throughput_entries_per_s']:,.0f} entries/s),"
+            f" parse {r['stages_ms']['parse']['median']:.1f}ms,"
+            f" peak {max(r['peak_memory_bytes'].values()) / 1e6:.1f}MB"
+        )
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"結果を書き出しました: {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print("⚠ 悪化を検出:")
+            for r in regressions:
+                print(f"  - {r}")
+            return 1
+        print("✅ 悪化なし")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
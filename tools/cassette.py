@@ -0,0 +1,294 @@
+"""
+record/replay 用カセット
+
+外部とのやり取りをチャネル別に記録し、オフラインで同じ順序・同じ遅延で再生する。
+
+チャネル:
+  clock     : agent._now() の戻り値（cutoff を記録時と揃えるため）
+  http      : フィード取得（URL → 本体）
+  model     : Strands のモデル呼び出し（リクエストのハッシュ → ストリームイベント列。structured_output も含む）
+  agentcore : InvokeAgentRuntime（payload → レスポンス本体）
+  slack     : chat.postMessage（送信内容 → レスポンス）
+
+各インタラクションは所要時間 elapsed_ms を持ち、再生時は elapsed_ms × latency_scale だけ待機する
+（latency_scale=0 で最速、1 で記録時と同じ遅延）。
+"""
+
+import base64
+import gzip
+import hashlib
+import io
+import json
+import time
+from datetime import datetime
+from typing import Any, AsyncIterable
+
+from strands.models import Model
+
+CASSETTE_VERSION = 1
+CHANNELS = ("clock", "http", "model", "agentcore", "slack")
+
+
+class CassetteMismatch(Exception):
+    """再生時のリクエストが記録内容と一致しない。"""
+
+
+def request_hash(obj: Any) -> str:
+    return hashlib.sha256(
+        json.dumps(obj, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    ).hexdigest()[:16]
+
+
+class Cassette:
+    def __init__(self, mode: str, data: dict | None = None, latency_scale: float = 1.0,
+                 strict: bool = False):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"unknown cassette mode: {mode}")
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.strict = strict
+        self.data = data or {
+            "version":      CASSETTE_VERSION,
+            "recorded_at":  datetime.now().astimezone().isoformat(),
+            "meta":         {},
+            "interactions": {ch: [] for ch in CHANNELS},
+        }
+        self._cursor = {ch: 0 for ch in CHANNELS}
+        self.mismatches: list[str] = []
+
+    # ── 保存・読み込み ──────────────────────────────
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "Cassette":
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != CASSETTE_VERSION:
+            raise ValueError(f"unsupported cassette version: {data.get('version')}")
+        return cls("replay", data, **kwargs)
+
+    def save(self, path: str) -> None:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "wt", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False)
+
+    # ── 記録・再生の共通処理 ─────────────────────────
+
+    def _append(self, channel: str, entry: dict) -> None:
+        self.data["interactions"][channel].append(entry)
+
+    def _next(self, channel: str, key: str | None = None) -> dict:
+        """channel の次のインタラクションを取り出す。key 指定時は同じ key のものを順に探す。"""
+        entries = self.data["interactions"][channel]
+        if key is None:
+            i = self._cursor[channel]
+            if i >= len(entries):
+                raise CassetteMismatch(f"{channel}: 記録されたインタラクションを使い切りました（{i} 件）")
+            self._cursor[channel] = i + 1
+            return entries[i]
+        for entry in entries:
+            if entry.get("key") == key and not entry.get("_used"):
+                entry["_used"] = True
+                return entry
+        raise CassetteMismatch(f"{channel}: 記録がありません key={key}")
+
+    def _check(self, channel: str, entry: dict, req_hash: str) -> None:
+        if entry.get("request_hash") == req_hash:
+            return
+        msg = f"{channel}: リクエストが記録時と異なります（{entry.get('request_hash')} != {req_hash}）"
+        if self.strict:
+            raise CassetteMismatch(msg)
+        self.mismatches.append(msg)
+
+    def sleep(self, ms: float) -> None:
+        if self.latency_scale and ms > 0:
+            time.sleep(ms * self.latency_scale / 1000)
+
+    def remaining(self) -> dict[str, int]:
+        """再生されずに残ったインタラクション数（チャネル別）。"""
+        counts = {}
+        for ch in CHANNELS:
+            entries = self.data["interactions"][ch]
+            used = sum(1 for e in entries if e.get("_used")) if ch == "http" else self._cursor[ch]
+            counts[ch] = len(entries) - used
+        return counts
+
+    # ── チャネル別ラッパー ──────────────────────────
+
+    def clock(self, real_now):
+        """agent._now の置き換え。"""
+        def now():
+            if self.mode == "record":
+                value = real_now()
+                self._append("clock", {"value": value.isoformat()})
+                return value
+            return datetime.fromisoformat(self._next("clock")["value"])
+        return now
+
+    def http(self, real_fetch):
+        """feed_pipeline.fetch_feed の置き換え。"""
+        def fetch(url: str, *args, **kwargs) -> bytes:
+            if self.mode == "record":
+                start = time.perf_counter()
+                try:
+                    body = real_fetch(url, *args, **kwargs)
+                except Exception as e:
+                    self._append("http", {
+                        "key": url, "error": f"{type(e).__name__}: {e}",
+                        "elapsed_ms": (time.perf_counter() - start) * 1000,
+                    })
+                    raise
+                self._append("http", {
+                    "key": url,
+                    "body_b64": base64.b64encode(body).decode("ascii"),
+                    "elapsed_ms": (time.perf_counter() - start) * 1000,
+                })
+                return body
+            entry = self._next("http", key=url)
+            self.sleep(entry["elapsed_ms"])
+            if "error" in entry:
+                raise OSError(entry["error"])
+            return base64.b64decode(entry["body_b64"])
+        return fetch
+
+    def agentcore_client(self, real_client):
+        """boto3 bedrock-agentcore クライアントの置き換え（invoke_agent_runtime のみ）。"""
+        cassette = self
+
+        class _Client:
+            def invoke_agent_runtime(self, **kwargs):
+                payload = kwargs.get("payload", b"")
+                req = json.loads(payload)
+                req_hash = request_hash(req)
+                if cassette.mode == "record":
+                    start = time.perf_counter()
+                    body = real_client.invoke_agent_runtime(**kwargs)["response"].read()
+                    cassette._append("agentcore", {
+                        "request": req,
+                        "request_hash": req_hash,
+                        "body": body.decode("utf-8"),
+                        "elapsed_ms": (time.perf_counter() - start) * 1000,
+                    })
+                    return {"response": io.BytesIO(body)}
+                entry = cassette._next("agentcore")
+                cassette._check("agentcore", entry, req_hash)
+                cassette.sleep(entry["elapsed_ms"])
+                return {"response": io.BytesIO(entry["body"].encode("utf-8"))}
+
+        return _Client()
+
+    def slack_client(self, real_client=None):
+        """slack_sdk WebClient の置き換え（chat_postMessage のみ）。real_client=None なら送信しない。"""
+        cassette = self
+
+        class _Client:
+            def chat_postMessage(self, **kwargs):
+                req_hash = request_hash(kwargs)
+                if cassette.mode == "record":
+                    start = time.perf_counter()
+                    if real_client is not None:
+                        resp = real_client.chat_postMessage(**kwargs).data
+                    else:
+                        resp = {"ok": True, "channel": kwargs.get("channel"), "ts": f"{time.time():.6f}"}
+                    cassette._append("slack", {
+                        "request": kwargs,
+                        "request_hash": req_hash,
+                        "response": resp,
+                        "elapsed_ms": (time.perf_counter() - start) * 1000,
+                    })
+                    return resp
+                entry = cassette._next("slack")
+                cassette._check("slack", entry, req_hash)
+                cassette.sleep(entry["elapsed_ms"])
+                self.last_request = kwargs
+                return entry["response"]
+
+        return _Client()
+
+
+class CassetteModel(Model):
+    """
+    Strands モデルのラッパー。記録時は inner に委譲してストリームイベントを保存し、
+    再生時は保存したイベントを記録時の間隔で返す。
+    """
+
+    def __init__(self, cassette: Cassette, inner: Model | None = None):
+        self.cassette = cassette
+        self.inner = inner
+
+    def update_config(self, **model_config: Any) -> None:
+        if self.inner is not None:
+            self.inner.update_config(**model_config)
+
+    def get_config(self) -> Any:
+        return self.inner.get_config() if self.inner is not None else {}
+
+    async def structured_output(self, output_model, prompt, system_prompt=None, **kwargs) -> AsyncIterable[Any]:
+        """stream と同じく記録・再生する。最後のイベントの output はモデルの dict で保存し、再生時に検証して戻す。"""
+        req_hash = request_hash({
+            "messages":      prompt,
+            "output_model":  output_model.__name__,
+            "system_prompt": system_prompt,
+        })
+
+        if self.cassette.mode == "record":
+            start = time.perf_counter()
+            first_ms = None
+            events = []
+            async for event in self.inner.structured_output(output_model, prompt, system_prompt, **kwargs):
+                if first_ms is None:
+                    first_ms = (time.perf_counter() - start) * 1000
+                if "output" in event:
+                    events.append({"output": event["output"].model_dump(mode="json")})
+                else:
+                    events.append(event)
+                yield event
+            self.cassette._append("model", {
+                "request_hash": req_hash,
+                "events":       json.loads(json.dumps(events, default=str)),
+                "first_ms":     first_ms or 0.0,
+                "elapsed_ms":   (time.perf_counter() - start) * 1000,
+            })
+            return
+
+        entry = self.cassette._next("model")
+        self.cassette._check("model", entry, req_hash)
+        events = entry["events"]
+        self.cassette.sleep(entry["first_ms"])
+        for i, event in enumerate(events):
+            if i == len(events) - 1:
+                self.cassette.sleep(entry["elapsed_ms"] - entry["first_ms"])
+            yield {"output": output_model.model_validate(event["output"])} if "output" in event else event
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs) -> AsyncIterable[Any]:
+        req_hash = request_hash({
+            "messages":      messages,
+            "tools":         sorted(t["name"] for t in tool_specs or []),
+            "system_prompt": system_prompt,
+        })
+
+        if self.cassette.mode == "record":
+            start = time.perf_counter()
+            first_ms = None
+            events = []
+            async for event in self.inner.stream(messages, tool_specs, system_prompt, **kwargs):
+                if first_ms is None:
+                    first_ms = (time.perf_counter() - start) * 1000
+                events.append(event)
+                yield event
+            self.cassette._append("model", {
+                "request_hash": req_hash,
+                "events":       json.loads(json.dumps(events, default=str)),
+                "first_ms":     first_ms or 0.0,
+                "elapsed_ms":   (time.perf_counter() - start) * 1000,
+            })
+            return
+
+        entry = self.cassette._next("model")
+        self.cassette._check("model", entry, req_hash)
+        events = entry["events"]
+        self.cassette.sleep(entry["first_ms"])
+        for i, event in enumerate(events):
+            if i == len(events) - 1:
+                self.cassette.sleep(entry["elapsed_ms"] - entry["first_ms"])
+            yield event
@@ -0,0 +1,447 @@
+"""
+digest の設定ごとの品質・レイテンシ評価ハーネス（オフライン）
+
+ゴールドセット（記録したフィードと参照出力）に対して agent.invoke() を設定ごとに実行し、
+レイテンシ・トークン数・JSON の妥当率・項目別の一致度を並べる。バッチサイズ・モデル・プロンプト・入力の圧縮を
+変えたときの品質への影響を、本番に出す前に数値で確認するためのもの。
+
+ゴールドセット（JSON）:
+  {"version": 1, "mode", "now", "pipeline", "bodies": {URL: base64}, "references": [記事 dict], ...}
+  gold サブコマンドで record/replay のカセット（tools/replay_e2e.py record）から作る。
+  references はカセットに記録されたモデルの出力（1段階目。本文による充実化の前）。人が確認・修正してから使う。
+
+設定（--configs の JSON 配列。省略時は既定値の baseline のみ）:
+  {"name": "batch10-compact", "batch_size": 10, "model_id": "...", "prompt": "prompts/v2.txt", "compaction": 1}
+  batch_size : 1回の生成に入れる記事数（agent.DIGEST_BATCH_SIZE。0 は全件を1回で）
+  model_id   : bedrock / replay で使うモデル ID（stub では表示だけ）
+  prompt     : digest のシステムプロンプトを置き換えるファイル（版は prompts.prompt_version で求める）
+  compaction : 入力の圧縮レベル（COMPACTION を参照）
+
+モデル（--model）:
+  stub    : 入力の記事に対応する参照出力をそのまま返す決定的なモデル（トークン数は文字数からの概算）。
+            品質は変わらないため、パイプライン側の取りこぼし・トークン数・呼び出し回数の比較に使う
+  replay  : --cassette-dir/{name}.json.gz に記録したモデルの応答を再生する（AWS 認証情報不要）
+  bedrock : Bedrock を呼ぶ（AWS 認証情報が必要）。--record で replay 用のカセットに保存する
+
+一致度（参照記事ごとに link で対応付ける）:
+  importance・category は完全一致、title_ja・summary_ja・change・benefit は文字 bigram の F1。
+  出力にない参照記事は全項目 0。score は全参照記事・全項目の平均、recall は出力に含まれた参照記事の割合。
+
+Usage:
+  python tools/eval_digest.py gold --cassette cassettes/morning.json.gz --output eval/gold-morning.json
+  python tools/eval_digest.py run --gold eval/gold-morning.json --configs eval/configs.json
+  python tools/eval_digest.py run --gold eval/gold-morning.json --configs eval/configs.json \\
+      --model bedrock --record --cassette-dir eval/cassettes
+  python tools/eval_digest.py run --gold eval/gold-morning.json --configs eval/configs.json \\
+      --model replay --cassette-dir eval/cassettes --output eval.json
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, AsyncIterable
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+for sub in ("tools", "agent"):
+    sys.path.insert(0, os.path.join(ROOT, sub))
+
+# ゴールドセットのフィードだけを使う（スナップショット・バッチ推論は使わない）
+for key in ("SNAPSHOT_BUCKET", "SNAPSHOT_DIR", "BATCH_BACKEND"):
+    os.environ.pop(key, None)
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+import agent as agent_mod  # noqa: E402
+from article_model import FIELDS, ArticleValidationError, decode_articles, parse_articles  # noqa: E402
+from strands import Agent  # noqa: E402
+from strands.models import Model  # noqa: E402
+
+from cassette import Cassette, CassetteModel  # noqa: E402
+from prompts import prompt_version, system_blocks  # noqa: E402
+
+GOLD_VERSION = 1
+
+# 入力の圧縮レベル: 概要の最大文字数と、モデルに渡さない項目
+COMPACTION = {
+    0: {"summary_max_chars": None, "drop": ()},
+    1: {"summary_max_chars": 300,  "drop": ()},
+    2: {"summary_max_chars": 120,  "drop": ("published",)},
+}
+CONFIG_KEYS     = {"name", "batch_size", "model_id", "prompt", "compaction"}
+TEXT_FIELDS     = ("title_ja", "summary_ja", "change", "benefit")
+EXACT_FIELDS    = ("importance", "category")
+CHARS_PER_TOKEN = 3   # stub のトークン数の概算（日本語・英語の混在）
+
+
+# ─────────────────────────────────────────────────────────
+# ゴールドセット
+# ─────────────────────────────────────────────────────────
+
+def build_gold(cassette_path: str) -> dict:
+    """
+    カセットの実行をオフラインで再生し、1段階目のモデル出力を参照出力にする。
+    フィード本体はカセットの http チャネルから取り出す。
+    """
+    cassette = Cassette.load(cassette_path, latency_scale=0)
+    meta = cassette.data["meta"]
+    mode = meta.get("mode", "morning")
+    pipeline = meta.get("pipeline", "tool")   # pipeline のない古いカセットはツール呼び出し方式
+    interactions = cassette.data["interactions"]
+
+    patches = {
+        "DIGEST_PIPELINE": pipeline,
+        "ENRICH_ENABLED":  False,
+        "_now":            cassette.clock(agent_mod._now),
+        "fetch_feed":      cassette.http(agent_mod.fetch_feed),
+        "_new_agent":      lambda tools, system_prompt: _agent(tools, system_prompt, CassetteModel(cassette)),
+    }
+    with _patched(patches):
+        result = agent_mod.invoke({"mode": mode}, None)
+    if cassette.mismatches:
+        print("⚠ カセットの再生で不一致がありました（参照出力を確認してください）:", *cassette.mismatches, sep="\n  ")
+
+    return {
+        "version":    GOLD_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "source":     os.path.basename(cassette_path),
+        "mode":       mode,
+        "pipeline":   pipeline,
+        "now":        interactions["clock"][0]["value"],
+        "bodies":     {e["key"]: e["body_b64"] for e in interactions["http"] if "body_b64" in e},
+        "references": [a.to_dict() for a in decode_articles(result.get("articles"))],
+    }
+
+
+def load_gold(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        gold = json.load(f)
+    if gold.get("version") != GOLD_VERSION:
+        raise ValueError(f"unsupported gold version: {gold.get('version')}")
+    return gold
+
+
+def load_configs(path: str | None) -> list[dict]:
+    if not path:
+        return [{"name": "baseline"}]
+    with open(path, encoding="utf-8") as f:
+        configs = json.load(f)
+    names = set()
+    for i, c in enumerate(configs):
+        unknown = set(c) - CONFIG_KEYS
+        if unknown:
+            raise ValueError(f"configs[{i}]: 未知の項目があります: {sorted(unknown)}")
+        if not c.get("name") or c["name"] in names:
+            raise ValueError(f"configs[{i}]: name は必須で、重複できません")
+        if not isinstance(c.get("batch_size", 0), int) or c.get("batch_size", 0) < 0:
+            raise ValueError(f"configs[{i}]: batch_size は 0 以上の整数です")
+        if c.get("compaction", 0) not in COMPACTION:
+            raise ValueError(f"configs[{i}]: compaction は {sorted(COMPACTION)} のいずれかです")
+        names.add(c["name"])
+    return configs
+
+
+# ─────────────────────────────────────────────────────────
+# モデル
+# ─────────────────────────────────────────────────────────
+
+class StubModel(Model):
+    """入力の記事に対応する参照出力を返す決定的なモデル。トークン数は文字数から概算する。"""
+
+    def __init__(self, references: list[dict], ms_per_token: float = 0.0):
+        self.by_link = {r["link"]: r for r in references}
+        self.ms_per_token = ms_per_token
+
+    def update_config(self, **model_config: Any) -> None:
+        pass
+
+    def get_config(self) -> Any:
+        return {}
+
+    def _reference_output(self, messages) -> tuple[str, str]:
+        """最後のメッセージ（記事の JSON 配列）と、それに対応する参照出力の JSON を返す。"""
+        text = next(c["text"] for c in messages[-1]["content"] if "text" in c)
+        inputs = json.loads(text)
+        output = json.dumps([self.by_link[a["link"]] for a in inputs if a.get("link") in self.by_link],
+                            ensure_ascii=False)
+        return text, output
+
+    async def structured_output(self, output_model, prompt, system_prompt=None, **kwargs) -> AsyncIterable[Any]:
+        """参照出力を output_model で検証して返す（記事の配列を受け取るモデルを想定）。"""
+        _, output = self._reference_output(prompt)
+        yield {"output": output_model.model_validate_json(output)}
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs) -> AsyncIterable[Any]:
+        text, output = self._reference_output(messages)
+        input_tokens = (len(system_prompt or "") + len(text)) // CHARS_PER_TOKEN
+        output_tokens = len(output) // CHARS_PER_TOKEN
+        if self.ms_per_token:
+            await asyncio.sleep(output_tokens * self.ms_per_token / 1000)
+
+        yield {"messageStart": {"role": "assistant"}}
+        yield {"contentBlockDelta": {"delta": {"text": output}}}
+        yield {"contentBlockStop": {}}
+        yield {"messageStop": {"stopReason": "end_turn"}}
+        yield {"metadata": {
+            "usage": {"inputTokens": input_tokens, "outputTokens": output_tokens,
+                      "totalTokens": input_tokens + output_tokens},
+            "metrics": {"latencyMs": 0},
+        }}
+
+
+def _bedrock_model(model_id: str | None) -> Model:
+    from strands.models import BedrockModel
+    return BedrockModel(model_id=model_id) if model_id else BedrockModel()
+
+
+def _agent(tools: list, system_prompt: str, model: Model) -> Agent:
+    return Agent(tools=tools, system_prompt=system_blocks(system_prompt), model=model, callback_handler=None)
+
+
+# ─────────────────────────────────────────────────────────
+# 一致度
+# ─────────────────────────────────────────────────────────
+
+def _bigrams(text: str) -> Counter:
+    s = re.sub(r"\s+", "", text or "")
+    return Counter(s[i:i + 2] for i in range(len(s) - 1)) if len(s) > 1 else Counter(s)
+
+
+def text_f1(output: str, reference: str) -> float:
+    """文字 bigram の F1（両方空なら 1）。"""
+    out, ref = _bigrams(output), _bigrams(reference)
+    if not out and not ref:
+        return 1.0
+    overlap = sum((out & ref).values())
+    if not overlap:
+        return 0.0
+    precision, recall = overlap / sum(out.values()), overlap / sum(ref.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def agreement(outputs: list[dict], references: list[dict]) -> dict:
+    """参照記事ごと・項目ごとの一致度の平均。"""
+    by_link = {a["link"]: a for a in outputs}
+    fields: dict[str, list[float]] = {k: [] for k in (*EXACT_FIELDS, *TEXT_FIELDS)}
+    for ref in references:
+        out = by_link.get(ref["link"])
+        for k in EXACT_FIELDS:
+            fields[k].append(float(out is not None and out.get(k) == ref[k]))
+        for k in TEXT_FIELDS:
+            fields[k].append(text_f1(out.get(k, ""), ref[k]) if out is not None else 0.0)
+    per_field = {k: round(statistics.fmean(v), 3) if v else 1.0 for k, v in fields.items()}
+    found = sum(1 for r in references if r["link"] in by_link)
+    return {
+        "score":  round(statistics.fmean(per_field.values()), 3),
+        "recall": round(found / len(references), 3) if references else 1.0,
+        "extra":  sum(1 for link in by_link if link not in {r["link"] for r in references}),
+        "fields": per_field,
+    }
+
+
+def json_valid(raw: str) -> bool:
+    """応答がそのまま JSON の記事配列として読め、すべての記事が検証を通るか。"""
+    try:
+        parse_articles(json.loads(raw), strict=True)
+        return True
+    except (json.JSONDecodeError, ArticleValidationError):
+        return False
+
+
+# ─────────────────────────────────────────────────────────
+# 実行
+# ─────────────────────────────────────────────────────────
+
+class _patched:
+    """agent モジュールの属性を一時的に差し替える。"""
+
+    def __init__(self, values: dict):
+        self.values = values
+        self.saved: dict = {}
+
+    def __enter__(self):
+        for k, v in self.values.items():
+            self.saved[k] = getattr(agent_mod, k)
+            setattr(agent_mod, k, v)
+
+    def __exit__(self, *exc):
+        for k, v in self.saved.items():
+            setattr(agent_mod, k, v)
+
+
+def _compactor(collect, level: int):
+    """_collect_articles の結果（モデルへの入力）を圧縮レベルに応じて削る。"""
+    spec = COMPACTION[level]
+    if not level:
+        return collect
+
+    def compacted(*args, **kwargs) -> list[dict]:
+        articles = collect(*args, **kwargs)
+        limit = spec["summary_max_chars"]
+        return [
+            {**{k: v for k, v in a.items() if k not in spec["drop"]}, "summary": a.get("summary", "")[:limit]}
+            for a in articles
+        ]
+    return compacted
+
+
+def _cassette_path(cassette_dir: str, name: str) -> str:
+    return os.path.join(cassette_dir, f"{name}.json.gz")
+
+
+def run_config(gold: dict, config: dict, model_kind: str, args) -> dict:
+    prompt = agent_mod.BATCH_SYSTEM_PROMPT
+    if config.get("prompt"):
+        with open(config["prompt"], encoding="utf-8") as f:
+            prompt = f.read()
+    bodies = {url: base64.b64decode(b) for url, b in gold["bodies"].items()}
+    now = datetime.fromisoformat(gold["now"])
+
+    def fetch(url: str, *a, **kw) -> bytes:
+        if url not in bodies:
+            raise OSError(f"ゴールドセットにないフィードです: {url}")
+        return bodies[url]
+
+    repeat = 1 if model_kind != "stub" and (args.record or model_kind == "bedrock") else args.repeat
+    walls, raw_responses, mismatches = [], [], []
+    result: dict = {}
+    parse_text = agent_mod._parse_text
+
+    def capture(raw: str) -> list:
+        raw_responses.append(raw)
+        return parse_text(raw)
+
+    for _ in range(repeat):
+        cassette = None
+        if model_kind == "stub":
+            model = StubModel(gold["references"], args.stub_ms_per_token)
+        elif model_kind == "replay":
+            cassette = Cassette.load(_cassette_path(args.cassette_dir, config["name"]),
+                                     latency_scale=args.latency_scale)
+            model = CassetteModel(cassette)
+        elif args.record:
+            cassette = Cassette("record")
+            cassette.data["meta"].update({"eval_config": config, "gold": gold.get("source")})
+            model = CassetteModel(cassette, _bedrock_model(config.get("model_id")))
+        else:
+            model = _bedrock_model(config.get("model_id"))
+
+        raw_responses.clear()
+        patches = {
+            "DIGEST_PIPELINE":     "direct",
+            "DIGEST_BATCH_SIZE":   int(config.get("batch_size", 0)),
+            "BATCH_SYSTEM_PROMPT": prompt,
+            "ENRICH_ENABLED":      False,
+            "_now":                lambda: now,
+            "fetch_feed":          fetch,
+            "_parse_text":         capture,
+            "_collect_articles":   _compactor(agent_mod._collect_articles, config.get("compaction", 0)),
+            "_new_agent":          lambda tools, system_prompt, model=model: _agent(tools, system_prompt, model),
+        }
+        start = time.perf_counter()
+        with _patched(patches):
+            result = agent_mod.invoke({"mode": gold["mode"]}, None)
+        walls.append((time.perf_counter() - start) * 1000)
+
+        if cassette is not None and cassette.mode == "record":
+            os.makedirs(args.cassette_dir, exist_ok=True)
+            cassette.save(_cassette_path(args.cassette_dir, config["name"]))
+        elif cassette is not None:
+            mismatches = cassette.mismatches
+
+    metrics = result.get("metrics", {})
+    outputs = [a.to_dict() for a in decode_articles(result.get("articles"))]
+    valid = [json_valid(r) for r in raw_responses]
+    return {
+        "name":            config["name"],
+        "config":          config,
+        "prompt_version":  prompt_version(prompt),
+        "latency_ms":      {"p50": round(statistics.median(walls), 1), "max": round(max(walls), 1),
+                            "llm": metrics.get("stages_ms", {}).get("llm", 0)},
+        "model_calls":     len(metrics.get("llm_batches_ms", [])),
+        "usage":           metrics.get("usage", {}),
+        "json_valid_rate": round(sum(valid) / len(valid), 3) if valid else None,
+        "articles":        len(outputs),
+        "agreement":       agreement(outputs, gold["references"]),
+        "mismatches":      mismatches,
+    }
+
+
+def print_table(results: list[dict]) -> None:
+    base = results[0]["agreement"]["score"] if results else 0
+    print(f"  {'config':20}{'prompt':>10}{'p50 ms':>10}{'llm ms':>9}{'calls':>7}{'in tok':>9}{'out tok':>9}"
+          f"{'json':>7}{'recall':>8}{'score':>7}{'Δscore':>8}")
+    for r in results:
+        usage, agree = r["usage"], r["agreement"]
+        valid = "-" if r["json_valid_rate"] is None else f"{r['json_valid_rate']:.0%}"
+        print(f"  {r['name'][:20]:20}{r['prompt_version']:>10}{r['latency_ms']['p50']:>10.1f}"
+              f"{r['latency_ms']['llm']:>9}{r['model_calls']:>7}{usage.get('input_tokens', 0):>9,}"
+              f"{usage.get('output_tokens', 0):>9,}{valid:>7}{agree['recall']:>8.0%}{agree['score']:>7.3f}"
+              f"{agree['score'] - base:>+8.3f}")
+        for m in r["mismatches"]:
+            print(f"    ⚠ {m}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gold_cmd = sub.add_parser("gold", help="カセットからゴールドセットを作る")
+    gold_cmd.add_argument("--cassette", required=True)
+    gold_cmd.add_argument("--output", required=True)
+
+    run_cmd = sub.add_parser("run", help="設定ごとに評価する")
+    run_cmd.add_argument("--gold", required=True)
+    run_cmd.add_argument("--configs", help="設定の JSON 配列（省略時は baseline のみ）")
+    run_cmd.add_argument("--model", choices=["stub", "replay", "bedrock"], default="stub")
+    run_cmd.add_argument("--cassette-dir", default="eval-cassettes")
+    run_cmd.add_argument("--record", action="store_true", help="bedrock の応答を --cassette-dir に記録する")
+    run_cmd.add_argument("--repeat", type=int, default=3, help="stub / replay の繰り返し回数（レイテンシは中央値）")
+    run_cmd.add_argument("--latency-scale", type=float, default=1.0, help="replay の遅延の倍率（0 で最速）")
+    run_cmd.add_argument("--stub-ms-per-token", type=float, default=0.0, help="stub の出力1トークンあたりの遅延")
+    run_cmd.add_argument("--output", help="結果 JSON の出力先")
+    args = parser.parse_args()
+
+    if args.command == "gold":
+        gold = build_gold(args.cassette)
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(gold, f, ensure_ascii=False, indent=2)
+        print(f"ゴールドセットを書き出しました: {args.output}（参照記事 {len(gold['references'])}件・フィード {len(gold['bodies'])}件）")
+        return 0
+
+    if args.record and args.model != "bedrock":
+        parser.error("--record は --model bedrock と一緒に指定してください")
+    gold = load_gold(args.gold)
+    results = [run_config(gold, config, args.model, args) for config in load_configs(args.configs)]
+
+    print(f"ゴールドセット: {args.gold}（mode={gold['mode']} 参照記事 {len(gold['references'])}件） model={args.model}")
+    print_table(results)
+
+    if args.output:
+        output = {
+            "results": results,
+            "meta": {
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "gold":       args.gold,
+                "model":      args.model,
+                "python":     platform.python_version(),
+                "platform":   platform.platform(),
+                "fields":     list(FIELDS),
+            },
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(output, f, ensure_ascii=False, indent=2)
+        print(f"結果を書き出しました: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+ベンチマーク・シミュレーション用のフィードフィクスチャ
+
+- 記録済みフィクスチャ : tools/fixtures/manifest.json に列挙した実フィード形式のサンプル
+- 合成フィクスチャ     : 件数・フィード数を指定して RSS 2.0 / Atom を決定的に生成
+
+どちらも reference_time を基準に公開日時が決まるため、
+cutoff = reference_time - FETCH_HOURS とすれば毎回同じ件数がフィルタを通過する。
+"""
+
+import json
+import os
+import random
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from xml.sax.saxutils import escape
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# 合成フィクスチャの基準時刻（記録済みフィクスチャと揃える）
+REFERENCE_TIME = datetime(2026, 10, 15, tzinfo=timezone.utc)
+
+_SERVICES = [
+    "Amazon S3", "AWS Lambda", "Amazon EC2", "Amazon Aurora", "Amazon Bedrock", "Amazon ECS",
+    "Amazon EKS", "AWS Glue", "Amazon CloudWatch", "Amazon DynamoDB", "AWS IAM", "Amazon VPC",
+]
+_VERBS = [
+    "now supports", "is now available in", "announces", "adds", "reduces pricing for",
+    "introduces", "expands", "improves performance of",
+]
+_TOPICS = [
+    "additional AWS Regions", "Graviton4 instances", "zero-ETL integrations", "private connectivity",
+    "fine-grained access control", "cross-account replication", "agentic workflows", "IPv6 endpoints",
+]
+
+
+def load_recorded() -> tuple[datetime, dict[str, bytes]]:
+    """記録済みフィクスチャを読み込み (基準時刻, {カテゴリ: 本体}) を返す。"""
+    with open(os.path.join(FIXTURE_DIR, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    feeds = {}
+    for category, filename in manifest["feeds"].items():
+        with open(os.path.join(FIXTURE_DIR, filename), "rb") as f:
+            feeds[category] = f.read()
+    return datetime.fromisoformat(manifest["reference_time"]), feeds
+
+
+def _entries(seed: int, n: int, span_hours: float) -> list[dict]:
+    rng = random.Random(seed)
+    entries = []
+    for i in range(n):
+        title = f"{rng.choice(_SERVICES)} {rng.choice(_VERBS)} {rng.choice(_TOPICS)}"
+        published = REFERENCE_TIME - timedelta(hours=span_hours * i / max(n, 1))
+        summary = " ".join([
+            f"{title}.",
+            "This synthetic entry mirrors the length and markup of a real announcement.",
+            f"<p>Customers can use {rng.choice(_SERVICES)} together with {rng.choice(_SERVICES)}"
+            f" to build {rng.choice(_TOPICS)} workloads.</p>",
+        ])
+        entries.append({
+            "title":     title,
+            "summary":   summary,
+            "link":      f"https://example.com/feeds/{seed}/{i}",
+            "published": published,
+        })
+    return entries
+
+
+def synthetic_rss(seed: int, n: int, span_hours: float = 72) -> bytes:
+    """n 件のエントリを span_hours 時間に均等に散らした RSS 2.0 を生成する。"""
+    items = "".join(
+        "<item>"
+        f"<title>{escape(e['title'])}</title>"
+        f"<link>{e['link']}</link>"
+        f"<guid>{e['link']}</guid>"
+        f"<description>{escape(e['summary'])}</description>"
+        f"<pubDate>{format_datetime(e['published'], usegmt=True)}</pubDate>"
+        "</item>"
+        for e in _entries(seed, n, span_hours)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+        f"<title>Synthetic feed {seed}</title><link>https://example.com/feeds/{seed}</link>"
+        f"<description>synthetic</description>{items}</channel></rss>"
+    ).encode("utf-8")
+
+
+def synthetic_atom(seed: int, n: int, span_hours: float = 72) -> bytes:
+    """n 件のエントリを持つ Atom フィードを生成する。"""
+    entries = "".join(
+        "<entry>"
+        f"<title>{escape(e['title'])}</title>"
+        f'<link href="{e["link"]}"/>'
+        f"<id>{e['link']}</id>"
+        f"<published>{e['published'].isoformat()}</published>"
+        f"<updated>{e['published'].isoformat()}</updated>"
+        f"<summary>{escape(e['summary'])}</summary>"
+        "</entry>"
+        for e in _entries(seed, n, span_hours)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><feed xmlns="http://www.w3.org/2005/Atom">'
+        f"<title>Synthetic feed {seed}</title><id>urn:synthetic:{seed}</id>"
+        f"<updated>{REFERENCE_TIME.isoformat()}</updated>{entries}</feed>"
+    ).encode("utf-8")
+
+
+def synthetic_feeds(feeds: int, entries: int, atom_ratio: float = 0.25) -> dict[str, bytes]:
+    """feeds 本 × entries 件の合成フィード群を {カテゴリ: 本体} で返す。一部は Atom にする。"""
+    result = {}
+    atom_every = int(1 / atom_ratio) if atom_ratio else 0
+    for i in range(feeds):
+        make = synthetic_atom if atom_every and i % atom_every == atom_every - 1 else synthetic_rss
+        result[f"Synthetic {i:03d}"] = make(i, entries)
+    return result
@@ -0,0 +1,95 @@
+"""
+ローカル HTTP フィードサーバー（ベンチマーク・シミュレーション用のスタンドイン）
+
+with FeedServer({"/feeds/a": b"<rss>...</rss>"}, latency_ms=50) as server:
+    url = server.url("/feeds/a")
+
+別スレッドで ThreadingHTTPServer を起動し、登録済みのパスに対してフィード本体を返す。
+latency_ms でネットワーク遅延を、error_rate で 5xx 応答を模擬できる。
+本体のハッシュを ETag として返し、If-None-Match が一致すれば 304 を返す（条件付き GET の確認用）。
+"""
+
+import hashlib
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote
+
+
+class FeedServer:
+    def __init__(self, routes: dict[str, bytes] | None = None, latency_ms: float = 0.0,
+                 error_rate: float = 0.0, seed: int = 0):
+        self.routes     = dict(routes or {})
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.requests   = 0
+        self.not_modified = 0
+        self._rng       = random.Random(seed)
+        self._lock      = threading.Lock()
+        self._httpd: ThreadingHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+
+    # ── 公開 API ─────────────────────────────────────
+
+    def add_feed(self, name: str, body: bytes) -> str:
+        """フィードを登録して URL を返す。"""
+        path = "/feeds/" + quote(name.replace(" ", "-").lower())
+        self.routes[path] = body
+        return self.url(path)
+
+    def url(self, path: str) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}{path}"
+
+    def start(self) -> "FeedServer":
+        server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                    fail = server._rng.random() < server.error_rate
+                if server.latency_ms:
+                    time.sleep(server.latency_ms / 1000)
+                body = server.routes.get(self.path)
+                if fail or body is None:
+                    self.send_response(503 if fail else 404)
+                    self.end_headers()
+                    return
+                etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    with server._lock:
+                        server.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Type", "application/xml; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self) -> "FeedServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
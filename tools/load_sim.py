@@ -0,0 +1,177 @@
+"""
+end-to-end 負荷シミュレーター
+
+tools/standins.py のローカルスタンドイン（AgentCore / Bedrock / CloudWatch / Logs / Slack）を起動し、
+lambda/handler.py と lambda/weekly_report.py を指定の並列度で繰り返し実行して、
+スループット・レイテンシ分布・失敗の内訳を報告する。AWS 認証情報は不要。
+
+Usage:
+  # 24 モード × 1日1回 を並列度 8 で（AgentCore 中央値 3秒・5% エラー）
+  python tools/load_sim.py --modes 24 --runs 24 --concurrency 8 \\
+      --agentcore-latency-ms 3000 --agentcore-error-rate 0.05
+
+  # 毎時実行 × 1週間分（168 回）、Slack の 10% をレート制限にする
+  python tools/load_sim.py --runs 168 --concurrency 4 --slack-throttle-rate 0.1
+
+  # 週次レポートを並列実行（Logs Insights が 3 回目のポーリングで完了）
+  python tools/load_sim.py --target weekly --runs 10 --logs-query-polls 3
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+sys.path.insert(0, os.path.join(ROOT, "lambda"))
+
+from standins import EndpointProfile, StandinConfig, StandinServer  # noqa: E402
+
+
+def _configure_env(server_url: str, narrative: bool) -> None:
+    """handler / weekly_report がスタンドインに向くよう環境変数を設定する（インポート前に呼ぶ）。"""
+    os.environ.update({
+        "AWS_ENDPOINT_URL":      server_url,
+        "AWS_ACCESS_KEY_ID":     "sim",
+        "AWS_SECRET_ACCESS_KEY": "sim",
+        "AWS_DEFAULT_REGION":    "us-east-1",
+        "SLACK_API_URL":         server_url + "/api/",
+        "AGENT_RUNTIME_ARN":     "arn:aws:bedrock-agentcore:us-east-1:000000000000:runtime/sim",
+        "SLACK_BOT_TOKEN":       "xoxb-sim",
+        "SLACK_CHANNEL_ID":      "C0SIM",
+        "HANDLER_FUNCTION_NAME": "aws-digest-handler",
+        "REPORT_MODEL_ID":       "sim-model",
+        "REPORT_NARRATIVE":      "true" if narrative else "false",
+    })
+    for key in ("ROLLUP_BUCKET", "ROLLUP_DB_PATH", "PROFILE_BUCKET", "DIGEST_PROFILE"):
+        os.environ.pop(key, None)
+
+
+class _Context:
+    def __init__(self, i: int):
+        self.aws_request_id = f"sim-{i:05d}"
+
+
+def _pct(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run_load(fn, events: list[dict], concurrency: int) -> dict:
+    """events を並列度 concurrency で fn に渡し、結果を集計する。"""
+    latencies: list[float] = []
+    failures: dict[str, int] = {}
+
+    def one(i: int, event: dict):
+        start = time.perf_counter()
+        try:
+            fn(event, _Context(i))
+            return (time.perf_counter() - start) * 1000, None
+        except Exception as e:
+            return (time.perf_counter() - start) * 1000, type(e).__name__
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(one, i, ev) for i, ev in enumerate(events)]
+        for f in as_completed(futures):
+            ms, err = f.result()
+            latencies.append(ms)
+            if err:
+                failures[err] = failures.get(err, 0) + 1
+    wall_s = time.perf_counter() - wall_start
+
+    return {
+        "runs":           len(events),
+        "concurrency":    concurrency,
+        "succeeded":      len(events) - sum(failures.values()),
+        "failures":       failures,
+        "wall_s":         round(wall_s, 3),
+        "throughput_rps": round(len(events) / wall_s, 3) if wall_s else 0.0,
+        "latency_ms": {
+            "p50":  round(_pct(latencies, 50), 1),
+            "p95":  round(_pct(latencies, 95), 1),
+            "p99":  round(_pct(latencies, 99), 1),
+            "max":  round(max(latencies), 1) if latencies else 0.0,
+            "mean": round(statistics.fmean(latencies), 1) if latencies else 0.0,
+        },
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=["handler", "weekly", "both"], default="handler")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--modes", type=int, default=2, help="ラウンドロビンで使うモード数")
+    parser.add_argument("--articles", type=int, default=15, help="AgentCore スタンドインが返す記事数")
+    parser.add_argument("--narrative", action="store_true", help="週次レポートの所感欄（Bedrock）を有効化")
+    parser.add_argument("--logs-query-polls", type=int, default=1)
+    for name in ("agentcore", "bedrock", "logs", "metrics", "slack"):
+        parser.add_argument(f"--{name}-latency-ms", type=float, default=0.0)
+        parser.add_argument(f"--{name}-jitter", type=float, default=0.3)
+        parser.add_argument(f"--{name}-error-rate", type=float, default=0.0)
+        parser.add_argument(f"--{name}-throttle-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="sim_results.json")
+    args = parser.parse_args()
+
+    def profile(name: str) -> EndpointProfile:
+        return EndpointProfile(
+            latency_ms=getattr(args, f"{name}_latency_ms"),
+            jitter=getattr(args, f"{name}_jitter"),
+            error_rate=getattr(args, f"{name}_error_rate"),
+            throttle_rate=getattr(args, f"{name}_throttle_rate"),
+        )
+
+    config = StandinConfig(
+        agentcore=profile("agentcore"), bedrock=profile("bedrock"), logs=profile("logs"),
+        metrics=profile("metrics"), slack=profile("slack"),
+        articles=args.articles, logs_query_polls=args.logs_query_polls, seed=args.seed,
+    )
+
+    results: dict = {
+        "meta": {"created_at": datetime.now(timezone.utc).isoformat(), "args": vars(args)},
+        "targets": {},
+    }
+
+    with StandinServer(config) as server:
+        _configure_env(server.url, args.narrative)
+
+        if args.target in ("handler", "both"):
+            import handler
+            modes = ["morning", "noon"] if args.modes == 2 else [f"mode-{i:02d}" for i in range(args.modes)]
+            events = [{"mode": modes[i % len(modes)]} for i in range(args.runs)]
+            results["targets"]["handler"] = run_load(handler.handler, events, args.concurrency)
+
+        if args.target in ("weekly", "both"):
+            import weekly_report
+            events = [{} for _ in range(args.runs)]
+            results["targets"]["weekly"] = run_load(weekly_report.handler, events, args.concurrency)
+
+        results["standins"] = server.stats
+
+    for name, r in results["targets"].items():
+        lat = r["latency_ms"]
+        print(
+            f"[{name}] {r['succeeded']}/{r['runs']} 成功  {r['throughput_rps']} runs/s"
+            f"  p50 {lat['p50']}ms / p95 {lat['p95']}ms / p99 {lat['p99']}ms / max {lat['max']}ms"
+        )
+        if r["failures"]:
+            print(f"  失敗内訳: {r['failures']}")
+    print(f"スタンドイン呼び出し: {results['standins']}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"結果を書き出しました: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+invoke() → handler() の end-to-end record/replay ハーネス
+
+record: ライブのフィード・Bedrock を使ってローカルで1回実行し、すべての外部呼び出しをカセットに保存する
+        （AWS 認証情報が必要。Slack には --post-slack を付けた場合のみ実際に投稿する）
+replay: カセットから再生してオフラインで同じ実行を再現する（AWS 認証情報・ネットワーク不要）
+
+記事数は本番と同じ（MAX_ARTICLES まで）で、test_local.py --full のような件数の切り詰めはしない。
+
+Usage:
+  python tools/replay_e2e.py record --mode noon --cassette cassettes/noon.json.gz
+  python tools/replay_e2e.py replay --cassette cassettes/noon.json.gz                  # 記録時と同じ遅延
+  python tools/replay_e2e.py replay --cassette cassettes/noon.json.gz --latency-scale 0 --output run.json
+  python tools/replay_e2e.py replay --cassette cassettes/noon.json.gz --agent recorded  # handler のみ
+  python tools/replay_e2e.py replay --cassette cassettes/noon.json.gz --profile         # プロファイル付き
+
+--agent local    : agent.invoke() をプロセス内で実行し、フィード・モデルをカセットから再生する（デフォルト）
+--agent recorded : 記録した AgentCore レスポンスをそのまま返す（handler 側だけを再生）
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+for sub in ("tools", "agent", "lambda"):
+    sys.path.insert(0, os.path.join(ROOT, sub))
+
+# handler.py はインポート時に環境変数を参照するため、ローカル実行用の値を先に入れておく
+os.environ.setdefault("AGENT_RUNTIME_ARN", "arn:aws:bedrock-agentcore:us-east-1:000000000000:runtime/local")
+os.environ.setdefault("SLACK_BOT_TOKEN", "xoxb-local")
+os.environ.setdefault("SLACK_CHANNEL_ID", "C0LOCAL")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+import agent as agent_mod  # noqa: E402
+from article_model import decode_articles  # noqa: E402
+import handler as handler_mod  # noqa: E402
+from strands import Agent  # noqa: E402
+
+from cassette import Cassette, CassetteModel  # noqa: E402
+from prompts import system_blocks  # noqa: E402
+
+
+class LocalAgentCoreClient:
+    """InvokeAgentRuntime をプロセス内の agent.invoke() に置き換える。"""
+
+    def __init__(self):
+        self.last_result: dict = {}
+
+    def invoke_agent_runtime(self, **kwargs):
+        payload = json.loads(kwargs["payload"])
+        self.last_result = agent_mod.invoke(payload, None)
+        body = json.dumps(self.last_result, ensure_ascii=False).encode("utf-8")
+        return {"response": io.BytesIO(body)}
+
+
+def install(cassette: Cassette, agent_source: str, post_slack: bool = False) -> LocalAgentCoreClient | None:
+    """agent / handler モジュールの外部呼び出しをカセット経由に差し替える。"""
+    local_client = None
+    recording = cassette.mode == "record"
+
+    if agent_source == "local":
+        # モデル呼び出しの回数・内容は digest の進め方で変わるため、記録時の方式で再生する
+        # （pipeline のない古いカセットはツール呼び出し方式で記録したもの）
+        meta = cassette.data["meta"]
+        agent_mod.DIGEST_PIPELINE = meta.setdefault("pipeline", agent_mod.DIGEST_PIPELINE if recording else "tool")
+        agent_mod._now = cassette.clock(agent_mod._now)
+        agent_mod.fetch_feed = cassette.http(agent_mod.fetch_feed)
+        agent_mod.fetch_page = cassette.http(agent_mod.fetch_page)  # HIGH 記事の本文（enrichment）
+
+        def new_agent(tools: list, system_prompt: str) -> Agent:
+            inner = None
+            if recording:
+                from strands.models import BedrockModel
+                inner = BedrockModel()
+            return Agent(tools=tools, system_prompt=system_blocks(system_prompt), model=CassetteModel(cassette, inner))
+
+        agent_mod._new_agent = new_agent
+        local_client = LocalAgentCoreClient()
+
+    if recording or agent_source == "recorded":
+        handler_mod.agentcore_client = cassette.agentcore_client(local_client)
+    else:
+        # 再生 + local: AgentCore の記録は使わず、プロセス内の invoke() を毎回実行する
+        handler_mod.agentcore_client = local_client
+
+    real_slack = handler_mod.slack_client if (recording and post_slack) else None
+    handler_mod.slack_client = cassette.slack_client(real_slack)
+    return local_client
+
+
+class _Context:
+    def __init__(self, request_id: str):
+        self.aws_request_id = request_id
+
+
+def run(cassette: Cassette, mode: str, profile: bool = False) -> dict:
+    event = {"mode": mode}
+    if profile:
+        event["profile"] = True
+    start = time.perf_counter()
+    result = handler_mod.handler(event, _Context(f"replay-{int(time.time())}"))
+    return {"handler_result": result, "wall_ms": round((time.perf_counter() - start) * 1000, 1)}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record")
+    rec.add_argument("--mode", default="morning")
+    rec.add_argument("--cassette", required=True)
+    rec.add_argument("--post-slack", action="store_true", help="Slack に実際に投稿する")
+
+    rep = sub.add_parser("replay")
+    rep.add_argument("--cassette", required=True)
+    rep.add_argument("--agent", choices=["local", "recorded"], default="local")
+    rep.add_argument("--latency-scale", type=float, default=1.0)
+    rep.add_argument("--strict", action="store_true", help="リクエスト不一致をエラーにする")
+    rep.add_argument("--profile", action="store_true")
+    rep.add_argument("--output", help="実行結果（Slack 投稿内容・メトリクス）の出力先 JSON")
+
+    args = parser.parse_args()
+
+    if args.command == "record":
+        cassette = Cassette("record")
+        cassette.data["meta"]["mode"] = args.mode
+        local_client = install(cassette, "local", post_slack=args.post_slack)
+        summary = run(cassette, args.mode)
+        os.makedirs(os.path.dirname(os.path.abspath(args.cassette)), exist_ok=True)
+        cassette.save(args.cassette)
+        counts = {ch: len(v) for ch, v in cassette.data["interactions"].items()}
+        print(f"記録完了: {args.cassette} {counts} wall={summary['wall_ms']}ms")
+        print(f"記事数: {len(decode_articles(local_client.last_result.get('articles')))}")
+        return 0
+
+    cassette = Cassette.load(args.cassette, latency_scale=args.latency_scale, strict=args.strict)
+    mode = cassette.data["meta"].get("mode", "morning")
+    local_client = install(cassette, args.agent)
+    summary = run(cassette, mode, profile=args.profile)
+
+    slack_request = getattr(handler_mod.slack_client, "last_request", {})
+    agent_result = local_client.last_result if local_client else {}
+    output = {
+        **summary,
+        "mode":          mode,
+        "agent_metrics": agent_result.get("metrics", {}),
+        "articles":      [a.to_dict() for a in decode_articles(agent_result.get("articles"))],
+        "slack_request": slack_request,
+        "remaining":     cassette.remaining(),
+        "mismatches":    cassette.mismatches,
+    }
+    print(
+        f"再生完了: mode={mode} articles={summary['handler_result'].get('articles_count')}"
+        f" wall={summary['wall_ms']}ms latency_scale={args.latency_scale}"
+    )
+    if output["agent_metrics"]:
+        print(f"  agent stages_ms: {output['agent_metrics'].get('stages_ms')}")
+    for m in cassette.mismatches:
+        print(f"  ⚠ {m}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(output, f, ensure_ascii=False, indent=2, default=str)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
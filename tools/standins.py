@@ -0,0 +1,247 @@
+"""
+AgentCore / Bedrock / CloudWatch / CloudWatch Logs / Slack のローカルスタンドイン
+
+1つの HTTP サーバーで以下を模擬する。boto3 は AWS_ENDPOINT_URL、slack_sdk は SLACK_API_URL で向け先を変える。
+
+  bedrock-agentcore InvokeAgentRuntime : POST /runtimes/{arn}/invocations
+  bedrock-runtime   InvokeModel        : POST /model/{modelId}/invoke
+  logs              StartQuery / GetQueryResults / StopQuery（X-Amz-Target: Logs_20140328.*）
+  cloudwatch        GetMetricStatistics（X-Amz-Target: GraniteServiceVersion20100801.*）
+  slack             POST /api/chat.postMessage
+
+エンドポイントごとに遅延（対数正規分布の中央値とばらつき）とエラー率を設定できる。
+"""
+
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+@dataclass
+class EndpointProfile:
+    latency_ms: float = 0.0   # 中央値
+    jitter: float = 0.0       # 対数正規分布の sigma（0 なら固定）
+    error_rate: float = 0.0   # 5xx / Slack の ok=false を返す確率
+    throttle_rate: float = 0.0  # 429 / ThrottlingException を返す確率
+
+
+@dataclass
+class StandinConfig:
+    agentcore: EndpointProfile = field(default_factory=EndpointProfile)
+    bedrock:   EndpointProfile = field(default_factory=EndpointProfile)
+    logs:      EndpointProfile = field(default_factory=EndpointProfile)
+    metrics:   EndpointProfile = field(default_factory=EndpointProfile)
+    slack:     EndpointProfile = field(default_factory=EndpointProfile)
+    articles: int = 15          # AgentCore が返す記事数
+    logs_query_polls: int = 1   # GetQueryResults が Complete を返すまでの回数
+    seed: int = 0
+
+
+# ─────────────────────────────────────────────────────────
+# サーバー本体
+# ─────────────────────────────────────────────────────────
+
+class StandinServer:
+    def __init__(self, config: StandinConfig | None = None):
+        self.config = config or StandinConfig()
+        self.stats: dict[str, dict[str, int]] = {}
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._queries: dict[str, int] = {}
+        self._httpd: ThreadingHTTPServer | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _count(self, endpoint: str, outcome: str) -> None:
+        with self._lock:
+            self.stats.setdefault(endpoint, {}).setdefault(outcome, 0)
+            self.stats[endpoint][outcome] += 1
+
+    def _outcome(self, endpoint: str, profile: EndpointProfile) -> str:
+        """遅延を入れたうえで ok / error / throttle を決める。"""
+        with self._lock:
+            r = self._rng.random()
+            delay = profile.latency_ms
+            if profile.jitter and delay:
+                delay = math.exp(self._rng.gauss(math.log(delay), profile.jitter))
+        if delay:
+            time.sleep(delay / 1000)
+        if r < profile.throttle_rate:
+            outcome = "throttle"
+        elif r < profile.throttle_rate + profile.error_rate:
+            outcome = "error"
+        else:
+            outcome = "ok"
+        self._count(endpoint, outcome)
+        return outcome
+
+    # ── 各 API の応答 ──────────────────────────────
+
+    def _articles(self, mode: str) -> list[dict]:
+        importance = ["HIGH", "MEDIUM", "LOW"]
+        return [
+            {
+                "category":   f"Sim {mode}",
+                "title_ja":   f"シミュレーション記事 {i}",
+                "summary_ja": "ローカルスタンドインが生成した概要です。",
+                "change":     "新規リリース",
+                "benefit":    "負荷試験用のダミーです。",
+                "importance": importance[i % 3],
+                "link":       f"https://example.com/sim/{mode}/{i}",
+            }
+            for i in range(self.config.articles)
+        ]
+
+    def agentcore(self, body: bytes) -> tuple[int, dict, bytes]:
+        outcome = self._outcome("agentcore", self.config.agentcore)
+        if outcome == "throttle":
+            return _aws_error(429, "ThrottlingException")
+        if outcome == "error":
+            return _aws_error(500, "InternalServerException")
+        mode = json.loads(body or b"{}").get("mode", "morning")
+        data = {"mode": mode, "articles": self._articles(mode), "metrics": {"stages_ms": {"llm": 0}}}
+        return 200, {"Content-Type": "application/json"}, json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+    def bedrock(self, body: bytes) -> tuple[int, dict, bytes]:
+        outcome = self._outcome("bedrock", self.config.bedrock)
+        if outcome == "throttle":
+            return _aws_error(429, "ThrottlingException")
+        if outcome == "error":
+            return _aws_error(500, "InternalServerException")
+        data = {"content": [{"type": "text", "text": "（スタンドインの所感）今週も安定稼働しました。"}],
+                "usage": {"input_tokens": 800, "output_tokens": 60}}
+        return 200, {"Content-Type": "application/json"}, json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+    def logs(self, target: str, body: bytes) -> tuple[int, dict, bytes]:
+        outcome = self._outcome("logs", self.config.logs)
+        if outcome == "throttle":
+            return _aws_json_error(400, "ThrottlingException")
+        if outcome == "error":
+            return _aws_json_error(500, "ServiceUnavailableException")
+        req = json.loads(body or b"{}")
+        op = target.split(".")[-1]
+        if op == "StartQuery":
+            query_id = uuid.uuid4().hex
+            with self._lock:
+                self._queries[query_id] = 0
+            return _json(200, {"queryId": query_id})
+        if op == "GetQueryResults":
+            with self._lock:
+                polls = self._queries.get(req.get("queryId"), 0) + 1
+                self._queries[req.get("queryId")] = polls
+            if polls < self.config.logs_query_polls:
+                return _json(200, {"status": "Running", "results": []})
+            rows = [[
+                {"field": "total_articles", "value": "210"},
+                {"field": "avg_articles", "value": "15"},
+                {"field": "min_articles", "value": "3"},
+                {"field": "max_articles", "value": "30"},
+                {"field": "runs", "value": "14"},
+            ]]
+            return _json(200, {"status": "Complete", "results": rows})
+        return _json(200, {"success": True})
+
+    def metrics(self) -> tuple[int, dict, bytes]:
+        outcome = self._outcome("metrics", self.config.metrics)
+        if outcome == "throttle":
+            return _aws_json_error(400, "Throttling", "1.0")
+        if outcome == "error":
+            return _aws_json_error(500, "InternalServiceError", "1.0")
+        point = {
+            "Timestamp": time.time(),
+            "Sum":       14.0,
+            "Average":   42000.0,
+            "Maximum":   61000.0,
+            "Unit":      "Count",
+        }
+        return _json(200, {"Label": "sim", "Datapoints": [point]})
+
+    def slack(self) -> tuple[int, dict, bytes]:
+        outcome = self._outcome("slack", self.config.slack)
+        if outcome == "throttle":
+            return 429, {"Content-Type": "application/json", "Retry-After": "1"}, \
+                json.dumps({"ok": False, "error": "ratelimited"}).encode()
+        if outcome == "error":
+            return _json(200, {"ok": False, "error": "internal_error"})
+        return _json(200, {"ok": True, "channel": "C0SIM", "ts": f"{time.time():.6f}"})
+
+    # ── 起動・停止 ──────────────────────────────────
+
+    def start(self) -> "StandinServer":
+        server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                target = self.headers.get("X-Amz-Target", "")
+                path = self.path
+
+                if re.match(r"^/runtimes/.+/invocations", path):
+                    status, headers, payload = server.agentcore(body)
+                elif re.match(r"^/model/.+/invoke", path):
+                    status, headers, payload = server.bedrock(body)
+                elif target.startswith("Logs_"):
+                    status, headers, payload = server.logs(target, body)
+                elif target.startswith("GraniteServiceVersion20100801."):
+                    status, headers, payload = server.metrics()
+                elif path.startswith("/api/chat.postMessage"):
+                    status, headers, payload = server.slack()
+                else:
+                    server._count("unknown", path)
+                    status, headers, payload = _json(404, {"message": f"not simulated: {path}"})
+
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self) -> "StandinServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def _json(status: int, data: dict) -> tuple[int, dict, bytes]:
+    return status, {"Content-Type": "application/json"}, json.dumps(data).encode("utf-8")
+
+
+def _aws_error(status: int, code: str) -> tuple[int, dict, bytes]:
+    """rest-json 形式のエラー応答。"""
+    return status, {"Content-Type": "application/json", "x-amzn-ErrorType": code}, \
+        json.dumps({"message": "injected by standin"}).encode()
+
+
+def _aws_json_error(status: int, code: str, version: str = "1.1") -> tuple[int, dict, bytes]:
+    """awsJson 形式のエラー応答。"""
+    return status, {"Content-Type": f"application/x-amz-json-{version}"}, \
+        json.dumps({"__type": code, "message": "injected by standin"}).encode()